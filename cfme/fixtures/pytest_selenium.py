@@ -12,10 +12,11 @@ Members of this module are available in the the pytest.sel namespace, e.g.::
 :var class_selector: Regular expression to detect simple CSS locators
 """
 
-from time import sleep
+from time import sleep, time
 from xml.sax.saxutils import quoteattr
 from collections import Iterable, namedtuple
 from contextlib import contextmanager
+from functools import wraps
 from textwrap import dedent
 import json
 import re
@@ -36,15 +37,16 @@ import diaper
 import pytest
 from cfme import exceptions, js
 from fixtures.pytest_store import store
-from utils import version
+from utils import conf, version
 from utils.browser import browser, ensure_browser_open, quit
-from utils.log import logger
+from utils.log import logger, perflog
 from utils.wait import wait_for
 from utils.pretty import Pretty
 
 from threading import local
 _thread_local = local()
 _thread_local.ajax_timeout = 30
+_thread_local.element_cache = None
 
 class_selector = re.compile(r"^(?:[a-zA-Z][a-zA-Z0-9]*)?(?:[#.][a-zA-Z0-9_-]+)+$")
 
@@ -154,7 +156,18 @@ def _t(t, root=None):
     """Assume tuple is a 2-item tuple like (By.ID, 'myid').
 
     Handles the case when root= locator resolves to multiple elements. In that case all of them
-    are processed and all results are put in the same list."""
+    are processed and all results are put in the same list.
+
+    Inside a :py:func:`cached_elements` block, the found elements are kept in its cache.
+    """
+    cache, cache_key = _element_cache(), (t, root)
+    try:
+        cached = cache.get(cache_key) if cache is not None else None
+    except TypeError:
+        # Unhashable root, not cached
+        cache, cached = None, None
+    if cached is not None:
+        return list(cached)
     result = []
     for root_element in (elements(root) if root is not None else [browser()]):
         # 20140920 - dajo - hack to get around selenium e is null bs
@@ -172,6 +185,9 @@ def _t(t, root=None):
     # Monkey patch them
     for elem in result:
         elem._source_locator = (t, root)
+    # Nothing found is not cached, the element may just not be there yet
+    if result and cache is not None:
+        cache[cache_key] = list(result)
     return result
 
 
@@ -197,6 +213,139 @@ def _d(l, **kwargs):
     return elements(version.pick(l), **kwargs)
 
 
+def _element_cache():
+    """Returns the element cache, ``{(locator, root): [WebElement, ...]}``
+
+    ``None`` outside of a :py:func:`cached_elements` block.
+    """
+    if getattr(_thread_local, 'element_cache', None) is None:
+        return None
+    if getattr(_thread_local, 'element_cache_browser', None) is not browser():
+        # The browser was restarted meanwhile
+        clear_element_cache()
+        _thread_local.element_cache_browser = browser()
+    return _thread_local.element_cache
+
+
+@contextmanager
+def cached_elements():
+    """Resolves each locator once in the block, the following lookups reuse the found elements
+
+    Meant for a series of lookups on a page which does not change meanwhile, like filling a form.
+    The cache is still cleared when :py:func:`wait_for_ajax` sees the page changed, and when an
+    element from it turns out to be stale in :py:func:`text`, :py:func:`get_attribute`,
+    :py:func:`click` or :py:func:`is_displayed`. Nested blocks share the cache of the outermost one.
+    """
+    if getattr(_thread_local, 'element_cache', None) is not None:
+        yield
+        return
+    _thread_local.element_cache = {}
+    _thread_local.element_cache_browser = browser()
+    try:
+        yield
+    finally:
+        _thread_local.element_cache = None
+
+
+def clear_element_cache():
+    """Forgets all elements found in the current :py:func:`cached_elements` block
+
+    Called when :py:func:`wait_for_ajax` sees that the page was changed, navigated away from or
+    reloaded, or that it can not tell. Call this after changing the page inside the block in a way
+    that does not end with waiting for ajax.
+    """
+    if getattr(_thread_local, 'element_cache', None) is not None:
+        _thread_local.element_cache = {}
+
+
+def _refind_if_stale(f):
+    """Calls the decorated function once more if the element found by the locator went stale
+
+    A stale element can only come from the element cache, which is cleared before the retry.
+    """
+    @wraps(f)
+    def wrapped(loc, *args, **kwargs):
+        try:
+            return f(loc, *args, **kwargs)
+        except StaleElementReferenceException:
+            if isinstance(loc, WebElement) or _element_cache() is None:
+                raise
+            clear_element_cache()
+            return f(loc, *args, **kwargs)
+    return wrapped
+
+
+#: Locator types :py:data:`cfme.js.resolve_elements` can find
+_batch_bys = {By.XPATH, By.CSS_SELECTOR, By.ID, By.NAME, By.CLASS_NAME, By.TAG_NAME}
+
+
+def _batch_locator(loc):
+    """Returns the (By, value) tuple of a locator the resolve script can find, or ``None``"""
+    if isinstance(loc, dict):
+        return _batch_locator(version.pick(loc))
+    elif isinstance(loc, basestring):
+        loc = loc.strip()
+        css = class_selector.match(loc)
+        return (By.CSS_SELECTOR, css.group()) if css is not None else (By.XPATH, loc)
+    elif isinstance(loc, tuple) and len(loc) == 2 and loc[0] in _batch_bys:
+        return loc
+    return None
+
+
+def prefetch_elements(locs):
+    """Finds the elements of many locators in one script and puts them in the element cache
+
+    Only strings, (By, value) tuples and version dicts are looked up, anything else in ``locs``
+    is skipped. Inside a :py:func:`cached_elements` block, following calls of :py:func:`element`
+    and :py:func:`elements` for the prefetched locators, as well as :py:func:`tag` and the
+    ``type`` :py:func:`get_attribute` of their elements, then need no round trip to the browser.
+
+    Args:
+        locs: An iterable of locators.
+
+    Returns: A dict of the looked up locators (as (By, value) tuples) and lists of their elements
+    """
+    batch = []
+    for loc in locs:
+        t = _batch_locator(loc)
+        if t is not None and t not in batch:
+            batch.append(t)
+    if not batch:
+        return {}
+    found = {}
+    cache = _element_cache()
+    for t, result in zip(batch, execute_script(js.resolve_elements, map(list, batch))):
+        if result is None:
+            # Left to selenium, which raises the proper exception for the locator
+            continue
+        found[t] = []
+        for elem, tag_name, type_attr in zip(*result):
+            elem._source_locator = (t, None)
+            elem._cached_tag_name, elem._cached_type = tag_name, type_attr
+            found[t].append(elem)
+        if found[t] and cache is not None:
+            cache[(t, None)] = list(found[t])
+    return found
+
+
+def resolve_elements(locs):
+    """Like ``[elements(loc) for loc in locs]``, but the plain locators are found in one script
+
+    See :py:func:`prefetch_elements`.
+
+    Args:
+        locs: A list of locators.
+
+    Returns: A list of lists of WebElement objects, one list per locator
+    """
+    found = prefetch_elements(locs)
+    result = []
+    for loc in locs:
+        t = _batch_locator(loc)
+        result.append(list(found[t]) if t in found else elements(loc))
+    return result
+
+
 def get_rails_error():
     """Get displayed rails error. If not present, return None"""
     if is_displayed(
@@ -275,15 +424,69 @@ def in_flight():
         return execute_script(js.in_flight)
 
 
-def wait_for_ajax():
+def wait_for_ajax(event=None):
     """
     Waits until all ajax timers are complete, in other words, waits until there are no
     more pending ajax requests, page load should be finished completely.
 
-    Raises:
-        TimedOutError: when ajax did not load in time
+    Unless ``ajax_wait`` is set to ``poll`` in the ``browser`` section of env.yaml, the page
+    itself waits for the ajax to settle (see :py:data:`cfme.js.wait_for_ajax`), so that the whole
+    wait is a single WebDriver call instead of one :py:func:`in_flight` call per 0.1s. Polling is
+    still used if the page goes away while waiting.
+
+    The element cache is cleared unless the page reports it did not change since the last wait.
+
+    Args:
+        event: What the ajax was caused by, e.g. ``'click <locator>'``. If passed, the time
+            waited is written to the perf log under this name.
+
+    Returns:
+        Seconds waited
+    """
+    started = time()
+    poll = conf.env.get('browser', {}).get('ajax_wait', 'async') == 'poll'
+    running = None if poll else _wait_for_ajax_async()
+    if running is None:
+        _wait_for_ajax_poll()
+        page_state = None
+    else:
+        page_state = (running['page'], running['generation'])
+    if page_state is None or page_state[1] is None or page_state != getattr(
+            _thread_local, 'page_state', None):
+        # The page changed, or it is not known if it did
+        clear_element_cache()
+    _thread_local.page_state = page_state
+    waited = time() - started
+    if event is not None:
+        perflog.logger.info('"%s" ajax wait took %f seconds', event, waited)
+    return waited
+
+
+def _wait_for_ajax_async():
+    """Waits for the ajax in one async script
+
+    Returns:
+        The last :py:func:`in_flight` status, or ``None`` if the script could not wait
     """
+    timeout = _thread_local.ajax_timeout
+    if getattr(_thread_local, 'script_timeout', None) != (browser(), timeout):
+        # Leave the page-side timeout some slack, so it resolves before the driver gives up
+        browser().set_script_timeout(timeout + 5)
+        _thread_local.script_timeout = (browser(), timeout)
+    try:
+        running = browser().execute_async_script(js.wait_for_ajax, timeout)
+    except WebDriverException as e:
+        # The page unloaded while waiting, or the script can not run on it
+        logger.trace('Ajax wait script failed, polling: {}'.format(str(e).strip()))
+        return None
+    if not running['settled']:
+        log_msg = ', '.join(["{}: {}".format(k, str(running.get(k)))
+            for k in ('jquery', 'prototype', 'miq', 'spinner', 'document')])
+        logger.trace('Ajax running: {}'.format(log_msg))
+    return running
+
 
+def _wait_for_ajax_poll():
     _thread_local.ajax_log_msg = ''
 
     def _nothing_in_flight():
@@ -367,7 +570,8 @@ def is_displayed(loc, _deep=0, **kwargs):
             # Too deep, or WebElement, which has no effect in repeating
             raise
         else:
-            # So try it again after a little bit of sleep
+            # So try it again after a little bit of sleep, with the stale element forgotten
+            clear_element_cache()
             sleep(0.05)
             return is_displayed(loc, _deep + 1)
 
@@ -457,6 +661,7 @@ def handle_alert(cancel=False, wait=30.0, squash=False):
             raise
 
 
+@_refind_if_stale
 def click(loc, wait_ajax=True, no_custom_handler=False):
     """
     Clicks on an element.
@@ -481,7 +686,7 @@ def click(loc, wait_ajax=True, no_custom_handler=False):
     ActionChains(browser()).click().perform()
     # -> using this approach, we don't check if we clicked a specific element
     if wait_ajax:
-        wait_for_ajax()
+        wait_for_ajax('click {!r}'.format(loc))
     return True
 
 
@@ -494,7 +699,7 @@ def raw_click(loc, wait_ajax=True):
     """
     element(loc).click()
     if wait_ajax:
-        wait_for_ajax()
+        wait_for_ajax('raw_click {!r}'.format(loc))
 
 
 def double_click(loc, wait_ajax=True):
@@ -511,7 +716,7 @@ def double_click(loc, wait_ajax=True):
     ActionChains(browser()).double_click().perform()
     # -> using this approach, we don't check if we clicked a specific element
     if wait_ajax:
-        wait_for_ajax()
+        wait_for_ajax('double_click {!r}'.format(loc))
     return True
 
 
@@ -550,10 +755,10 @@ def move_to_element(loc, **kwargs):
     brand = "//div[@id='page_header_div']//div[contains(@class, 'brand')]"
     wait_for_ajax()
     el = element(loc, **kwargs)
-    if el.tag_name == "option":
+    if tag(el) == "option":
         # Instead of option, let's move on its parent <select> if possible
         parent = element("..", root=el)
-        if parent.tag_name == "select":
+        if tag(parent) == "select":
             move_to_element(parent)
             return el
     move_to = ActionChains(browser()).move_to_element(el)
@@ -576,6 +781,7 @@ def move_to_element(loc, **kwargs):
     return el
 
 
+@_refind_if_stale
 def text(loc, **kwargs):
     """
     Returns the text of an element.
@@ -620,9 +826,11 @@ def tag(loc):
 
     Returns: A string containing the tag element's name.
     """
-    return element(loc).tag_name
+    el = element(loc)
+    return getattr(el, '_cached_tag_name', None) or el.tag_name
 
 
+@_refind_if_stale
 def get_attribute(loc, attr):
     """
     Returns the value of the HTML attribute of the given locator.
@@ -633,7 +841,11 @@ def get_attribute(loc, attr):
 
     Returns: Text describing the attribute of the element.
     """
-    return element(loc).get_attribute(attr)
+    el = element(loc)
+    if attr == 'type' and hasattr(el, '_cached_type'):
+        # Found by prefetch_elements, which read it already
+        return el._cached_type
+    return el.get_attribute(attr)
 
 
 def set_attribute(loc, attr, value):
@@ -769,6 +981,7 @@ def get(url):
     Args:
         url: URL to navigate to.
     """
+    clear_element_cache()
     return browser().get(url)
 
 
@@ -776,6 +989,7 @@ def refresh():
     """
     Refreshes the current browser window.
     """
+    clear_element_cache()
     browser().refresh()
 
 
@@ -147,6 +147,8 @@ def load():
         utils.ssh.SSHClient.run_command: THIS_ONLY,
         utils.ssh.SSHClient.run_rake_command: THIS_ONLY,
         utils.ssh.SSHClient.run_rails_command: THIS_ONLY,
+        utils.ssh.SSHClient.run_commands: THIS_ONLY,
+        utils.ssh.SSHClient.get_appliance_facts: THIS_ONLY,
         utils.ssh.SSHClient.get_version: IGNORE,
         utils.ssh.SSHClient.get_build_datetime: THIS_ONLY,
         utils.ssh.SSHClient.is_appliance_downstream: THIS_ONLY,
@@ -331,12 +331,17 @@ class CustomSavedReport(Updateable, Pretty):
         """
         self.navigate()
         try:
-            headers = tuple([sel.text(hdr).encode("utf-8") for hdr in self._table.headers])
+            headers = None
             body = []
             for page in paginator.pages():
-                for row in self._table.rows():
-                    row_data = tuple([sel.text(row[header]).encode("utf-8") for header in headers])
-                    body.append(row_data)
+                # One script per page instead of a selenium call per cell
+                page_headers, rows = self._table.read_contents()
+                if headers is None:
+                    headers = tuple([header.encode("utf-8") for header in page_headers])
+                    columns = [self._table._column_index(page_headers, header)
+                        for header in page_headers]
+                for row in rows:
+                    body.append(tuple([row[column].encode("utf-8") for column in columns]))
         except sel.NoSuchElementException:
             # No data found
             return SavedReportData([], [])
@@ -396,9 +401,10 @@ class SavedReportData(Pretty):
     def find_row(self, column, value):
         if column not in self.headers:
             return None
-        for row in self.rows:
-            if row[column] == value:
-                return row
+        index = self.headers.index(column)
+        for row in self.body:
+            if row[index] == value:
+                return dict(zip(self.headers, row))
 
     def find_cell(self, column, value, cell):
         try:
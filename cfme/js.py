@@ -15,6 +15,124 @@ return {
 };
 """
 
+# Resolves with the in_flight status plus settled, waited (ms), page (id of the page) and generation
+# (count of the DOM changes, null if unknown) keys, once nothing is in flight
+# Expects: arguments[0] = timeout in seconds
+wait_for_ajax = """\
+var callback = arguments[arguments.length - 1];
+var timeout = arguments[0] * 1000;
+var started = new Date().getTime();
+var done = false;
+var poller = null;
+
+function isHidden(el) {if(el === null) return true; return el.offsetParent === null;}
+
+function inFlight() {
+    return {
+        jquery: (typeof jQuery === "undefined") ? 0 : jQuery.active,
+        prototype: (typeof Ajax === "undefined") ? 0 : Ajax.activeRequestCount,
+        miq: window.miqAjaxTimers,
+        spinner: (!isHidden(document.getElementById("spinner_div")))
+            && isHidden(document.getElementById("lightbox_div")),
+        document: document.readyState
+    };
+}
+
+function check() {
+    if(done) return;
+    var running = inFlight();
+    var waited = new Date().getTime() - started;
+    running.settled = running.jquery == 0 && running.prototype == 0 && !running.spinner
+        && running.document == "complete";
+    if(running.settled || waited >= timeout) {
+        done = true;
+        clearInterval(poller);
+        var waiters = window.cfmeAjaxHook.waiters;
+        waiters.splice(waiters.indexOf(check), 1);
+        running.waited = waited;
+        running.page = window.cfmeAjaxHook.page;
+        running.generation = window.cfmeAjaxHook.generation;
+        callback(running);
+    }
+}
+
+// Installed once per page, wakes the waiters up whenever ajax or the spinner changes
+if(typeof window.cfmeAjaxHook === "undefined") {
+    window.cfmeAjaxHook = {waiters: [], page: Math.random().toString(), generation: 0};
+    var notify = function() {
+        // Deferred, so that the request counters are decremented and the handlers have run
+        setTimeout(function() {
+            var waiters = window.cfmeAjaxHook.waiters.slice();
+            for(var i = 0; i < waiters.length; i++) waiters[i]();
+        }, 0);
+    };
+    if(typeof jQuery !== "undefined") jQuery(document).ajaxComplete(notify);
+    if(typeof Ajax !== "undefined" && Ajax.Responders) {
+        Ajax.Responders.register({onComplete: notify});
+    }
+    document.addEventListener("readystatechange", notify);
+    if(typeof MutationObserver !== "undefined") {
+        // Also counts the DOM changes, the element cache is only valid while none happen
+        new MutationObserver(function() {
+            window.cfmeAjaxHook.generation++;
+            notify();
+        }).observe(document.documentElement, {attributes: true, childList: true, subtree: true});
+    } else {
+        window.cfmeAjaxHook.generation = null;
+    }
+}
+window.cfmeAjaxHook.waiters.push(check);
+// Fallback for changes no hook sees (e.g. a parent of the spinner hidden), still page-side
+poller = setInterval(check, 100);
+check();
+"""
+
+# Returns [elements, tag names, type attributes] per locator, null where it could not be resolved
+# Expects: arguments[0] = list of [By, value] pairs
+resolve_elements = """\
+function find(by, value) {
+    var found = [];
+    if(by == "xpath") {
+        var result = document.evaluate(value, document, null, 7, null);
+        for(var i = 0; i < result.snapshotLength; i++) found.push(result.snapshotItem(i));
+    } else if(by == "css selector") {
+        found = document.querySelectorAll(value);
+    } else if(by == "id") {
+        var el = document.getElementById(value);
+        if(el !== null) found.push(el);
+    } else if(by == "name") {
+        found = document.getElementsByName(value);
+    } else if(by == "class name") {
+        found = document.getElementsByClassName(value);
+    } else if(by == "tag name") {
+        found = document.getElementsByTagName(value);
+    } else {
+        return null;
+    }
+    var elements = [], tags = [], types = [];
+    for(var i = 0; i < found.length; i++) {
+        var el = found[i];
+        if(el.nodeType !== 1) return null;
+        elements.push(el);
+        tags.push(el.tagName.toLowerCase());
+        // Like WebElement.get_attribute, prefers the property (textarea, select-one, ...)
+        types.push(typeof el.type === "string" ? el.type : el.getAttribute("type"));
+    }
+    return [elements, tags, types];
+}
+
+var results = [];
+for(var i = 0; i < arguments[0].length; i++) {
+    try {
+        results.push(find(arguments[0][i][0], arguments[0][i][1]));
+    } catch(e) {
+        // Invalid locator, left to selenium to report
+        results.push(null);
+    }
+}
+return results;
+"""
+
 update_retirement_date_function_script = """\
 function updateDate(newValue) {
     if(typeof $j == "undefined") {
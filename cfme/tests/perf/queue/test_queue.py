@@ -6,13 +6,11 @@ from cfme.configure.configuration import candu
 from utils.conf import perf_tests
 from utils.log import logger
 from utils.path import log_path
-from utils.perf import collect_log
+from utils.perf import stream_log
 from utils.perf_message_stats import perf_process_evm
 import os
 import os.path
 import pytest
-import subprocess
-import time
 
 pytestmark = [
     pytest.mark.meta(
@@ -26,10 +24,8 @@ def enable_candu():
 
 
 @pytest.mark.usefixtures("setup_infrastructure_providers")
-def test_queue_infrastructure(request, ssh_client, enable_candu):
-    local_evm_gz = str(log_path.join('evm.perf.log.gz'))
+def test_queue_infrastructure(request, ssh_client, enable_candu, queue_monitor):
     local_evm = str(log_path.join('evm.perf.log'))
-    local_top_gz = str(log_path.join('top_output.perf.log.gz'))
     local_top = str(log_path.join('top_output.perf.log'))
 
     def clean_up_log_files(files):
@@ -38,22 +34,22 @@ def test_queue_infrastructure(request, ssh_client, enable_candu):
             if os.path.exists(clean_file):
                 logger.info('Removing: {}'.format(clean_file))
                 os.remove(clean_file)
-    request.addfinalizer(lambda: clean_up_log_files([local_evm, local_evm_gz, local_top,
-        local_top_gz]))
+    request.addfinalizer(lambda: clean_up_log_files([local_evm, '{}.state'.format(local_evm),
+        local_top, '{}.state'.format(local_top)]))
 
-    sleep_time = perf_tests['test_queue']['infra_time']
+    watch_time = perf_tests['test_queue']['infra_time']
+    monitor_conf = perf_tests['queue_monitor']
 
-    logger.info('Waiting: {}'.format(sleep_time))
-    time.sleep(sleep_time)
+    logger.info('Watching queue: {}'.format(watch_time))
+    violations = queue_monitor.watch(watch_time, monitor_conf['threshold'],
+        monitor_conf['poll_interval'])
 
-    collect_log(ssh_client, 'evm', local_evm_gz)
-    collect_log(ssh_client, 'top_output', local_top_gz, strip_whitespace=True)
+    stream_log(ssh_client, 'evm', local_evm)
+    stream_log(ssh_client, 'top_output', local_top, strip_whitespace=True)
 
-    logger.info('Calling gunzip {}'.format(local_evm_gz))
-    subprocess.call(['gunzip', local_evm_gz])
+    # Post process evm log and top_output log for charts and csvs, the logs are removed afterwards
+    # so there is nothing to cache the parsed logs for
+    perf_process_evm(local_evm, local_top,
+        processes=perf_tests['test_queue'].get('parse_processes', 1), use_cache=False)
 
-    logger.info('Calling gunzip {}'.format(local_top_gz))
-    subprocess.call(['gunzip', local_top_gz])
-
-    # Post process evm log and top_output log for charts and csvs
-    perf_process_evm(local_evm, local_top)
+    assert not violations, 'Queue thresholds exceeded: {}'.format(', '.join(violations))
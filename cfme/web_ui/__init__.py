@@ -252,6 +252,11 @@ class Table(Pretty):
         * :py:meth:`click_rows_by_cells`
         * :py:meth:`click_row_by_cells`
 
+    To just read the table, :py:meth:`read_contents` returns the text of the headers and of every
+    body cell with a single script::
+
+        headers, rows = table.read_contents()
+
     Note:
 
         A table is defined by the containers of the header and data areas, and offsets to them.
@@ -348,6 +353,60 @@ class Table(Pretty):
         for row_element in row_elements[index:]:
             yield self.create_row_from_element(row_element)
 
+    _read_contents_script = """
+        function cellText(cell) {
+            var text = cell.innerText === undefined ? cell.textContent : cell.innerText;
+            return text.replace(/\\u00a0/g, ' ').replace(/[ \\t]*\\n[ \\t]*/g, '\\n').trim();
+        }
+        function childCells(row, tags) {
+            var cells = [];
+            for (var i = 0; i < row.children.length; i++) {
+                if (tags.indexOf(row.children[i].tagName) >= 0) {
+                    cells.push(cellText(row.children[i]));
+                }
+            }
+            return cells;
+        }
+        var rows = [];
+        for (var i = 0; i < arguments[1].children.length; i++) {
+            if (arguments[1].children[i].tagName === 'TR') {
+                rows.push(childCells(arguments[1].children[i], ['TD']));
+            }
+        }
+        return {headers: childCells(arguments[0], ['TD', 'TH']), rows: rows.slice(arguments[2])};
+    """
+
+    def read_contents(self, row_indexes=False):
+        """Reads the text of the headers and of every body cell with a single script
+
+        Much faster than iterating over :py:meth:`rows`, which costs selenium calls per cell.
+
+        Args:
+            row_indexes: Pair each row with its index, which :py:meth:`row_by_index` turns into a
+                :py:class:`Table.Row` (e.g. to click it)
+
+        Returns: A tuple of the list of header texts and the list of rows, each a tuple of the
+            texts of its ``<td>`` cells, or an ``(index, cells)`` tuple with ``row_indexes``
+        """
+        contents = sel.execute_script(self._read_contents_script, self.header_row, self.body,
+            self.body_offset)
+        rows = [tuple(row) for row in contents['rows']]
+        if row_indexes:
+            rows = list(enumerate(rows))
+        return contents['headers'], rows
+
+    def row_by_index(self, index):
+        """Returns the :py:class:`Table.Row` of a row index from :py:meth:`read_contents`"""
+        row_elements = sel.elements('tr', root=self.body)
+        return self.create_row_from_element(row_elements[self.body_offset + index])
+
+    def _column_index(self, headers, header):
+        # Same lookup as Table.Row.__getitem__, for the headers read by read_contents
+        if isinstance(header, int):
+            return header
+        header_indexes = {self._convert_header(text): i for i, text in enumerate(headers)}
+        return header_indexes[self._convert_header(header).lower()]
+
     def find_row(self, header, value):
         """
         Finds a row in the Table by iterating through each visible item.
@@ -399,41 +458,33 @@ class Table(Pretty):
         """
         # accept dicts or supertuples
         cells = dict(cells)
-        cell_text_loc = (
-            './/td/descendant-or-self::*[contains(normalize-space(text()), "%s")]/ancestor::tr[1]')
-        matching_rows_list = list()
-        for value in cells.values():
-            # Get all td elements that contain the value text
-            matching_elements = sel.elements(cell_text_loc % value,
-                root=sel.move_to_element(self._root_loc))
-            if matching_elements:
-                matching_rows_list.append(set(matching_elements))
-
-        # Now, find the common row elements that matched all the input cells
-        # (though not yet matching values to headers)
-        if not matching_rows_list:
-            # If none matched, short out
+        # Match the cell texts of the whole table at once, only the matches become Rows
+        headers, rows = self.read_contents(row_indexes=True)
+        try:
+            column_cells = [(self._column_index(headers, header), unicode(value))
+                for header, value in cells.items()]
+        except KeyError:
+            # No such column, nothing can match
             return []
 
-        rows_elements = list(reduce(lambda set1, set2: set1 & set2, matching_rows_list))
-
-        # Convert them to rows
-        # This is slow, which is why we do it after reducing the row element pile,
-        # and not when building matching_rows_list, but it makes comparing header
-        # names and expected values easy
-        rows = [self.create_row_from_element(element) for element in rows_elements]
-
-        # Only include rows where the expected values are in the right columns
-        matching_rows = list()
         if partial_check:
-            matching_row_filter = lambda heading, value: value in row[heading].text
+            matching_row_filter = lambda row_cells, column, value: value in row_cells[column]
         else:
-            matching_row_filter = lambda heading, value: row[heading].text == value
-        for row in rows:
-            if all(matching_row_filter(*cell) for cell in cells.items()):
-                matching_rows.append(row)
+            matching_row_filter = lambda row_cells, column, value: row_cells[column] == value
+        matching_indexes = list()
+        for index, row_cells in rows:
+            try:
+                if all(matching_row_filter(row_cells, *cell) for cell in column_cells):
+                    matching_indexes.append(index)
+            except IndexError:
+                # Short row, e.g. a group header spanning the table
+                pass
+        if not matching_indexes:
+            return []
 
-        return matching_rows
+        row_elements = sel.elements('tr', root=self.body)
+        return [self.create_row_from_element(row_elements[self.body_offset + index])
+            for index in matching_indexes]
 
     def find_row_by_cells(self, cells, partial_check=False):
         """Find the first row containing cells
@@ -1269,14 +1320,18 @@ def _fill_form_list(form, values, action=None, action_always=False):
     logger.info('Beginning to fill in form...')
     values = list(val for key in form.fields for val in values if val[0] == key[0])
     res = []
-    for field, value in values:
-        if value is not None and form.field_valid(field):
-            loc = form.locators[field]
-            logger.trace(' Dispatching fill for "%s"' % field)
-            fill_prev = fill(loc, value)  # re-dispatch to fill for each item
-            res.append(fill_prev != value)  # note whether anything changed
-        else:
-            res.append(False)
+    with sel.cached_elements():
+        # Find all the plain field locators at once, filling them then finds them in the cache
+        sel.prefetch_elements(form.locators[field] for field, value in values
+            if value is not None and form.field_valid(field))
+        for field, value in values:
+            if value is not None and form.field_valid(field):
+                loc = form.locators[field]
+                logger.trace(' Dispatching fill for "%s"' % field)
+                fill_prev = fill(loc, value)  # re-dispatch to fill for each item
+                res.append(fill_prev != value)  # note whether anything changed
+            else:
+                res.append(False)
 
     if action and (any(res) or action_always):  # only perform action if something changed
         logger.debug(' Invoking end of form action')
@@ -1417,11 +1472,70 @@ class Tree(Pretty):
 
     Note: Dynatrees, rely on a ``<ul><li>`` setup. We class a ``<li>`` as a node.
 
+    Reading a whole tree with :py:meth:`read_contents` expands it in the browser and returns it
+    from a single script. The result is kept as :py:attr:`snapshot`, which :py:meth:`browse`,
+    :py:meth:`flatten_level` and ``find_path_to(..., cached=True)`` can search without touching
+    the browser again::
+
+        tree.read_contents()
+        path = tree.find_path_to(re.compile(r'.*?\\(Active\\)$'), cached=True)
+        children = Tree.flatten_level(Tree.browse(tree.snapshot, *path))
+
     """
     pretty_attrs = ['locator']
 
+    # Expands a dynatree client side and returns it in the read_contents format, with the nodes
+    # being lists, and the number of lazy nodes still loading their children
+    _read_contents_script = """
+        var pending = 0;
+        function child(element, tagName, className) {
+            for (var i = 0; i < element.children.length; i++) {
+                var candidate = element.children[i];
+                if (candidate.tagName === tagName && (!className ||
+                        (' ' + candidate.className + ' ').indexOf(' ' + className + ' ') >= 0)) {
+                    return candidate;
+                }
+            }
+            return null;
+        }
+        function readLevel(ul) {
+            var result = [];
+            for (var i = 0; i < ul.children.length; i++) {
+                var node = ul.children[i];
+                var span = node.tagName === 'LI' ? child(node, 'SPAN') : null;
+                var label = span ? child(span, 'A', 'dynatree-title') : null;
+                if (!label) {
+                    continue;
+                }
+                var name = label.textContent.replace(/\\s+/g, ' ').trim();
+                var expander = child(span, 'SPAN');
+                if (span.className.indexOf('dynatree-expanded') < 0 && expander) {
+                    expander.click();
+                }
+                var subtree = child(node, 'UL');
+                var children = subtree ? readLevel(subtree) : [];
+                if (children.length) {
+                    result.push([name, children]);
+                } else {
+                    if (span.className.indexOf('dynatree-lazy') >= 0) {
+                        // The children are being loaded
+                        pending++;
+                    }
+                    result.push(name);
+                }
+            }
+            return result;
+        }
+        var tree = readLevel(arguments[0]);
+        return {tree: tree, pending: pending};
+    """
+    # Rounds of lazy node loading read_contents waits for, a round per tree level
+    _read_contents_passes = 20
+
     def __init__(self, locator):
         self.locator = locator
+        #: The contents of the tree as last read by :py:meth:`read_contents`
+        self.snapshot = None
 
     def _get_tag(self):
         if getattr(self, 'tag', None) is None:
@@ -1564,14 +1678,20 @@ class Tree(Pretty):
         is its name. If the item is a tuple, first element of the tuple is the name and second
         element is the subtree (list).
 
+        The whole tree is expanded and read by a single script (plus one per level of lazily
+        loaded nodes), and the result is kept as :py:attr:`snapshot`.
+
         Args:
-            parent: Starting element, used during recursion
+            parent: Starting element, reads the subtree node by node
         Returns: Tree in format mentioned in description
         """
         self._detect()
-        if parent is None and self._get_tag() == "table":
-            return self._legacy_read_contents()  # Legacy
-        parent = self.locator if parent is None else parent
+        if parent is None:
+            if self._get_tag() == "table":
+                self.snapshot = self._legacy_read_contents()  # Legacy
+            else:
+                self.snapshot = self._snapshot_read_contents()
+            return self.snapshot
 
         result = []
 
@@ -1589,6 +1709,19 @@ class Tree(Pretty):
 
         return result if len(result) > 0 else None
 
+    def _snapshot_read_contents(self):
+        for i in range(self._read_contents_passes):
+            contents = sel.execute_script(self._read_contents_script, self.root_el)
+            if not contents['pending']:
+                break
+            # Lazy nodes were expanded, read again once their children are in
+            sel.wait_for_ajax()
+
+        def _convert(nodes):
+            return [node.encode("utf-8") if isinstance(node, basestring)
+                else (node[0].encode("utf-8"), _convert(node[1])) for node in nodes]
+        return _convert(contents['tree']) or None
+
     def _legacy_read_contents(self):
         self._detect()
         entry = sel.element(".//tbody[not(tr/td[contains(@class, 'hiddenRow')])]",
@@ -1673,7 +1806,7 @@ class Tree(Pretty):
         """
         return map(lambda item: item[0] if isinstance(item, tuple) else item, tree)
 
-    def find_path_to(self, target):
+    def find_path_to(self, target, cached=False):
         """ Method used to look up the exact path to an item we know only by its regexp or partial
         description.
 
@@ -1683,6 +1816,8 @@ class Tree(Pretty):
             target: Item searched for. Can be regexp made by
                 :py:func:`re.compile <python:re.compile>`,
                 otherwise it is taken as a string for `in` matching.
+            cached: Search the :py:attr:`snapshot` of the last :py:meth:`read_contents`, if any,
+                instead of reading the tree again
         Returns: :py:class:`list` with path to that item.
         """
         if not isinstance(target, re._pattern_type):
@@ -1705,7 +1840,11 @@ class Tree(Pretty):
             else:
                 return None
 
-        result = _find_in_tree(self.read_contents())
+        if cached and self.snapshot is not None:
+            tree = self.snapshot
+        else:
+            tree = self.read_contents()
+        result = _find_in_tree(tree or [])
         if result is None:
             raise NameError("{} not found in tree".format(target.pattern))
         else:
@@ -1797,6 +1936,7 @@ class InfoBlock(Pretty):
     DETAIL = "detail"
     FORM = "form"
     _TITLE_CACHE = {}
+    _form_locator = "./table/tbody/tr/td[contains(@class, 'key')]"
 
     pretty_attrs = ["title"]
 
@@ -1825,7 +1965,7 @@ class InfoBlock(Pretty):
         return self._type
 
     @property
-    def root(self):
+    def _root_locator(self):
         possible_locators = [
             # Detail type
             version.pick({
@@ -1848,11 +1988,15 @@ class InfoBlock(Pretty):
             # The root element must contain table element because listaccordions were caught by the
             # locator. It used to be fieldset but it seems it can be really anything
         ]
-        found = sel.elements("|".join(possible_locators))
+        return "|".join(possible_locators)
+
+    @property
+    def root(self):
+        found = sel.elements(self._root_locator)
         if not found:
             raise exceptions.BlockTypeUnknown("The block type requested is unknown")
         root_el = found[0]
-        if sel.elements("./table/tbody/tr/td[contains(@class, 'key')]", root=root_el):
+        if sel.elements(self._form_locator, root=root_el):
             self._type = self.FORM
         else:
             self._type = self.DETAIL
@@ -1902,15 +2046,38 @@ class InfoBlock(Pretty):
             self.ib = ib
             self.name = name
 
-        @property
-        def pair_locator(self):
-            if self.ib.type == InfoBlock.DETAIL:
+        # Finds the block, its type, the member and its text at once
+        _text_script = """
+            function first(xpath, root) {
+                return document.evaluate(xpath, root, null, 9, null).singleNodeValue;
+            }
+            var root = first(arguments[0], document);
+            if (root === null) {
+                return null;
+            }
+            var type = first(arguments[1], root) === null ? arguments[2] : arguments[3];
+            var pair = first(arguments[type === arguments[3] ? 5 : 4], root);
+            var container = pair === null ? null : first("./td[2]", pair);
+            if (container === null) {
+                return {type: type, text: null};
+            }
+            var text = container.innerText === undefined ? container.textContent
+                : container.innerText;
+            return {type: type, text: text};
+        """
+
+        def _pair_locator(self, block_type):
+            if block_type == InfoBlock.DETAIL:
                 return './/table/tbody/tr/td[1][@class="label"][normalize-space(.)="{}"]/..'.format(
                     self.name)
-            elif self.ib.type == InfoBlock.FORM:
+            elif block_type == InfoBlock.FORM:
                 return './/table/tbody/tr/td[1][@class="key"][normalize-space(.)="{}"]/..'.format(
                     self.name)
 
+        @property
+        def pair_locator(self):
+            return self._pair_locator(self.ib.type)
+
         @property
         def pair(self):
             return sel.element(self.pair_locator, root=self.ib.root)
@@ -1932,7 +2099,16 @@ class InfoBlock(Pretty):
 
         @property
         def text(self):
-            return sel.text(self.container).encode("utf-8").strip()
+            found = sel.execute_script(self._text_script, self.ib._root_locator,
+                InfoBlock._form_locator, InfoBlock.DETAIL, InfoBlock.FORM,
+                self._pair_locator(InfoBlock.DETAIL), self._pair_locator(InfoBlock.FORM))
+            if found is None:
+                raise exceptions.BlockTypeUnknown("The block type requested is unknown")
+            self.ib._type = found['type']
+            if found['text'] is None:
+                raise sel_exceptions.NoSuchElementException(
+                    "Element {} not found on page.".format(self.pair_locator))
+            return found['text'].encode("utf-8").strip()
 
         @property
         def icon_href(self):
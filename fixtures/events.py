@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import json
 import requests
 import signal
 import subprocess
@@ -104,6 +105,9 @@ class EventListener(object):
 
     TIME_FORMAT = "%Y-%m-%d-%H-%M-%S"
 
+    # Seconds a single request waits on the listener for the events to come
+    LONG_POLL = 20
+
     def __init__(self, verbose=False):
         listener_filename = scripts_path.join('listener.py').strpath
         self.listener_script = "{} 0.0.0.0 {}".format(listener_filename, self.listener_port)
@@ -119,13 +123,26 @@ class EventListener(object):
     def listener_host(self):
         return "http://%s" % my_ip_address()
 
-    def _get(self, route):
+    def _get(self, route, params=None, timeout=None):
         """ Query event listener
         """
         assert not self.finished, "Listener dead!"
         listener_url = "%s:%d" % (self.listener_host(), self.listener_port)
         logger.info("checking api: %s%s" % (listener_url, route))
-        r = requests.get(listener_url + route)
+        r = requests.get(listener_url + route, params=params, timeout=timeout)
+        r.raise_for_status()
+        response = r.json()
+        logger.debug("Response: %s" % response)
+        return response
+
+    def _post(self, route, data, timeout=None):
+        """ Post JSON data to event listener
+        """
+        assert not self.finished, "Listener dead!"
+        listener_url = "%s:%d" % (self.listener_host(), self.listener_port)
+        logger.info("posting to api: %s%s" % (listener_url, route))
+        r = requests.post(listener_url + route, data=json.dumps(data),
+            headers={'Content-Type': 'application/json'}, timeout=timeout)
         r.raise_for_status()
         response = r.json()
         logger.debug("Response: %s" % response)
@@ -162,84 +179,90 @@ class EventListener(object):
         elif obj_type in {"host"}:
             return obj_type
 
-    def check_db(self, sys_type, obj_type, obj, event, after=None, before=None):
+    def _query(self, sys_type, obj_type, obj, event, after=None, before=None):
+        """ Listener query parameters of an event, see :py:meth:`check_db`
+        """
+        query = {"event_type": self.mgmt_sys_type(sys_type, obj_type),
+                 "resource_name": obj,
+                 "event": event}
+        # Timespan limits
+        if after:
+            query["time_from"] = datetime.strftime(after, self.TIME_FORMAT)
+        if before:
+            query["time_to"] = datetime.strftime(before, self.TIME_FORMAT)
+        return query
+
+    def check_db(self, sys_type, obj_type, obj, event, after=None, before=None, wait=LONG_POLL):
         """ Utility to check listener database for event
 
+        The listener holds the request until the event comes or ``wait`` seconds pass.
+
         Args:
             after: Return only events that happened AFTER this time
             before: Return only events that happened BEFORE this time
+            wait: Seconds to wait for the event
 
         Note:
             Both can be combined. If None, then the filter won't be applied.
         """
-        max_attempts = 10
-        sleep_interval = 2
-        req = "/events/%s/%s?event=%s" % (self.mgmt_sys_type(sys_type, obj_type), obj, event)
-        # Timespan limits
-        if after:
-            req += "&from_time=%s" % datetime.strftime(after, self.TIME_FORMAT)
-        if before:
-            req += "&to_time=%s" % datetime.strftime(before, self.TIME_FORMAT)
-
-        for attempt in range(1, max_attempts + 1):
-            data = self._get(req)
-            try:
-                assert len(data) > 0
-            except AssertionError as e:
-                if attempt < max_attempts:
-                    logger.debug("Waiting for DB (%s/%s): %s" % (attempt, max_attempts, e))
-                    time.sleep(sleep_interval)
-                    pass
-                # Enough sleeping, something went wrong
-                else:
-                    logger.exception("Check DB failed. Max attempts: '%s'." % (max_attempts))
-                    return False
-            else:
-                # No exceptions raised
-                logger.info("DB row found for '%s'" % req)
-                return datetime.strptime(data[0]["event_time"], "%Y-%m-%d %H:%M:%S")
-        return False
+        query = self._query(sys_type, obj_type, obj, event, after=after, before=before)
+        req = "/events/{}/{}".format(query.pop("event_type"), query.pop("resource_name"))
+        query["wait"] = wait
+        data = self._get(req, params=query, timeout=wait + 30)
+        if not data:
+            logger.error("Check DB failed, no event for '%s' in %s seconds" % (req, wait))
+            return False
+        logger.info("DB row found for '%s'" % req)
+        return datetime.strptime(data[0]["event_time"], "%Y-%m-%d %H:%M:%S")
 
     def get_all_received_events(self):
         return self._get("/events")
 
-    def check_all_expectations(self):
+    def check_all_expectations(self, wait=0):
         """ Check whether all triggered events have been captured.
 
-        Sets a flag for each event.
+        Sets a flag for each event. All the expectations are matched by a single request.
 
-        Simplified to check just against the time of registration
-        and the begin of this check.
+        Simplified to check just against the time of registration, each expectation only
+        matches the events since its latest predecessor with the same parameters.
+
+        Args:
+            wait: Seconds the listener may hold the request until any of the missing events
+                comes
 
         Returns:
             Boolean whether all events have already been captured.
 
         """
-        check_started = get_current_time_GMT()
+        # Group the same expectations, just with different time, in one pass
+        the_same = {}
         for expectation in self.expectations:
-            # Get the events with the same parameters, just with different time
-            the_same = [item
-                        for item
-                        in self.expectations
-                        if item == expectation and item is not expectation
-                        ]
-            # Split them into preceeding and following events
-            preceeding_events = [event
-                                 for event
-                                 in the_same
-                                 if event.time <= expectation.time and event is not expectation
-                                 ]
-            # Get immediate predecessor's of follower's time of this event
-            preceeding_event = preceeding_events[-1].time if preceeding_events else expectation.time
-            # following_event = following_events[0].time if following_events else check_started
-            # Shorten the params
-            params = [expectation.sys_type,
-                      expectation.obj_type,
-                      expectation.obj,
-                      expectation.event]
-            came = self.check_db(*params, after=preceeding_event, before=check_started)
-            if came:
-                expectation.arrived = came
+            key = (expectation.sys_type, expectation.obj_type, expectation.obj, expectation.event)
+            the_same.setdefault(key, []).append(expectation)
+
+        missing, queries = [], []
+        for expectations in the_same.values():
+            for expectation in expectations:
+                if expectation.arrived is not None:
+                    continue
+                # Get immediate predecessor's time of this event
+                preceeding_events = [event
+                                     for event
+                                     in expectations
+                                     if event.time <= expectation.time and event is not expectation
+                                     ]
+                preceeding_event = (
+                    preceeding_events[-1].time if preceeding_events else expectation.time)
+                missing.append(expectation)
+                queries.append(self._query(expectation.sys_type, expectation.obj_type,
+                    expectation.obj, expectation.event, after=preceeding_event))
+
+        if missing:
+            matched = self._post("/events/match", {"queries": queries, "wait": wait},
+                timeout=wait + 30)
+            for expectation, came in zip(missing, matched):
+                if came:
+                    expectation.arrived = datetime.strptime(came, "%Y-%m-%d %H:%M:%S")
         return all([exp.arrived is not None for exp in self.expectations])
 
     @property
@@ -427,9 +450,11 @@ def pytest_runtest_call(item):
             return
 
         # Event testing is enabled.
+        # The listener holds each check until any of the missing events comes
         try:
             wait_for(register_event.check_all_expectations,
-                     delay=5,
+                     func_kwargs={"wait": register_event.LONG_POLL},
+                     delay=1,
                      num_sec=75,
                      handle_exception=True)
         except TimedOutError:
@@ -1,6 +1,8 @@
 """Fixtures specifically for performance tests."""
 from utils.perf import set_rails_loglevel
 from utils.perf import get_worker_pid
+from utils.perf_message_stats import QueueMonitor
+from utils.conf import perf_tests
 import pytest
 
 
@@ -14,3 +16,11 @@ def cfme_log_level_rails_debug():
 @pytest.yield_fixture(scope='module')
 def ui_worker_pid():
     yield get_worker_pid('MiqUiWorker')
+
+
+@pytest.yield_fixture(scope='function')
+def queue_monitor():
+    monitor = QueueMonitor(window=perf_tests['queue_monitor']['window'])
+    monitor.start()
+    yield monitor
+    monitor.close()
@@ -1,6 +1,8 @@
 import pytest
 
 from fixtures.pytest_store import store
+from utils.log import logger
+from utils.ssh import connection_pool
 
 
 @pytest.fixture(scope="function")
@@ -49,3 +51,19 @@ def ssh_client(uses_ssh):
 def ssh_client_modscope(uses_ssh):
     """See :py:func:`ssh_client`."""
     return store.current_appliance.ssh_client()
+
+
+def pytest_terminal_summary(terminalreporter):
+    # Report how often the ssh connection pool had to connect, a handshake per host is ideal
+    if not connection_pool.handshake_count:
+        return
+    message = 'SSH handshakes: {} ({} pooled transport reuses)'.format(
+        connection_pool.handshake_count, connection_pool.reuse_count)
+    logger.info(message)
+    terminalreporter.write_line(message)
+    for hostname, handshakes in sorted(connection_pool.handshakes.items()):
+        logger.info('SSH handshakes to {}: {}'.format(hostname, handshakes))
+
+
+def pytest_unconfigure():
+    connection_pool.close()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python2
+"""
+Measure the per-call cost of utils.version.pick on the pick() dicts of the given modules
+
+The version keyed dicts passed to pick() are collected from the source of the modules and every
+one of them is picked ``--calls`` times for the given appliance version, both by the memoized
+dispatch of utils.version.pick and by the original implementation, which converted and sorted all
+of the keys on every call. No appliance is needed.
+
+Example usage:
+
+    scripts/benchmark_version_pick.py --version 5.4.0.1 cfme/web_ui/menu.py cfme/infrastructure
+
+"""
+import argparse
+import ast
+import os
+import sys
+import time
+
+# Make sure the parent dir is on the path before importing utils
+cfme_tests_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, cfme_tests_path)
+
+from utils import version
+
+
+def uncompiled_pick(v_dict):
+    # utils.version.pick before its dispatch tables were compiled and memoized
+    v_dict = {version.get_version(k): v for (k, v) in v_dict.items()}
+    versions = v_dict.keys()
+    sorted_matching_versions = sorted(filter(lambda v: v <= version.current_version(), versions),
+                                      reverse=True)
+    return v_dict.get(sorted_matching_versions[0]) if sorted_matching_versions else None
+
+
+def _key(node):
+    """Returns the value of a literal pick() key, raises ValueError for anything else"""
+    if isinstance(node, ast.Str):
+        return node.s
+    elif isinstance(node, (ast.Name, ast.Attribute)):
+        name = node.id if isinstance(node, ast.Name) else node.attr
+        if name in ('LOWEST', 'LATEST'):
+            return getattr(version, name)
+    elif (isinstance(node, ast.Call) and getattr(node.func, 'id', getattr(node.func, 'attr', None))
+            == 'LooseVersion' and len(node.args) == 1 and isinstance(node.args[0], ast.Str)):
+        return version.LooseVersion(node.args[0].s)
+    raise ValueError(ast.dump(node))
+
+
+def collect_pick_dicts(filename):
+    """Returns the literal dicts passed to pick() in a file, with placeholder values"""
+    with open(filename) as f:
+        tree = ast.parse(f.read(), filename)
+    pick_dicts = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and
+                getattr(node.func, 'id', getattr(node.func, 'attr', None)) == 'pick' and
+                node.args and isinstance(node.args[0], ast.Dict)):
+            try:
+                pick_dicts.append({_key(key): object() for key in node.args[0].keys})
+            except ValueError:
+                # Computed keys, not representative
+                pass
+    return pick_dicts
+
+
+def python_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                for filename in sorted(filenames):
+                    if filename.endswith('.py'):
+                        yield os.path.join(dirpath, filename)
+        else:
+            yield path
+
+
+def benchmark(pick, pick_dicts, calls):
+    # The dicts are copied on every call, like the literals in the modules are built anew
+    start = time.time()
+    for i in xrange(calls):
+        for pick_dict in pick_dicts:
+            pick(dict(pick_dict))
+    return (time.time() - start) / (calls * len(pick_dicts))
+
+
+def main():
+    parser = argparse.ArgumentParser(epilog=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=['cfme/web_ui/menu.py'],
+        help='modules or directories to collect the pick() dicts from')
+    parser.add_argument('--version', default='5.4.0.1',
+        help='appliance version to pick for')
+    parser.add_argument('--calls', type=int, default=1000,
+        help='number of calls per pick() dict')
+    args = parser.parse_args()
+
+    current_version = version.get_version(args.version)
+    version.current_version = lambda: current_version
+
+    pick_dicts = []
+    for filename in python_files(args.paths):
+        pick_dicts.extend(collect_pick_dicts(filename))
+    if not pick_dicts:
+        print 'No literal pick() dicts found'
+        return 1
+
+    for pick_dict in pick_dicts:
+        if version.pick(pick_dict) is not uncompiled_pick(pick_dict):
+            print 'Picks differ for {}'.format(sorted(map(str, pick_dict)))
+
+    print '{} pick() dicts, {} calls each, version {}'.format(len(pick_dicts), args.calls,
+        current_version)
+    uncompiled = benchmark(uncompiled_pick, pick_dicts, args.calls)
+    compiled = benchmark(version.pick, pick_dicts, args.calls)
+    print 'uncompiled: {:8.2f} us per call'.format(uncompiled * 1e6)
+    print 'compiled:   {:8.2f} us per call ({:.1f}x)'.format(compiled * 1e6, uncompiled / compiled)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
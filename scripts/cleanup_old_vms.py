@@ -5,12 +5,9 @@ import datetime
 import re
 import sys
 from collections import defaultdict
-from threading import Lock, Thread
 
 from utils.log import logger
-from utils.providers import list_all_providers, provider_factory
-
-lock = Lock()
+from utils.providers import list_all_providers, provider_factory, vm_inventory
 
 
 def parse_cmd_line():
@@ -22,6 +19,8 @@ def parse_cmd_line():
         '(varies by provider, default 24)')
     parser.add_argument('--provider', dest='providers', action='append', default=None,
         help='Provider(s) to inspect, can be used multiple times', metavar='PROVIDER')
+    parser.add_argument('--timeout', default=1800, type=int,
+        help='Seconds to wait for the providers to be inspected (default 1800)')
     parser.add_argument('text_to_match', nargs='*', default=['^test_', '^jenkins', '^i-'],
         help='Regex in the name of vm to be affected, can be use multiple times'
         ' (Defaults to "^test_" and "^jenkins")')
@@ -37,55 +36,28 @@ def match(matchers, vm_name):
         return False
 
 
-def process_provider_vms(provider_key, matchers, delta, vms_to_delete):
-    with lock:
-        print '%s processing' % provider_key
-    try:
-        now = datetime.datetime.now()
-        provider = provider_factory(provider_key)
-        for vm_name in provider.list_vm():
-            if not match(matchers, vm_name):
-                continue
-
-            try:
-                vm_creation_time = provider.vm_creation_time(vm_name)
-            except:
-                logger.error('Failed to get creation/boot time for %s on %s' % (
-                    vm_name, provider_key))
-                continue
-
-            if vm_creation_time + delta < now:
-                vm_delta = now - vm_creation_time
-                with lock:
-                    vms_to_delete[provider_key].add((vm_name, vm_delta))
-        with lock:
-            print '%s finished' % provider_key
-    except Exception as ex:
-        with lock:
-            print '%s failed' % provider_key
-        logger.error('failed to process vms from provider %s', provider_key)
-        logger.exception(ex)
-
-
-def cleanup_vms(texts, max_hours=24, providers=None, prompt=True):
+def cleanup_vms(texts, max_hours=24, providers=None, prompt=True, timeout=1800):
     providers = providers or list_all_providers()
     delta = datetime.timedelta(hours=int(max_hours))
     vms_to_delete = defaultdict(set)
-    thread_queue = []
     # precompile regexes
     matchers = [re.compile(text) for text in texts]
 
-    for provider_key in providers:
-        thread = Thread(target=process_provider_vms,
-            args=(provider_key, matchers, delta, vms_to_delete))
-        # Mark as daemon thread for easy-mode KeyboardInterrupt handling
-        thread.daemon = True
-        thread_queue.append(thread)
-        thread.start()
+    print 'Inspecting %s' % ', '.join(providers)
+    now = datetime.datetime.now()
+    vms, errors = vm_inventory(providers, lambda vm_name: match(matchers, vm_name),
+        properties=('creation_time',), timeout=timeout)
+    for provider_key in errors:
+        print '%s failed' % provider_key
+
+    for vm in vms:
+        if vm.creation_time is None:
+            logger.error('Failed to get creation/boot time for %s on %s' % (
+                vm.name, vm.provider_key))
+            continue
 
-    # Join the queued calls
-    for thread in thread_queue:
-        thread.join()
+        if vm.creation_time + delta < now:
+            vms_to_delete[vm.provider_key].add((vm.name, now - vm.creation_time))
 
     for provider_key, vm_set in vms_to_delete.items():
         print '%s:' % provider_key
@@ -114,4 +86,5 @@ def cleanup_vms(texts, max_hours=24, providers=None, prompt=True):
 
 if __name__ == "__main__":
     args = parse_cmd_line()
-    sys.exit(cleanup_vms(args.text_to_match, args.max_hours, args.providers, args.prompt))
+    sys.exit(cleanup_vms(args.text_to_match, args.max_hours, args.providers, args.prompt,
+        args.timeout))
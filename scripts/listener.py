@@ -4,13 +4,20 @@
 # example calls
 #    curl -X PUT http://localhost:8080/events/VmRedhat/vm_name?event=vm_start
 #    curl -X GET http://localhost:8080/events
+#    curl -X GET http://localhost:8080/events/VmRedhat/vm_name?event=vm_start&wait=30
+#    curl -X POST -H 'Content-Type: application/json' http://localhost:8080/events/match \
+#        -d '{"wait": 30, "queries": [{"event_type": "VmRedhat", "event": "vm_start"}]}'
 
 import json
 import sqlite3
+import time
 from datetime import datetime
+from SocketServer import ThreadingMixIn
 from tempfile import NamedTemporaryFile
+from threading import Condition
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
 
-from bottle import run, route, request, response, install
+from bottle import HTTPError, ServerAdapter, run, route, request, response, install
 from bottle_sqlite import SQLitePlugin
 
 from utils.log import create_logger
@@ -20,6 +27,33 @@ logger = create_logger('events')
 
 TIME_FORMAT = "%Y-%m-%d-%H-%M-%S"
 
+# Longest long-poll allowed, in seconds
+MAX_WAIT = 300
+
+# Bindings of a single query of /events/match (sqlite allows 999 per statement)
+MATCH_CHUNK_SIZE = 150
+
+# Notified whenever events were added, wakes the long-polls up
+new_events = Condition()
+
+
+class ThreadingWSGIRefServer(ServerAdapter):
+    """bottle's wsgiref server, but serving each request in its own thread
+
+    The long-polls wait for the events, so they must not block the requests adding them.
+    """
+    def run(self, app):
+        class Server(ThreadingMixIn, WSGIServer):
+            daemon_threads = True
+
+        handler_cls = WSGIRequestHandler
+        if self.quiet:
+            class QuietHandler(WSGIRequestHandler):
+                def log_request(*args, **kwargs):
+                    pass
+            handler_cls = QuietHandler
+        make_server(self.host, self.port, app, Server, handler_cls).serve_forever()
+
 
 def main(host, port, quiet):
     # Initialize database
@@ -33,10 +67,15 @@ def main(host, port, quiet):
         event_time TIMESTAMP DEFAULT (datetime('now','localtime'))
     )
     """)
+    # Covers all the lookups, the time range included
+    cursor.execute("""
+    CREATE INDEX event_log_lookup ON event_log (event_type, resource_name, event, event_time)
+    """)
+    conn.commit()
 
     # Install sqlite bottle plugin
     install(SQLitePlugin(dbfile=db_file.name))
-    run(host=host, port=port, quiet=quiet)
+    run(server=ThreadingWSGIRefServer, host=host, port=port, quiet=quiet)
 
 
 def log_event(action, event_type=None, resource_name=None):
@@ -46,17 +85,8 @@ def log_event(action, event_type=None, resource_name=None):
         logger.info('%s "%s" event for resource "%s"', action, event_type)
 
 
-@route('/events', method='GET')
-@route('/events/', method='GET')
-@route('/events/<event_type>', method='GET')
-@route('/events/<event_type>/<resource_name>', method='GET')
-def events_list(db, event_type=None, resource_name=None):
-    response.content_type = 'application/json'
-
-    # Build SQL
-    sql = 'SELECT * FROM event_log'
-
-    # Build WHERE clause(s)
+def where(event_type=None, resource_name=None, event=None, time_from=None, time_to=None):
+    """Builds the WHERE clause matching the events, returns it with its bindings"""
     bindings = ()
     where_clause = list()
     if event_type is not None:
@@ -65,31 +95,110 @@ def events_list(db, event_type=None, resource_name=None):
     if resource_name is not None:
         where_clause.append('resource_name = ?')
         bindings += (resource_name,)
-    if request.query.event:
+    if event:
         where_clause.append('event = ?')
-        bindings += (request.query.event,)
-    if request.query.time_from:
-        time = datetime.strptime(request.query.time_from, TIME_FORMAT)
+        bindings += (event,)
+    if time_from:
         where_clause.append("event_time >= ?")
-        bindings += (time,)
-    if request.query.time_to:
-        time = datetime.strptime(request.query.time_to, TIME_FORMAT)
+        bindings += (datetime.strptime(time_from, TIME_FORMAT),)
+    if time_to:
         where_clause.append("event_time <= ?")
-        bindings += (time,)
+        bindings += (datetime.strptime(time_to, TIME_FORMAT),)
 
     if where_clause:
-        sql += ' WHERE %s' % " AND ".join(where_clause)
+        return ' WHERE %s' % " AND ".join(where_clause), bindings
+    return '', bindings
+
+
+def wait_param(value):
+    """Seconds to long-poll for, from the ``wait`` parameter"""
+    try:
+        return min(max(float(value or 0), 0), MAX_WAIT)
+    except ValueError:
+        raise HTTPError(400, 'wait must be a number of seconds')
+
+
+def long_poll(query, done, wait):
+    """Runs the query until ``done`` accepts its result or ``wait`` seconds pass
+
+    The query is repeated only when new events were added, no polling.
+    """
+    deadline = time.time() + wait
+    with new_events:
+        while True:
+            result = query()
+            remaining = deadline - time.time()
+            if done(result) or remaining <= 0:
+                return result
+            # Added events are only notified while holding the lock, none can be missed
+            new_events.wait(remaining)
+
+
+@route('/events', method='GET')
+@route('/events/', method='GET')
+@route('/events/<event_type>', method='GET')
+@route('/events/<event_type>/<resource_name>', method='GET')
+def events_list(db, event_type=None, resource_name=None):
+    response.content_type = 'application/json'
+
+    # Build SQL
+    where_clause, bindings = where(event_type, resource_name, request.query.event,
+        request.query.time_from, request.query.time_to)
+    sql = 'SELECT * FROM event_log' + where_clause
 
     # Order by time arrived
     sql += "  ORDER BY event_time ASC"
 
-    # execute query
-    c = db.execute(sql, bindings)
-
-    rows = c.fetchall()
+    # execute query, with wait= it returns once there is any matching event
+    rows = long_poll(lambda: db.execute(sql, bindings).fetchall(), bool,
+        wait_param(request.query.wait))
     return json.dumps([dict(r) for r in rows])
 
 
+def match_events(db, queries):
+    """Returns the time of the first event matching each of the queries, or None"""
+    matched = []
+    for i in range(0, len(queries), MATCH_CHUNK_SIZE):
+        selects, bindings = [], ()
+        for query in queries[i:i + MATCH_CHUNK_SIZE]:
+            where_clause, query_bindings = where(**query)
+            selects.append('SELECT MIN(event_time) FROM event_log' + where_clause)
+            bindings += query_bindings
+        # One statement for the whole chunk, every subquery is an index lookup
+        row = db.execute(
+            'SELECT %s' % ', '.join('(%s)' % select for select in selects), bindings).fetchone()
+        matched.extend(row)
+    return matched
+
+
+@route('/events/match', method='POST')
+def events_match(db):
+    """Matches many expectations at once
+
+    Expects a JSON object with a list of ``queries`` (objects with optional ``event_type``,
+    ``resource_name``, ``event``, ``time_from`` and ``time_to`` keys) and optionally the
+    seconds to ``wait``. Returns the time of the first matching event for each query, null
+    where none matched. When waiting, it returns as soon as any query not matched before
+    matches, or all of them do.
+    """
+    response.content_type = 'application/json'
+    data = request.json or {}
+    keys = {'event_type', 'resource_name', 'event', 'time_from', 'time_to'}
+    try:
+        queries = [{k: v for k, v in query.items() if k in keys} for query in data['queries']]
+    except (KeyError, TypeError, AttributeError):
+        raise HTTPError(400, 'queries must be a list of objects')
+
+    unmatched = [i for i, event_time in enumerate(match_events(db, queries))
+                 if event_time is None]
+
+    def done(matched):
+        return not unmatched or any(matched[i] is not None for i in unmatched)
+
+    return json.dumps(long_poll(lambda: match_events(db, queries), done,
+        wait_param(data.get('wait'))))
+
+
 @route("/events_count", method="GET")
 def events_count(db):
     response.content_type = "application/json"
@@ -106,6 +215,8 @@ def event_put(db, event_type, resource_name):
                                                                                   resource_name,
                                                                                   event)])
     db.commit()
+    with new_events:
+        new_events.notify_all()
     return dict(result='success')
 
 
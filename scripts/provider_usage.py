@@ -1,8 +1,10 @@
 #! /usr/bin/env python2
 from collections import defaultdict
-from utils.providers import provider_factory
+from multiprocessing.pool import ThreadPool
+from utils.providers import vm_inventory
 from utils.conf import cfme_data, jenkins
 from utils import appliance
+from utils.mgmt_system import OpenstackSystem, VMWareSystem
 from jinja2 import Environment, FileSystemLoader
 from utils.path import template_path
 import json
@@ -10,58 +12,57 @@ import json
 li = cfme_data['management_systems']
 users = jenkins['nicks']
 
-data = defaultdict(dict)
-
-
-def process_vm(vm, mgmt, user, prov):
-    print "Inspecting: {} on {}".format(vm, prov)
-    if mgmt.is_vm_stopped(vm):
-        return
-    ip = mgmt.get_ip_address(vm, timeout=1)
-    if ip:
-        with appliance.IPAppliance(ip) as app:
-            try:
-                ver = app.version
-                assert ver
-                ems = app.db['ext_management_systems']
-                with app.db.transaction:
-                    providers = (
-                        app.db.session.query(ems.ipaddress, ems.type)
-                    )
-                providers = [a[0] for a in providers if a[1] in
-                             ['EmsVmware', 'EmsOpenstack', 'EmsRedhat', 'EmsMicrosoft']]
-
-                for provider in providers:
-                    prov_name = prov_key_db.get(provider, 'Unknown ({})'.format(prov))
-                    if prov_name in data[user]:
-                        data[user][prov_name].append("{} ({})".format(vm, prov))
-                    else:
-                        data[user][prov_name] = ["{} ({})".format(vm, prov)]
+# vm_status() of the stopped VMs on the inspected provider types
+stopped_states = {VMWareSystem.POWERED_OFF, 'down'} | set(OpenstackSystem.states['stopped'])
 
-            except:
-                pass
+data = defaultdict(dict)
 
 
-def process_provider(mgmt, prov):
+def process_vm(vm, user):
+    print "Inspecting: {} on {}".format(vm.name, vm.provider_key)
+    # Not entered as a context, that would push it on the current appliance stack shared by the
+    # threads
+    app = appliance.IPAppliance(vm.ip)
     try:
-        vms = mgmt.list_vm()
+        ver = app.version
+        assert ver
+        ems = app.db['ext_management_systems']
+        with app.db.transaction:
+            providers = (
+                app.db.session.query(ems.ipaddress, ems.type)
+            )
+        return user, vm, [a[0] for a in providers if a[1] in
+                          ['EmsVmware', 'EmsOpenstack', 'EmsRedhat', 'EmsMicrosoft']]
     except:
-        return
-
-    for vm in vms:
-        for user in users:
-            if user in vm:
-                process_vm(vm, mgmt, user, prov)
+        return user, vm, []
 
 prov_key_db = {}
+inspected = []
 
 for prov in li:
     ip = li[prov].get('ipaddress', None)
     prov_key_db[ip] = prov
     if li[prov]['type'] not in ['ec2', 'scvmm']:
-        mgmt = provider_factory(prov)
-        print "DOING {}".format(prov)
-        process_provider(mgmt, prov)
+        inspected.append(prov)
+
+print "DOING {}".format(', '.join(inspected))
+vms, errors = vm_inventory(inspected, lambda vm_name: any(user in vm_name for user in users),
+    properties=('power_state', 'ip'))
+
+pool = ThreadPool(16)
+results = [
+    pool.apply_async(process_vm, (vm, user))
+    for vm in vms if vm.ip and vm.power_state not in stopped_states
+    for user in users if user in vm.name]
+for result in results:
+    user, vm, providers = result.get()
+    for provider in providers:
+        prov_name = prov_key_db.get(provider, 'Unknown ({})'.format(vm.provider_key))
+        if prov_name in data[user]:
+            data[user][prov_name].append("{} ({})".format(vm.name, vm.provider_key))
+        else:
+            data[user][prov_name] = ["{} ({})".format(vm.name, vm.provider_key)]
+pool.close()
 
 with open('provider_usage.json', 'w') as f:
     json.dump(data, f)
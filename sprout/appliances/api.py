@@ -309,6 +309,12 @@ def available_providers():
     return map(lambda group: group.id, Provider.objects.all())
 
 
+@jsonapi.method
+def provider_api_logins():
+    """Returns how many times the workers logged in to each provider"""
+    return {provider.id: provider.api_logins for provider in Provider.objects.all()}
+
+
 @jsonapi.authenticated_method
 def add_provider(user, provider_key):
     if not user.is_staff:
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import yaml
+
+from django.db import models, migrations
+
+METADATA_MODELS = [
+    'appliance', 'appliancepool', 'delayedprovisiontask', 'group', 'provider', 'template']
+
+
+def convert_metadata(apps, load, dump):
+    for model_name in METADATA_MODELS:
+        model = apps.get_model('appliances', model_name)
+        for pk, meta_data in model.objects.values_list('pk', 'object_meta_data').iterator():
+            model.objects.filter(pk=pk).update(object_meta_data=dump(load(meta_data)))
+
+
+def json_default(value):
+    # The YAML documents could contain sets (eg. managed_providers), JSON has no such type
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError("{!r} is not JSON serializable".format(value))
+
+
+def dump_json(value):
+    return json.dumps(value, sort_keys=True, default=json_default)
+
+
+def yaml_to_json(apps, schema_editor):
+    convert_metadata(apps, yaml.load, dump_json)
+
+
+def json_to_yaml(apps, schema_editor):
+    convert_metadata(apps, json.loads, yaml.safe_dump)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appliances', '0019_auto_20150430_1546'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name=model_name,
+            name='object_meta_data',
+            field=models.TextField(default='{}'),
+        )
+        for model_name in METADATA_MODELS
+    ] + [
+        migrations.RunPython(yaml_to_json, json_to_yaml),
+    ]
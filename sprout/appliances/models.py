@@ -1,4 +1,9 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import threading
+import time
 import yaml
 
 from contextlib import contextmanager
@@ -6,14 +11,17 @@ from datetime import timedelta, date
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models, transaction
+from django.db.models import Case, Count, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
-from sprout import critical_section
+from sprout import critical_section, redis
 from sprout.log import create_logger
 
 from utils import mgmt_system
 from utils.appliance import Appliance as CFMEAppliance, IPAppliance
-from utils.conf import cfme_data
+from utils.conf import cfme_data, credentials
 from utils.providers import provider_factory
 from utils.timeutil import nice_seconds
 from utils.version import LooseVersion
@@ -26,41 +34,157 @@ def apply_if_not_none(o, meth, *args, **kwargs):
 
 
 class MetadataMixin(models.Model):
+    """Free-form metadata of the object, stored as a JSON document in the object_meta_data column
+
+    The parsed document is cached per instance until the stored one changes. Keys are updated
+    atomically with :py:meth:`update_metadata`, :py:meth:`delete_metadata` or
+    :py:attr:`edit_metadata`, by a compare-and-swap of the stored document. Concurrent updates
+    of other keys are kept, no lock is needed.
+    """
     class Meta:
         abstract = True
-    object_meta_data = models.TextField(default=yaml.dump({}))
+    object_meta_data = models.TextField(default="{}")
+
+    #: How many times an update is retried when other updates keep changing the document
+    METADATA_UPDATE_ATTEMPTS = 20
+
+    #: Fields whose changes trigger the scheduling passes, see :py:meth:`changed_fields`
+    EVENT_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(MetadataMixin, cls).from_db(db, field_names, values)
+        instance._stored_meta_data = instance.__dict__.get("object_meta_data")
+        instance._remember_event_fields()
+        return instance
+
+    def _remember_event_fields(self):
+        self._stored_event_fields = {
+            field: self.__dict__[field] for field in self.EVENT_FIELDS if field in self.__dict__}
+
+    def changed_fields(self):
+        """Returns which of the :py:attr:`EVENT_FIELDS` changed since the object was loaded
+
+        Meant for the ``post_save`` signal handlers, all of them for a new object.
+        """
+        stored = getattr(self, "_stored_event_fields", None)
+        if stored is None:
+            return set(self.EVENT_FIELDS)
+        return {
+            field for field, value in stored.iteritems() if self.__dict__.get(field) != value}
+
+    def save(self, *args, **kwargs):
+        # Unless the metadata was assigned, do not overwrite the updates done to it meanwhile
+        stored_meta_data = getattr(self, "_stored_meta_data", None)
+        if (stored_meta_data is not None and not self._state.adding
+                and self.object_meta_data == stored_meta_data
+                and not (args or kwargs.get("force_insert") or "update_fields" in kwargs)):
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "object_meta_data"
+                and field.attname in self.__dict__]
+        super(MetadataMixin, self).save(*args, **kwargs)
+        self._stored_meta_data = self.object_meta_data
+        self._remember_event_fields()
 
     def reload(self):
         new_self = self.__class__.objects.get(pk=self.pk)
         self.__dict__.update(new_self.__dict__)
 
-    @property
-    @contextmanager
-    def metadata_lock(self):
-        with critical_section("metadata-({})[{}]".format(self.__class__.__name__, str(self.pk))):
-            yield
+    @staticmethod
+    def _load_metadata(meta_data):
+        try:
+            return json.loads(meta_data)
+        except ValueError:
+            # Written as YAML by an older version
+            return yaml.load(meta_data)
+
+    @staticmethod
+    def _json_default(value):
+        # YAML could store sets, JSON has no such type
+        if isinstance(value, (set, frozenset)):
+            return sorted(value)
+        raise TypeError("{!r} is not JSON serializable".format(value))
+
+    @classmethod
+    def _dump_metadata(cls, value):
+        if not isinstance(value, dict):
+            raise TypeError("You can store only dict in metadata!")
+        return json.dumps(value, sort_keys=True, default=cls._json_default)
 
     @property
     def metadata(self):
-        return yaml.load(self.object_meta_data)
+        """The parsed metadata
+
+        It is shared by the calls until the metadata changes, do not modify it in place.
+        """
+        cached = self.__dict__.get("_metadata_cache")
+        if cached is None or cached[0] != self.object_meta_data:
+            cached = (self.object_meta_data, self._load_metadata(self.object_meta_data))
+            self._metadata_cache = cached
+        return cached[1]
 
     @metadata.setter
     def metadata(self, value):
-        if not isinstance(value, dict):
-            raise TypeError("You can store only dict in metadata!")
-        self.object_meta_data = yaml.dump(value)
+        self.object_meta_data = self._dump_metadata(value)
+
+    def _change_metadata(self, change, meta_data=None):
+        """Applies the change to the stored metadata, retried until no other update interferes
+
+        Args:
+            change: Function modifying the metadata dict in place
+            meta_data: The stored document to try first, fetched when not passed
+        """
+        model = type(self)
+        for _ in range(self.METADATA_UPDATE_ATTEMPTS):
+            if meta_data is None:
+                meta_data = model.objects.filter(pk=self.pk).values_list(
+                    "object_meta_data", flat=True).get()
+            metadata = self._load_metadata(meta_data)
+            change(metadata)
+            new_meta_data = self._dump_metadata(metadata)
+            # Only succeeds if nobody changed the document since it was read
+            if new_meta_data == meta_data or model.objects.filter(
+                    pk=self.pk, object_meta_data=meta_data).update(object_meta_data=new_meta_data):
+                self.object_meta_data = self._stored_meta_data = new_meta_data
+                return
+            meta_data = None
+        raise RuntimeError(
+            "Could not update the metadata of {}, too many concurrent updates".format(self))
+
+    def update_metadata(self, **values):
+        """Atomically sets the keys of the metadata to the values"""
+        self._change_metadata(lambda metadata: metadata.update(values))
+
+    def delete_metadata(self, *keys):
+        """Atomically removes the keys from the metadata, if present"""
+        def delete(metadata):
+            for key in keys:
+                metadata.pop(key, None)
+        self._change_metadata(delete)
 
     @property
     @contextmanager
     def edit_metadata(self):
-        with transaction.atomic():
-            with self.metadata_lock:
-                o = type(self).objects.get(pk=self.pk)
-                metadata = o.metadata
-                yield metadata
-                o.metadata = metadata
-                o.save()
-        self.reload()
+        """Yields the metadata to modify, the modified keys are then saved atomically
+
+        Keys modified concurrently by others in the meantime are kept, unless modified here too.
+        """
+        meta_data = type(self).objects.filter(pk=self.pk).values_list(
+            "object_meta_data", flat=True).get()
+        original = self._load_metadata(meta_data)
+        metadata = self._load_metadata(meta_data)
+        yield metadata
+        changed = {
+            key: value for key, value in metadata.iteritems()
+            if key not in original or original[key] != value}
+        deleted = set(original) - set(metadata)
+
+        def apply_changes(current):
+            current.update(changed)
+            for key in deleted:
+                current.pop(key, None)
+        self._change_metadata(apply_changes, meta_data)
 
     @property
     def logger(self):
@@ -82,6 +206,122 @@ class DelayedProvisionTask(MetadataMixin):
             self.provider_to_avoid.id if self.provider_to_avoid is not None else "---")
 
 
+class ProviderQuerySet(models.QuerySet):
+    def with_load(self):
+        """Annotates the providers with the figures their load is computed from
+
+        All of them are counted by a single query, grouped by provider, instead of loading the
+        appliances and templates of every provider. The :py:class:`Provider` properties use the
+        annotated figures when present.
+        """
+        appliance_id = "template__appliance__id"
+        return self.annotate(
+            _num_currently_provisioning=Count(
+                Case(When(
+                    template__appliance__ready=False,
+                    template__appliance__marked_for_deletion=False,
+                    template__appliance__ip_address__isnull=True,
+                    then=appliance_id)),
+                distinct=True),
+            _num_templates_preparing=Count(
+                Case(When(template__ready=False, then="template__id")), distinct=True),
+            _num_currently_managing=Count(appliance_id, distinct=True))
+
+    def loaded(self):
+        """Returns a dict of the providers annotated by :py:meth:`with_load`, by their ids"""
+        return {provider.id: provider for provider in self.with_load()}
+
+
+#: Seconds a cached provider client may stay unused before it is dropped
+PROVIDER_API_IDLE_TIME = 15 * 60
+#: Seconds a cached provider client is reused before its session is checked again
+PROVIDER_API_CHECK_TIME = 60
+#: Redis hash counting the logins of the workers by provider id
+PROVIDER_API_LOGINS_KEY = "provider-api-logins"
+
+_provider_apis = {}
+_provider_apis_lock = threading.Lock()
+_provider_apis_pid = None
+
+
+class _CachedProviderApi(object):
+    def __init__(self, digest, api):
+        self.digest = digest
+        self.api = api
+        self.last_used = self.last_checked = time.time()
+
+
+def _credentials_digest(provider_id):
+    provider_data = cfme_data.get("management_systems", {})[provider_id]
+    provider_credentials = credentials[provider_data["credentials"]]
+    return hashlib.sha1(
+        json.dumps([provider_data, provider_credentials], sort_keys=True, default=str)).hexdigest()
+
+
+def _drop_provider_api(provider_id, cached):
+    try:
+        cached.api.disconnect()
+    except Exception as e:
+        Provider.class_logger(provider_id).warning(
+            "Could not disconnect the cached client: {}".format(e))
+
+
+def _count_provider_login(provider_id):
+    try:
+        redis.client.hincrby(PROVIDER_API_LOGINS_KEY, provider_id, 1)
+    except Exception as e:
+        # Only a metric, must not break the task
+        Provider.class_logger(provider_id).warning("Could not count the login: {}".format(e))
+
+
+def provider_api(provider_id):
+    """Returns the management system client of the provider, reused across the tasks of a worker
+
+    The clients are cached per process by provider id and a digest of the provider's data and
+    credentials, a change of either makes a new client. A client reused after
+    :py:data:`PROVIDER_API_CHECK_TIME` is checked by its ``ping()`` round trip to the provider
+    first and replaced (logging in again) if its session is gone. Clients unused for
+    :py:data:`PROVIDER_API_IDLE_TIME` are disconnected and dropped. Every new client, which means
+    a new login, is counted in the :py:data:`PROVIDER_API_LOGINS_KEY` redis hash.
+    """
+    global _provider_apis_pid
+    digest = _credentials_digest(provider_id)
+    now = time.time()
+    idle = []
+    with _provider_apis_lock:
+        if _provider_apis_pid != os.getpid():
+            # Forked worker, the sessions belong to the parent process
+            _provider_apis.clear()
+            _provider_apis_pid = os.getpid()
+        for key, cached in _provider_apis.items():
+            if now - cached.last_used > PROVIDER_API_IDLE_TIME:
+                idle.append((key, _provider_apis.pop(key)))
+        # Taken out while checked, so the lock is not held during the calls to the provider
+        cached = _provider_apis.pop(provider_id, None)
+    for key, idle_api in idle:
+        _drop_provider_api(key, idle_api)
+    if cached is not None and cached.digest != digest:
+        _drop_provider_api(provider_id, cached)
+        cached = None
+    if cached is not None and now - cached.last_checked > PROVIDER_API_CHECK_TIME:
+        try:
+            cached.api.ping()
+        except Exception as e:
+            Provider.class_logger(provider_id).info(
+                "Cached client is not usable anymore, logging in again: {}".format(e))
+            _drop_provider_api(provider_id, cached)
+            cached = None
+        else:
+            cached.last_checked = now
+    if cached is None:
+        cached = _CachedProviderApi(digest, provider_factory(provider_id))
+        _count_provider_login(provider_id)
+    cached.last_used = now
+    with _provider_apis_lock:
+        _provider_apis[provider_id] = cached
+    return cached.api
+
+
 class Provider(MetadataMixin):
     id = models.CharField(max_length=32, primary_key=True, help_text="Provider's key in YAML.")
     working = models.BooleanField(default=False, help_text="Whether provider is available.")
@@ -92,19 +332,32 @@ class Provider(MetadataMixin):
     appliance_limit = models.IntegerField(
         null=True, help_text="Hard limit of how many appliances can run on this provider")
 
+    objects = ProviderQuerySet.as_manager()
+
+    EVENT_FIELDS = ("working", "num_simultaneous_provisioning", "appliance_limit")
+
     @property
     def api(self):
-        return provider_factory(self.id)
+        return provider_api(self.id)
+
+    @property
+    def api_logins(self):
+        """How many times the workers logged in to the provider, see :py:func:`provider_api`"""
+        return int(redis.client.hget(PROVIDER_API_LOGINS_KEY, self.id) or 0)
 
     @property
     def num_currently_provisioning(self):
-        return len(
-            Appliance.objects.filter(
-                ready=False, marked_for_deletion=False, template__provider=self, ip_address=None))
+        if hasattr(self, "_num_currently_provisioning"):
+            return self._num_currently_provisioning
+        return Appliance.objects.filter(
+            ready=False, marked_for_deletion=False, template__provider=self,
+            ip_address=None).count()
 
     @property
     def num_templates_preparing(self):
-        return len(Template.objects.filter(provider=self, ready=False))
+        if hasattr(self, "_num_templates_preparing"):
+            return self._num_templates_preparing
+        return Template.objects.filter(provider=self, ready=False).count()
 
     @property
     def remaining_configuring_slots(self):
@@ -124,7 +377,20 @@ class Provider(MetadataMixin):
 
     @property
     def num_currently_managing(self):
-        return len(Appliance.objects.filter(template__provider=self))
+        if hasattr(self, "_num_currently_managing"):
+            return self._num_currently_managing
+        return Appliance.objects.filter(template__provider=self).count()
+
+    def count_new_appliance(self):
+        """Keeps the annotated load figures right after an appliance was added to the provider
+
+        A scheduling pass works with the figures it loaded at its start, this accounts for the
+        appliances the pass itself started provisioning.
+        """
+        if hasattr(self, "_num_currently_provisioning"):
+            self._num_currently_provisioning += 1
+        if hasattr(self, "_num_currently_managing"):
+            self._num_currently_managing += 1
 
     @property
     def currently_managed_appliances(self):
@@ -186,8 +452,7 @@ class Provider(MetadataMixin):
 
     @templates.setter
     def templates(self, value):
-        with self.edit_metadata as metadata:
-            metadata["templates"] = value
+        self.update_metadata(templates=value)
 
     @property
     def template_name_length(self):
@@ -195,8 +460,7 @@ class Provider(MetadataMixin):
 
     @template_name_length.setter
     def template_name_length(self, value):
-        with self.edit_metadata as metadata:
-            metadata["template_name_length"] = value
+        self.update_metadata(template_name_length=value)
 
     @property
     def appliances_manage_this_provider(self):
@@ -204,8 +468,7 @@ class Provider(MetadataMixin):
 
     @appliances_manage_this_provider.setter
     def appliances_manage_this_provider(self, value):
-        with self.edit_metadata as metadata:
-            metadata["appliances_manage_this_provider"] = value
+        self.update_metadata(appliances_manage_this_provider=value)
 
     @property
     def g_appliances_manage_this_provider(self):
@@ -289,6 +552,8 @@ class Group(MetadataMixin):
         help_text="If template_obsolete_days set, this will enable deletion of obsolete templates"
         " using that metric. WARNING! Use with care. Best use for upstream templates.")
 
+    EVENT_FIELDS = ("template_pool_size", "unconfigured_template_pool_size")
+
     @property
     def obsolete_templates(self):
         """Return a list of obsolete templates. Ignores the latest one even if it was obsolete by
@@ -338,10 +603,9 @@ class Group(MetadataMixin):
         Args:
             preconfigured: Whether to check the pure ones or configured ones.
         """
-        appliances_in_shepherd = len(
-            self.appliances.filter(
-                template__preconfigured=preconfigured, appliance_pool=None,
-                marked_for_deletion=False))
+        appliances_in_shepherd = self.appliances.filter(
+            template__preconfigured=preconfigured, appliance_pool=None,
+            marked_for_deletion=False).count()
         wanted_pool_size = (
             self.template_pool_size if preconfigured else self.unconfigured_template_pool_size)
         if wanted_pool_size == 0:
@@ -371,6 +635,8 @@ class Template(MetadataMixin):
 
     preconfigured = models.BooleanField(default=True, help_text="Is prepared for immediate use?")
 
+    EVENT_FIELDS = ("ready", "exists", "usable")
+
     @property
     def provider_api(self):
         return self.provider.api
@@ -409,14 +675,11 @@ class Template(MetadataMixin):
 
     @temporary_name.setter
     def temporary_name(self, name):
-        with self.edit_metadata as metadata:
-            metadata["temporary_name"] = name
+        self.update_metadata(temporary_name=name)
 
     @temporary_name.deleter
     def temporary_name(self):
-        with self.edit_metadata as metadata:
-            if "temporary_name" in metadata:
-                del metadata["temporary_name"]
+        self.delete_metadata("temporary_name")
 
     @classmethod
     def get_versions(cls, **filters):
@@ -496,6 +759,8 @@ class Appliance(MetadataMixin):
     uuid = models.CharField(max_length=36, null=True, blank=True, help_text="UUID of the machine")
     description = models.TextField(blank=True)
 
+    EVENT_FIELDS = ("ready", "ip_address", "appliance_pool_id", "marked_for_deletion")
+
     @property
     def serialized(self):
         return dict(
@@ -674,14 +939,50 @@ class Appliance(MetadataMixin):
 
     @managed_providers.setter
     def managed_providers(self, value):
-        with self.edit_metadata as metadata:
-            metadata["managed_providers"] = value
+        self.update_metadata(managed_providers=sorted(value))
 
     @property
     def vnc_link(self):
         return self.provider.vnc_console_link_for(self)
 
 
+@contextmanager
+def appliance_placement():
+    """Serializes placing new appliances on the providers
+
+    The scheduling passes run concurrently, so each of them would see the same free slots. Yields
+    the providers as :py:meth:`ProviderQuerySet.loaded` returns them, loaded after the previous
+    placement finished. The placed appliances must be saved before leaving the block so that the
+    next placement counts them.
+    """
+    with critical_section("appliance-placement"):
+        yield Provider.objects.loaded()
+
+
+def place_appliances(templates, count):
+    """Places the appliances on the templates, spread across their providers in one step
+
+    Every appliance goes to the template of the newest date on the least loaded provider which
+    still has a free slot, respecting ``num_simultaneous_provisioning`` and ``appliance_limit``.
+    The placed appliances are counted on the providers, so they must be annotated by
+    :py:meth:`ProviderQuerySet.with_load` and shared by the templates on the same provider.
+    Call it inside :py:func:`appliance_placement` with the providers it yields.
+
+    Returns:
+        A list of the templates to clone, one per appliance. Shorter if the providers ran out of
+        free slots.
+    """
+    placement = []
+    for i in range(count):
+        free = [tpl for tpl in templates if tpl.provider.free]
+        if not free:
+            break
+        template = max(free, key=lambda tpl: (tpl.date, 1.0 - tpl.provider.load))
+        template.provider.count_new_appliance()
+        placement.append(template)
+    return placement
+
+
 class AppliancePool(MetadataMixin):
     total_count = models.IntegerField(help_text="How many appliances should be in this pool.")
     group = models.ForeignKey(Group, help_text="Group which is used to provision appliances.")
@@ -699,6 +1000,8 @@ class AppliancePool(MetadataMixin):
         default=False, help_text="Used for marking the appliance pool as being deleted")
     finished = models.BooleanField(default=False, help_text="Whether fulfillment has been met.")
 
+    EVENT_FIELDS = ("not_needed_anymore",)
+
     @classmethod
     def create(cls, owner, group, version=None, date=None, provider=None, num_appliances=1,
             time_leased=60, preconfigured=True):
@@ -772,11 +1075,40 @@ class AppliancePool(MetadataMixin):
 
     @property
     def possible_provisioning_templates(self):
+        return self.get_possible_provisioning_templates(Provider.objects.loaded())
+
+    def get_possible_provisioning_templates(self, providers):
+        """Returns the templates to provision from, the best match first
+
+        Args:
+            providers: Dict of the providers by id, annotated by
+                :py:meth:`ProviderQuerySet.with_load`, shared by the whole scheduling pass
+        """
+        templates = list(self.possible_templates)
+        for template in templates:
+            # Providers added since the pass started load their figures on their own
+            if template.provider_id in providers:
+                template.provider = providers[template.provider_id]
         return sorted(
-            filter(lambda tpl: tpl.provider.free, self.possible_templates),
+            filter(lambda tpl: tpl.provider.free, templates),
             # Sort by date and load to pick the best match (least loaded provider)
             key=lambda tpl: (tpl.date, 1.0 - tpl.provider.appliance_load), reverse=True)
 
+    def plan_provisioning(self, providers, count):
+        """Returns the templates to clone count appliances of the pool from, see
+        :py:func:`place_appliances`
+
+        All of them are of the version and date of the best match, the pool keeps to them once
+        it has appliances.
+        """
+        templates = self.get_possible_provisioning_templates(providers)
+        if not templates:
+            return []
+        best = templates[0]
+        return place_appliances(
+            [tpl for tpl in templates if (tpl.version, tpl.date) == (best.version, best.date)],
+            count)
+
     @property
     def possible_providers(self):
         """Which providers contain a template that could be used for provisioning?."""
@@ -890,9 +1222,8 @@ class AppliancePool(MetadataMixin):
 
     @property
     def num_possible_appliance_slots(self):
-        providers = set([])
-        for template in self.possible_templates:
-            providers.add(template.provider)
+        providers = Provider.objects.filter(
+            id__in=self.possible_templates.values("provider")).with_load()
         slots = 0
         for provider in providers:
             slots += provider.remaining_appliance_slots
@@ -917,3 +1248,69 @@ class MismatchVersionMailer(models.Model):
     supposed_version = models.CharField(max_length=32)
     actual_version = models.CharField(max_length=32)
     sent = models.BooleanField(default=False)
+
+
+# Events triggering the scheduling passes, only for the group or provider they concern
+@receiver(post_save, sender=Template)
+def template_saved(sender, instance, created, **kwargs):
+    from appliances.tasks import schedule_provisioning_pass, schedule_shepherd_pass
+    if not created and instance.changed_fields():
+        # Marked ready, usable or gone
+        schedule_shepherd_pass(instance.template_group_id)
+        schedule_provisioning_pass(instance.provider_id)
+
+
+@receiver(post_save, sender=Appliance)
+def appliance_saved(sender, instance, created, **kwargs):
+    from appliances.tasks import schedule_capacity_passes, schedule_shepherd_pass
+    if created:
+        return  # Added by the passes themselves
+    changed = instance.changed_fields()
+    if changed & {"ready", "ip_address"}:
+        # Finished provisioning, the provider has a slot free
+        schedule_capacity_passes(instance.template.provider_id)
+    if changed & {"appliance_pool_id", "marked_for_deletion"}:
+        # Taken from the shepherd or returned to it, or killed
+        schedule_shepherd_pass(instance.template.template_group_id)
+
+
+@receiver(post_delete, sender=Appliance)
+def appliance_deleted(sender, instance, **kwargs):
+    from appliances.tasks import schedule_capacity_passes, schedule_shepherd_pass
+    try:
+        template = instance.template
+    except ObjectDoesNotExist:
+        return  # Deleted together with the template
+    schedule_shepherd_pass(template.template_group_id)
+    schedule_capacity_passes(template.provider_id)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    from appliances.tasks import schedule_shepherd_pass
+    if instance.changed_fields():
+        # The shepherd pool size changed
+        schedule_shepherd_pass(instance.id)
+
+
+@receiver(post_save, sender=Provider)
+def provider_saved(sender, instance, created, **kwargs):
+    from appliances.tasks import schedule_capacity_passes
+    if not created and instance.changed_fields():
+        # Working again or the limits changed, it may have free slots now
+        schedule_capacity_passes(instance.id)
+
+
+@receiver(post_save, sender=AppliancePool)
+def appliance_pool_saved(sender, instance, created, **kwargs):
+    from appliances.tasks import schedule_shepherd_pass
+    if instance.changed_fields():
+        # Takes appliances from the shepherd, or returns them when killed
+        schedule_shepherd_pass(instance.group_id)
+
+
+@receiver(post_save, sender=DelayedProvisionTask)
+def delayed_provision_task_saved(sender, instance, created, **kwargs):
+    from appliances.tasks import schedule_provisioning_pass
+    if created:
+        schedule_provisioning_pass(None)
@@ -19,11 +19,12 @@ from novaclient.exceptions import OverLimit as OSOverLimit
 
 from appliances.models import (
     Provider, Group, Template, Appliance, AppliancePool, DelayedProvisionTask,
-    MismatchVersionMailer)
+    MismatchVersionMailer, appliance_placement, place_appliances)
 from sprout import settings, redis
 from sprout.log import create_logger
 
 from utils.appliance import Appliance as CFMEAppliance
+from utils.mgmt_system.base import VMInfo
 from utils.path import project_path
 from utils.providers import provider_factory
 from utils.timeutil import parsetime
@@ -31,6 +32,8 @@ from utils.trackerbot import api, parse_template
 
 
 LOCK_EXPIRE = 60 * 15  # 15 minutes
+# Events coming in this many seconds are served by a single scheduling pass
+EVENT_COALESCE_TIME = 10
 VERSION_REGEXPS = [
     r"^cfme-(\d)(\d)(\d)(\d)(\d{2})",  # 1.2.3.4.11
     # newer format
@@ -116,6 +119,76 @@ def singleton_task(*args, **kwargs):
     return f
 
 
+def _args_digest(args):
+    return hashlib.sha256("/".join(str(arg) for arg in args)).hexdigest()
+
+
+def _scheduled_id(task_name, args):
+    return '{0}-scheduled-{1}'.format(task_name, _args_digest(args))
+
+
+def schedule_once(task, *args):
+    """Schedules a :py:func:`coalesced_task` to run in :py:const:`EVENT_COALESCE_TIME` seconds
+
+    Does nothing when a run with the same arguments is already scheduled, so that a burst of
+    events causes a single run.
+    """
+    if cache.add(_scheduled_id(task.name, args), 'true', LOCK_EXPIRE):
+        task.apply_async(args=args, countdown=EVENT_COALESCE_TIME)
+
+
+def coalesced_task(*args, **kwargs):
+    """Task scheduled by the events through :py:func:`schedule_once`
+
+    Runs one at a time for the same arguments. A run scheduled while the previous one still runs
+    is postponed, not dropped, so no event is missed.
+    """
+    kwargs["bind"] = True
+
+    def f(task):
+        @wraps(task)
+        def wrapped_task(self, *args):
+            self.logger = create_logger(task)
+            lock_id = '{0}-lock-{1}'.format(self.name, _args_digest(args))
+            if not cache.add(lock_id, 'true', LOCK_EXPIRE):
+                self.logger.info("Already running, postponing.")
+                self.apply_async(args=args, countdown=EVENT_COALESCE_TIME)
+                return
+            # The events from now on need another run
+            cache.delete(_scheduled_id(self.name, args))
+            self.logger.info("Entering with arguments: {}".format(", ".join(map(str, args))))
+            try:
+                return task(self, *args)
+            finally:
+                cache.delete(lock_id)
+                self.logger.info("Leaving")
+
+        return shared_task(*args, **kwargs)(wrapped_task)
+    return f
+
+
+def schedule_shepherd_pass(group_id):
+    """Replenishes or trims the shepherd of the group soon, see :py:func:`group_shepherd`"""
+    schedule_once(group_shepherd, group_id)
+
+
+def schedule_provisioning_pass(provider_id):
+    """Processes the delayed provisioning tasks which the provider could serve soon
+
+    Pass None for all the providers.
+    """
+    schedule_once(provider_delayed_provision_tasks, provider_id)
+
+
+def schedule_capacity_passes(provider_id):
+    """The provider has free slots again, runs the passes which may be waiting for them soon"""
+    schedule_provisioning_pass(provider_id)
+    for group_id in Template.objects.filter(
+            provider_id=provider_id, ready=True, usable=True).values_list(
+                "template_group", flat=True).distinct():
+        schedule_shepherd_pass(group_id)
+
+
 @singleton_task()
 def kill_unused_appliances(self):
     """This is the watchdog, that guards the appliances that were given to users. If you forget
@@ -491,15 +564,15 @@ def request_appliance_pool(self, appliance_pool_id, time_minutes):
         "Appliance pool {} requested for {} minutes.".format(appliance_pool_id, time_minutes))
     pool = AppliancePool.objects.get(id=appliance_pool_id)
     n = Appliance.give_to_pool(pool)
-    for i in range(pool.total_count - n):
-        tpls = pool.possible_provisioning_templates
-        if tpls:
-            template_id = tpls[0].id
-            clone_template_to_pool(template_id, pool.id, time_minutes)
-        else:
-            with transaction.atomic():
-                task = DelayedProvisionTask(pool=pool, lease_time=time_minutes)
-                task.save()
+    missing = pool.total_count - n
+    # The whole pool is placed at once, the rest waits for free slots
+    with appliance_placement() as providers:
+        placement = pool.plan_provisioning(providers, missing)
+        clone_templates_to_pool([template.id for template in placement], pool.id, time_minutes)
+    with transaction.atomic():
+        for i in range(missing - len(placement)):
+            task = DelayedProvisionTask(pool=pool, lease_time=time_minutes)
+            task.save()
     apply_lease_times_after_pool_fulfilled.delay(appliance_pool_id, time_minutes)
 
 
@@ -535,36 +608,80 @@ def process_delayed_provision_tasks(self):
     Goes one task by one and when some of them can be provisioned, it starts the provisioning and
     then deletes the task.
     """
+    delayed_provision_tasks()
+
+
+@coalesced_task()
+def provider_delayed_provision_tasks(self, provider_id):
+    """Event-driven :py:func:`process_delayed_provision_tasks`, just for the tasks the provider
+    could serve. All of them if provider_id is None."""
+    delayed_provision_tasks(provider_id)
+
+
+def delayed_provision_tasks(provider_id=None):
+    providers = Provider.objects.loaded()
     for task in DelayedProvisionTask.objects.order_by("id"):
-        if task.pool.not_needed_anymore:
-            task.delete()
+        if provider_id is not None and provider_id not in {
+                provider.id for provider in task.pool.possible_providers}:
+            continue
+        # The periodic and the event-driven passes can run at once, each task is for one of them
+        lock_id = "delayed-provision-task-lock-{}".format(task.id)
+        if not cache.add(lock_id, 'true', LOCK_EXPIRE):
             continue
-        # Try retrieve from shepherd
-        appliances_given = Appliance.give_to_pool(task.pool, 1)
-        if appliances_given == 0:
-            # No free appliance in shepherd, so do it on our own
-            tpls = task.pool.possible_provisioning_templates
-            if task.provider_to_avoid is not None:
-                filtered_tpls = filter(lambda tpl: tpl.provider != task.provider_to_avoid, tpls)
-                if filtered_tpls:
-                    # There are other providers to provision on, so try one of them
-                    tpls = filtered_tpls
-                # If there is no other provider to provision on, we will use the original list.
-                # This will cause additional rejects until the provider quota is met
+        try:
+            if DelayedProvisionTask.objects.filter(id=task.id).exists():
+                process_delayed_provision_task(task, providers)
+        finally:
+            cache.delete(lock_id)
+
+
+def delayed_task_templates(task, providers):
+    """Returns the templates to provision the appliance of the delayed task from, the best first"""
+    tpls = task.pool.get_possible_provisioning_templates(providers)
+    if task.provider_to_avoid is not None:
+        filtered_tpls = filter(lambda tpl: tpl.provider != task.provider_to_avoid, tpls)
+        if filtered_tpls:
+            # There are other providers to provision on, so try one of them
+            tpls = filtered_tpls
+        # If there is no other provider to provision on, we will use the original list.
+        # This will cause additional rejects until the provider quota is met
+    return tpls
+
+
+def process_delayed_provision_task(task, providers):
+    """Provisions an appliance for the delayed task if possible, then deletes the task
+
+    The providers of the pass only tell whether to try, the appliance is placed with the
+    providers loaded by :py:func:`appliance_placement`.
+    """
+    if task.pool.not_needed_anymore:
+        task.delete()
+        return
+    # Try retrieve from shepherd
+    appliances_given = Appliance.give_to_pool(task.pool, 1)
+    if appliances_given == 0:
+        # No free appliance in shepherd, so do it on our own
+        tpls = delayed_task_templates(task, providers)
+        if tpls:
+            with appliance_placement() as current_providers:
+                tpls = delayed_task_templates(task, current_providers)
+                if tpls:
+                    clone_template_to_pool(tpls[0].id, task.pool.id, task.lease_time)
+                    task.delete()
             if tpls:
-                clone_template_to_pool(tpls[0].id, task.pool.id, task.lease_time)
-                task.delete()
-            else:
-                # Try freeing up some space in provider
-                for provider in task.pool.possible_providers:
-                    appliances = provider.free_shepherd_appliances.exclude(
-                        **task.pool.appliance_filter_params)
-                    if appliances:
-                        Appliance.kill(random.choice(appliances))
-                        break  # Just one
+                # Keeps the providers of the pass from trying the slot again
+                providers.get(tpls[0].provider_id, tpls[0].provider).count_new_appliance()
         else:
-            # There was a free appliance in shepherd, so we took it and we don't need this task more
-            task.delete()
+            # Try freeing up some space in provider
+            for provider in task.pool.possible_providers:
+                appliances = provider.free_shepherd_appliances.exclude(
+                    **task.pool.appliance_filter_params)
+                if appliances:
+                    Appliance.kill(random.choice(appliances))
+                    break  # Just one
+    else:
+        # There was a free appliance in shepherd, so we took it and we don't need this task more
+        task.delete()
 
 
 @logged_task()
@@ -586,24 +703,40 @@ def replace_clone_to_pool(
 
 
 def clone_template_to_pool(template_id, appliance_pool_id, time_minutes):
-    template = Template.objects.get(id=template_id)
-    new_appliance_name = settings.APPLIANCE_FORMAT.format(
-        group=template.template_group.id,
-        date=template.date.strftime("%y%m%d"),
-        rnd=fauxfactory.gen_alphanumeric(8))
+    clone_templates_to_pool([template_id], appliance_pool_id, time_minutes)
+
+
+def clone_templates_to_pool(template_ids, appliance_pool_id, time_minutes):
+    """Adds an appliance per template to the pool in one transaction, then starts all the clones
+
+    The templates must be of the same version and date, like
+    :py:meth:`AppliancePool.plan_provisioning` returns them.
+    """
+    if not template_ids:
+        return
+    templates = Template.objects.in_bulk(template_ids)
+    appliances = []
     with transaction.atomic():
         pool = AppliancePool.objects.get(id=appliance_pool_id)
         if pool.not_needed_anymore:
             return
-        # Apply also username
-        new_appliance_name = "{}_{}".format(pool.owner.username, new_appliance_name)
-        appliance = Appliance(template=template, name=new_appliance_name, appliance_pool=pool)
-        appliance.save()
+        owner_name = pool.owner.username
+        for template_id in template_ids:
+            template = templates[template_id]
+            # Apply also username
+            new_appliance_name = "{}_{}".format(owner_name, settings.APPLIANCE_FORMAT.format(
+                group=template.template_group_id,
+                date=template.date.strftime("%y%m%d"),
+                rnd=fauxfactory.gen_alphanumeric(8)))
+            appliance = Appliance(template=template, name=new_appliance_name, appliance_pool=pool)
+            appliance.save()
+            appliances.append(appliance)
         # Set pool to these params to keep the appliances with same versions/dates
         pool.version = template.version
         pool.date = template.date
         pool.save()
-    clone_template_to_appliance.delay(appliance.id, time_minutes)
+    for appliance in appliances:
+        clone_template_to_appliance.delay(appliance.id, time_minutes)
 
 
 @logged_task()
@@ -883,7 +1016,10 @@ def refresh_appliances_provider(self, provider_id):
     """
     self.logger.info("Refreshing appliances in {}".format(provider_id))
     provider = Provider.objects.get(id=provider_id)
-    vms = provider.api.all_vms()
+    vms = [
+        VMInfo(vm_props['uuid'], vm_name, vm_props['power_state'], vm_props['ip'])
+        for vm_name, vm_props
+        in provider.api.bulk_vm_properties(('uuid', 'power_state', 'ip')).iteritems()]
     dict_vms = {}
     uuid_vms = {}
     for vm in vms:
@@ -935,8 +1071,7 @@ def check_templates_in_provider(self, provider_id):
     else:
         provider.working = True
         provider.save()
-        with provider.edit_metadata as metadata:
-            metadata["templates"] = templates
+        provider.templates = templates
     if not provider.working:
         return
     # Check Sprout template existence
@@ -999,99 +1134,110 @@ def delete_nonexistent_appliances(self):
         Appliance.kill(appl)
 
 
-def generic_shepherd(self, preconfigured):
+def generic_shepherd(self, preconfigured, group_id=None):
     """This task takes care of having the required templates spinned into required number of
     appliances. For each template group, it keeps the last template's appliances spinned up in
     required quantity. If new template comes out of the door, it automatically kills the older
-    running template's appliances and spins up new ones. Sorts the groups by the fulfillment."""
-    for grp in sorted(
-            Group.objects.all(), key=lambda g: g.get_fulfillment_percentage(preconfigured)):
-        group_versions = Template.get_versions(
-            template_group=grp, ready=True, usable=True, preconfigured=preconfigured)
-        group_dates = Template.get_dates(
-            template_group=grp, ready=True, usable=True, preconfigured=preconfigured)
-        if group_versions:
-            # Downstream - by version (downstream releases)
-            version = group_versions[0]
-            # Find the latest date (one version can have new build)
-            dates = Template.get_dates(
-                template_group=grp, ready=True, usable=True, version=group_versions[0],
-                preconfigured=preconfigured)
-            if not dates:
-                # No template yet?
-                continue
-            date = dates[0]
-            filter_keep = {"version": version, "date": date}
-            filters_kill = []
-            for kill_date in dates[1:]:
-                filters_kill.append({"version": version, "date": kill_date})
-            for kill_version in group_versions[1:]:
-                filters_kill.append({"version": kill_version})
-        elif group_dates:
-            # Upstream - by date (upstream nightlies)
-            filter_keep = {"date": group_dates[0]}
-            filters_kill = [{"date": v} for v in group_dates[1:]]
-        else:
-            continue  # Ignore this group, no templates detected yet
-
-        # Keeping current appliances
-        # Retrieve list of all templates for given group
-        # I know joins might be a bit better solution but I'll leave that for later.
-        possible_templates = list(
-            Template.objects.filter(
-                usable=True, ready=True, template_group=grp, preconfigured=preconfigured,
-                **filter_keep).all())
-        # If it can be deployed, it must exist
-        possible_templates_for_provision = filter(lambda tpl: tpl.exists, possible_templates)
-        appliances = []
-        for template in possible_templates:
-            appliances.extend(
-                Appliance.objects.filter(
-                    template=template, appliance_pool=None, marked_for_deletion=False))
-        # If we then want to delete some templates, better kill the eldest. status_changed
-        # says which one was provisioned when, because nothing else then touches that field.
-        appliances.sort(key=lambda appliance: appliance.status_changed)
-        pool_size = grp.template_pool_size if preconfigured else grp.unconfigured_template_pool_size
-        if len(appliances) < pool_size and possible_templates_for_provision:
-            # There must be some templates in order to run the provisioning
-            # Provision ONE appliance at time for each group, that way it is possible to maintain
-            # reasonable balancing
-            new_appliance_name = settings.APPLIANCE_FORMAT.format(
-                group=template.template_group.id,
-                date=template.date.strftime("%y%m%d"),
-                rnd=fauxfactory.gen_alphanumeric(8))
-            with transaction.atomic():
-                # Now look for templates that are on non-busy providers
-                tpl_free = filter(
-                    lambda t: t.provider.free,
-                    possible_templates_for_provision)
-                if tpl_free:
-                    appliance = Appliance(
-                        template=sorted(tpl_free, key=lambda t: t.provider.appliance_load)[0],
-                        name=new_appliance_name)
-                    appliance.save()
-            if tpl_free:
-                self.logger.info(
-                    "Adding an appliance to shepherd: {}/{}".format(appliance.id, appliance.name))
-                clone_template_to_appliance.delay(appliance.id, None)
-        elif len(appliances) > pool_size:
-            # Too many appliances, kill the surplus
-            for appliance in appliances[:len(appliances) - pool_size]:
-                self.logger.info("Killing an extra appliance {}/{} in shepherd".format(
-                    appliance.id, appliance.name))
-                Appliance.kill(appliance)
-
-        # Killing old appliances
-        for filter_kill in filters_kill:
-            for template in Template.objects.filter(
-                    ready=True, usable=True, template_group=grp, preconfigured=preconfigured,
-                    **filter_kill):
-                for a in Appliance.objects.filter(
-                        template=template, appliance_pool=None, marked_for_deletion=False):
-                    self.logger.info(
-                        "Killing appliance {}/{} in shepherd because it is obsolete now".format(
-                            a.id, a.name))
-                    Appliance.kill(a)
+    running template's appliances and spins up new ones. Sorts the groups by the fulfillment.
+
+    If group_id is passed, only that group is taken care of."""
+    groups = Group.objects.all() if group_id is None else Group.objects.filter(id=group_id)
+    for grp in sorted(groups, key=lambda g: g.get_fulfillment_percentage(preconfigured)):
+        # The periodic and the event-driven passes can run at once, each group is for one of them
+        lock_id = "shepherd-group-lock-{}-{}".format(grp.id, preconfigured)
+        if not cache.add(lock_id, 'true', LOCK_EXPIRE):
+            continue
+        try:
+            shepherd_group(self, grp, preconfigured)
+        finally:
+            cache.delete(lock_id)
+
+
+def shepherd_group(self, grp, preconfigured):
+    group_versions = Template.get_versions(
+        template_group=grp, ready=True, usable=True, preconfigured=preconfigured)
+    group_dates = Template.get_dates(
+        template_group=grp, ready=True, usable=True, preconfigured=preconfigured)
+    if group_versions:
+        # Downstream - by version (downstream releases)
+        version = group_versions[0]
+        # Find the latest date (one version can have new build)
+        dates = Template.get_dates(
+            template_group=grp, ready=True, usable=True, version=group_versions[0],
+            preconfigured=preconfigured)
+        if not dates:
+            # No template yet?
+            return
+        date = dates[0]
+        filter_keep = {"version": version, "date": date}
+        filters_kill = []
+        for kill_date in dates[1:]:
+            filters_kill.append({"version": version, "date": kill_date})
+        for kill_version in group_versions[1:]:
+            filters_kill.append({"version": kill_version})
+    elif group_dates:
+        # Upstream - by date (upstream nightlies)
+        filter_keep = {"date": group_dates[0]}
+        filters_kill = [{"date": v} for v in group_dates[1:]]
+    else:
+        return  # Ignore this group, no templates detected yet
+
+    # Keeping current appliances
+    # Retrieve list of all templates for given group
+    # I know joins might be a bit better solution but I'll leave that for later.
+    possible_templates = list(
+        Template.objects.filter(
+            usable=True, ready=True, template_group=grp, preconfigured=preconfigured,
+            **filter_keep).all())
+    # If it can be deployed, it must exist
+    possible_templates_for_provision = filter(lambda tpl: tpl.exists, possible_templates)
+    appliances = list(
+        Appliance.objects.filter(
+            template__in=possible_templates, appliance_pool=None, marked_for_deletion=False))
+    # If we then want to delete some templates, better kill the eldest. status_changed
+    # says which one was provisioned when, because nothing else then touches that field.
+    appliances.sort(key=lambda appliance: appliance.status_changed)
+    pool_size = grp.template_pool_size if preconfigured else grp.unconfigured_template_pool_size
+    if len(appliances) < pool_size and possible_templates_for_provision:
+        # There must be some templates in order to run the provisioning
+        # The whole deficit is placed at once, spread over the non-busy providers
+        new_appliances = []
+        with appliance_placement() as providers, transaction.atomic():
+            for template in possible_templates_for_provision:
+                if template.provider_id in providers:
+                    template.provider = providers[template.provider_id]
+            for template in place_appliances(
+                    possible_templates_for_provision, pool_size - len(appliances)):
+                appliance = Appliance(
+                    template=template,
+                    name=settings.APPLIANCE_FORMAT.format(
+                        group=template.template_group_id,
+                        date=template.date.strftime("%y%m%d"),
+                        rnd=fauxfactory.gen_alphanumeric(8)))
+                appliance.save()
+                new_appliances.append(appliance)
+        for appliance in new_appliances:
+            self.logger.info(
+                "Adding an appliance to shepherd: {}/{}".format(appliance.id, appliance.name))
+            clone_template_to_appliance.delay(appliance.id, None)
+    elif len(appliances) > pool_size:
+        # Too many appliances, kill the surplus
+        for appliance in appliances[:len(appliances) - pool_size]:
+            self.logger.info("Killing an extra appliance {}/{} in shepherd".format(
+                appliance.id, appliance.name))
+            Appliance.kill(appliance)
+
+    # Killing old appliances
+    for filter_kill in filters_kill:
+        templates = Template.objects.filter(
+            ready=True, usable=True, template_group=grp, preconfigured=preconfigured,
+            **filter_kill)
+        for a in Appliance.objects.filter(
+                template__in=templates, appliance_pool=None, marked_for_deletion=False):
+            self.logger.info(
+                "Killing appliance {}/{} in shepherd because it is obsolete now".format(
+                    a.id, a.name))
+            Appliance.kill(a)
 
 
 @singleton_task()
@@ -1100,6 +1246,13 @@ def free_appliance_shepherd(self):
     generic_shepherd(self, False)
 
 
+@coalesced_task()
+def group_shepherd(self, group_id):
+    """Event-driven :py:func:`free_appliance_shepherd`, just for the group"""
+    generic_shepherd(self, True, group_id)
+    generic_shepherd(self, False, group_id)
+
+
 @singleton_task()
 def wait_appliance_ready(self, appliance_id):
     """This task checks for appliance's readiness for use. The checking loop is designed as retrying
@@ -1,4 +1,39 @@
 # -*- coding: utf-8 -*-
-# from django.test import TestCase
+import json
+from importlib import import_module
 
-# Create your tests here.
+import yaml
+from django.test import SimpleTestCase
+
+from appliances.models import MetadataMixin
+
+metadata_migration = import_module("appliances.migrations.0020_metadata_json")
+
+YAML_WITH_SET = yaml.dump({
+    "managed_providers": {"vsphere55", "rhevm35"},
+    "ip_address": "10.0.0.1",
+})
+
+
+class MetadataJsonTest(SimpleTestCase):
+    def test_yaml_set_migrated_to_json_list(self):
+        meta_data = metadata_migration.dump_json(yaml.load(YAML_WITH_SET))
+        self.assertEqual(
+            json.loads(meta_data),
+            {"managed_providers": ["rhevm35", "vsphere55"], "ip_address": "10.0.0.1"})
+        # And back, as done by the reverse migration
+        self.assertEqual(
+            yaml.safe_load(yaml.safe_dump(json.loads(meta_data)))["managed_providers"],
+            ["rhevm35", "vsphere55"])
+
+    def test_unmigrated_yaml_set_dumped_as_list(self):
+        metadata = MetadataMixin._load_metadata(YAML_WITH_SET)
+        self.assertEqual(metadata["managed_providers"], {"vsphere55", "rhevm35"})
+        meta_data = MetadataMixin._dump_metadata(metadata)
+        self.assertEqual(
+            MetadataMixin._load_metadata(meta_data),
+            {"managed_providers": ["rhevm35", "vsphere55"], "ip_address": "10.0.0.1"})
+
+    def test_dump_rejects_unknown_types(self):
+        with self.assertRaises(TypeError):
+            MetadataMixin._dump_metadata({"when": object()})
@@ -163,6 +163,9 @@ ORPHANED_APPLIANCE_GRACE_TIME = dict(
 )
 
 # Celery beat
+# The shepherd and the delayed provisioning run when the appliances, templates or pools change
+# (see appliances.tasks.schedule_shepherd_pass and schedule_provisioning_pass), the schedule here
+# is just a safety net for them.
 CELERYBEAT_SCHEDULE = {
     'check-templates': {
         'task': 'appliances.tasks.check_templates',
@@ -176,7 +179,7 @@ CELERYBEAT_SCHEDULE = {
 
     'free-appliance-shepherd': {
         'task': 'appliances.tasks.free_appliance_shepherd',
-        'schedule': timedelta(seconds=30),
+        'schedule': timedelta(minutes=5),
     },
 
     'kill-unused-appliances': {
@@ -196,7 +199,7 @@ CELERYBEAT_SCHEDULE = {
 
     'process-delayed-provision-tasks': {
         'task': 'appliances.tasks.process_delayed_provision_tasks',
-        'schedule': timedelta(seconds=20),
+        'schedule': timedelta(minutes=3),
     },
 
     'check-update': {
@@ -7,6 +7,8 @@ import re
 import requests
 import simplejson
 from copy import copy
+from multiprocessing.pool import ThreadPool
+from requests.adapters import HTTPAdapter
 from utils.version import LooseVersion
 from utils.wait import wait_for
 
@@ -15,7 +17,26 @@ class APIException(Exception):
     pass
 
 
+def _pool_map(api, func, items):
+    """Maps the func over the items concurrently, as many at once as the API has connections"""
+    items = list(items)
+    if len(items) < 2:
+        return map(func, items)
+    pool = ThreadPool(min(len(items), api.POOL_SIZE))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.terminate()
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
 class API(object):
+    #: Keep-alive connections held open to the appliance, also the concurrency of the reloads
+    POOL_SIZE = 8
+
     def __init__(self, entry_point, auth):
         self._entry_point = entry_point
         if isinstance(auth, dict):
@@ -24,8 +45,19 @@ class API(object):
             self._auth = tuple(auth[:2])
         else:
             raise ValueError("Unknown values provider for auth")
+        self._session = self._new_session()
         self._load_data()
 
+    def _new_session(self):
+        # All the requests reuse the pooled connections instead of a new TLS handshake each
+        session = requests.Session()
+        session.auth = self._auth
+        session.verify = False
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
     def _load_data(self):
         data = self.get(self._entry_point)
         self.collections = CollectionsIndex(self, data.pop("collections", []))
@@ -52,7 +84,7 @@ class API(object):
             return result
 
     def get(self, url, **get_params):
-        data = requests.get(url, auth=self._auth, params=get_params, verify=False)
+        data = self._session.get(url, params=get_params)
         try:
             data = data.json()
         except simplejson.scanner.JSONDecodeError:
@@ -60,7 +92,7 @@ class API(object):
         return self._result_processor(data)
 
     def post(self, url, **payload):
-        data = requests.post(url, auth=self._auth, data=json.dumps(payload), verify=False)
+        data = self._session.post(url, data=json.dumps(payload))
         try:
             data = data.json()
         except simplejson.scanner.JSONDecodeError:
@@ -71,7 +103,7 @@ class API(object):
         return self._result_processor(data)
 
     def delete(self, url, **payload):
-        data = requests.delete(url, auth=self._auth, data=json.dumps(payload), verify=False)
+        data = self._session.delete(url, data=json.dumps(payload))
         try:
             data = data.json()
         except simplejson.scanner.JSONDecodeError:
@@ -110,6 +142,56 @@ class API(object):
     def on_latest_version(self):
         return self.version == self.latest_version
 
+    def wait_for_tasks(self, tasks, num_sec=600, delay=5):
+        """Waits until all the tasks are finished
+
+        The unfinished tasks are checked all together, with one query of the tasks collection
+        per interval (per :py:attr:`Action.CHUNK_SIZE` tasks), instead of a poller per task.
+
+        Args:
+            tasks: Task ids, task hrefs, task :py:class:`Entity` objects or the results of the
+                actions which started the tasks
+            num_sec: Seconds to wait for
+            delay: Seconds between the checks
+
+        Returns:
+            A dict of the finished task :py:class:`Entity` objects by task id
+
+        Raises:
+            :py:class:`utils.wait.TimedOutError` when some of the tasks did not finish in time
+        """
+        task_ids = set(map(_task_id, tasks))
+        collection = self.collections.tasks
+        finished = {}
+
+        def _check_tasks():
+            pending = sorted(task_ids - set(finished))
+            for chunk in _chunks(pending, Action.CHUNK_SIZE):
+                for resource in collection._find_any("id", chunk):
+                    if resource.get("state", "").lower() == "finished":
+                        finished[str(resource["id"])] = Entity(collection, resource)
+            return len(finished) == len(task_ids)
+
+        if task_ids:
+            wait_for(_check_tasks, num_sec=num_sec, delay=delay,
+                message="{} tasks to finish".format(len(task_ids)))
+        return finished
+
+
+def _task_id(task):
+    """Returns the id of the task as a string, see :py:meth:`API.wait_for_tasks`"""
+    if isinstance(task, Entity):
+        # Results of the actions keep the data they were created from
+        if task._data is not None and task._data.get("task_id") is not None:
+            return str(task._data["task_id"])
+        elif task._data is not None and task._data.get("task_href") is not None:
+            task = task._data["task_href"]
+        elif task.collection.name == "tasks":
+            task = task._href
+        else:
+            raise ValueError("{} is not a task and did not start one".format(repr(task)))
+    return str(task).rstrip("/").rsplit("/", 1)[-1]
+
 
 class CollectionsIndex(object):
     def __init__(self, api, data):
@@ -151,8 +233,7 @@ class SearchResult(object):
             self.resources.append(Entity(collection, resource))
 
     def __iter__(self):
-        for resource in self.resources:
-            resource.reload()
+        for resource in Entity.reload_all(self.resources):
             yield resource
 
     def __getitem__(self, position):
@@ -168,6 +249,9 @@ class SearchResult(object):
 
 
 class Collection(object):
+    #: Resources requested at once when iterating over the collection
+    PAGE_SIZE = 500
+
     def __init__(self, api, href, name, description=None):
         self._api = api
         self._href = href
@@ -193,6 +277,42 @@ class Collection(object):
         if self._data is None:
             self.reload()
 
+    def _get_page(self, offset, limit):
+        return self._api.get(self._href, expand="resources", offset=offset, limit=limit)
+
+    def pages(self, page_size=None, prefetch=True):
+        """Yields the expanded resources of the collection, a list per page
+
+        Uses the ``offset`` and ``limit`` parameters of the REST API, so that at most two pages
+        are held in memory at a time.
+
+        Args:
+            page_size: Resources per page, :py:attr:`PAGE_SIZE` by default
+            prefetch: Whether to request the next page while the current one is processed
+        """
+        page_size = page_size or self.PAGE_SIZE
+        pool = ThreadPool(1) if prefetch else None
+        try:
+            offset = 0
+            data = self._get_page(offset, page_size)
+            while True:
+                page = data["resources"]
+                offset += len(page)
+                # Appliances without paging return everything in the first page
+                last = not page or offset >= data["count"]
+                if not last and pool is not None:
+                    next_data = pool.apply_async(self._get_page, (offset, page_size))
+                yield page
+                if last:
+                    return
+                elif pool is not None:
+                    data = next_data.get()
+                else:
+                    data = self._get_page(offset, page_size)
+        finally:
+            if pool is not None:
+                pool.terminate()
+
     def find_by(self, **params):
         """Search items in collection. Filters based on keywords passed."""
         if self._api.version == "2.0.0-pre":
@@ -221,6 +341,30 @@ class Collection(object):
             search_query.append("{}={}".format(key, repr(str(value))))
         return SearchResult(self, self._api.get(self._href, **{"filter[]": search_query}))
 
+    def _find_any(self, key, values):
+        """Returns the expanded resources with any of the values of the key, in one query"""
+        values = map(str, values)
+        if self._api.version == "2.0.0-pre":
+            try:
+                return self._find_any_by_sqlfilter(key, values)
+            except APIException:
+                return self._find_any_by_filter(key, values)
+        elif self._api.version.is_in_series("1.1") or self._api.version >= "2.0.0":
+            return self._find_any_by_filter(key, values)
+        else:
+            return self._find_any_by_sqlfilter(key, values)
+
+    def _find_any_by_sqlfilter(self, key, values):
+        search_query = " OR ".join("{} = {}".format(key, repr(value)) for value in values)
+        return self._api.get(
+            self._href, **{"sqlfilter": search_query, "expand": "resources"})["resources"]
+
+    def _find_any_by_filter(self, key, values):
+        search_query = ["{}={}".format(key, repr(value)) for value in values[:1]]
+        search_query.extend("or {}={}".format(key, repr(value)) for value in values[1:])
+        return self._api.get(
+            self._href, **{"filter[]": search_query, "expand": "resources"})["resources"]
+
     def get(self, **params):
         try:
             return self.find_by(**params)[0]
@@ -249,9 +393,9 @@ class Collection(object):
         return self._api.get_entity(self, id)
 
     def __iter__(self):
-        self.reload(expand=True)
-        for resource in self._resources:
-            yield Entity(self, resource)
+        for page in self.pages():
+            for resource in page:
+                yield Entity(self, resource)
 
     def __getitem__(self, position):
         self.reload_if_needed()
@@ -322,6 +466,23 @@ class Entity(object):
             else:
                 setattr(self, key, value)
 
+    @staticmethod
+    def reload_all(entities, expand=None):
+        """Reloads the entities concurrently, over the pooled connections of their API
+
+        Args:
+            entities: List of :py:class:`Entity`
+            expand: Passed to :py:meth:`reload`
+
+        Returns:
+            The list of the entities
+        """
+        entities = list(entities)
+        if entities:
+            _pool_map(entities[0].collection._api,
+                lambda entity: entity.reload(expand=expand), entities)
+        return entities
+
     @property
     def exists(self):
         try:
@@ -411,6 +572,9 @@ class ActionContainer(object):
 
 
 class Action(object):
+    #: Resources sent in one request by :py:meth:`bulk`
+    CHUNK_SIZE = 100
+
     def __init__(self, container, name, method, href):
         self._container = container
         self._method = method
@@ -453,6 +617,30 @@ class Action(object):
         else:
             return self._process_result(result)
 
+    def bulk(self, resources, chunk_size=None, **kwargs):
+        """Calls the action on many resources, sending them in chunks
+
+        The chunks are sent concurrently over the pooled connections of the API. Pass the
+        results to :py:meth:`API.wait_for_tasks` to wait for the tasks the action started.
+
+        Args:
+            resources: :py:class:`Entity` objects or dicts, like the arguments of a call
+            chunk_size: Resources per request, :py:attr:`CHUNK_SIZE` by default
+            **kwargs: Added to every resource, like in a call
+
+        Returns:
+            A list of the results, in the order of the resources
+        """
+        chunks = _chunks(list(resources), chunk_size or self.CHUNK_SIZE)
+        results = []
+        for result in _pool_map(
+                self.collection._api, lambda chunk: self(*chunk, **kwargs), chunks):
+            if isinstance(result, list):
+                results.extend(result)
+            elif result is not None:
+                results.append(result)
+        return results
+
     def _process_result(self, result):
         if "id" in result:
             d = copy(result)
@@ -21,7 +21,8 @@ from cfme.infrastructure.provider import get_from_config
 from cfme.infrastructure.virtual_machines import Vm
 from fixtures import ui_coverage
 from fixtures.pytest_store import _push_appliance, _pop_appliance, store
-from utils import api, conf, datafile, db, lazycache, trackerbot, db_queries, ssh, ports
+from utils import api, appliance_facts, conf, datafile, db, lazycache, trackerbot, db_queries, ssh
+from utils import ports
 from utils.log import logger, create_sublogger
 from utils.mgmt_system import RHEVMSystem, VMWareSystem
 from utils.net import net_check, resolve_hostname
@@ -38,6 +39,12 @@ if os.environ.get("RUNNING_UNDER_SPROUT", "false") == "false":
     from utils.browser import browser_session
     from utils.hosts import setup_providers_hosts_credentials
 
+_db_online_command = 'psql -U postgres -t  -c "select now()" postgres'
+_db_has_database_command = ('psql -U postgres -t  -c "SELECT datname FROM pg_database '
+    'WHERE datname LIKE \'vmdb_%\';" postgres | grep -q vmdb_production')
+_db_has_tables_command = ('psql -U postgres -t  -c "SELECT * FROM information_schema.tables '
+    'WHERE table_schema = \'public\';" vmdb_production | grep -q vmdb_production')
+
 
 class ApplianceException(Exception):
     pass
@@ -196,6 +203,8 @@ class Appliance(object):
                 message.strip()
             ))
         self.ipapp.wait_for_ssh()
+        # A freshly deployed appliance may reuse the address of another one
+        self.ipapp.invalidate_facts()
         if kwargs:
             self._custom_configure(**kwargs)
         else:
@@ -477,7 +486,7 @@ class IPAppliance(object):
 
     @lazycache
     def version(self):
-        return get_version(self.ssh_client.get_version())
+        return get_version(self._ssh_facts['version'])
 
     @lazycache
     def log(self):
@@ -541,9 +550,12 @@ class IPAppliance(object):
         if not self.is_ssh_running:
             return 'SSH is not running on the appliance'
 
-        # Now for the DB
+        # Now for the DB, checked all at once
         logger.info('Checking appliance database')
-        if not self.db_online:
+        db_online, db_has_database, db_has_tables = [result.rc == 0 for result in
+            self.db_ssh_client().run_commands([_db_online_command, _db_has_database_command,
+                _db_has_tables_command])]
+        if not db_online:
             # postgres isn't running, try to start it
             result = self.db_ssh_client().run_command('service postgresql92-postgresql restart')
             if result.rc != 0:
@@ -551,10 +563,10 @@ class IPAppliance(object):
             else:
                 return 'postgres was not running for unknown reasons'
 
-        if not self.db_has_database:
+        if not db_has_database:
             return 'vmdb_production database does not exist'
 
-        if not self.db_has_tables:
+        if not db_has_tables:
             return 'vmdb_production has no tables'
 
         # try to start EVM
@@ -875,6 +887,8 @@ class IPAppliance(object):
 
         if reboot:
             self.reboot(wait_for_web_ui=False, log_callback=log_callback)
+        else:
+            self.invalidate_facts()
 
         return status, out
 
@@ -1180,6 +1194,7 @@ class IPAppliance(object):
 
         wait_for(lambda: client.uptime() < old_uptime, handle_exception=True,
             num_sec=600, message='appliance to reboot', delay=10)
+        self.invalidate_facts()
 
         if wait_for_web_ui:
             self.wait_for_web_ui()
@@ -1334,22 +1349,17 @@ class IPAppliance(object):
 
     @property
     def db_online(self):
-        db_check_command = ('psql -U postgres -t  -c "select now()" postgres')
-        result = self.db_ssh_client().run_command(db_check_command)
+        result = self.db_ssh_client().run_command(_db_online_command)
         return result.rc == 0
 
     @property
     def db_has_database(self):
-        db_check_command = ('psql -U postgres -t  -c "SELECT datname FROM pg_database '
-            'WHERE datname LIKE \'vmdb_%\';" postgres | grep -q vmdb_production')
-        result = self.db_ssh_client().run_command(db_check_command)
+        result = self.db_ssh_client().run_command(_db_has_database_command)
         return result.rc == 0
 
     @property
     def db_has_tables(self):
-        db_check_command = ('psql -U postgres -t  -c "SELECT * FROM information_schema.tables '
-            'WHERE table_schema = \'public\';" vmdb_production | grep -q vmdb_production')
-        result = self.db_ssh_client().run_command(db_check_command)
+        result = self.db_ssh_client().run_command(_db_has_tables_command)
         return result.rc == 0
 
     @property
@@ -1363,29 +1373,44 @@ class IPAppliance(object):
         else:
             return False
 
+    @appliance_facts.cached_fact()
+    def _ssh_facts(self):
+        # Probe all the basic facts at once, they are usually all needed at startup anyway
+        facts = self.ssh_client.get_appliance_facts()
+        appliance_facts.check_instance_guid(self, facts['guid'])
+        return facts
+
+    def probe_guid(self):
+        """Reads the GUID from the appliance, see :py:func:`utils.appliance_facts.cached_fact`"""
+        return self.ssh_client.get_appliance_guid()
+
+    def invalidate_facts(self):
+        """Forgets the cached facts of this appliance, e.g. after it was updated"""
+        for fact in ['_ssh_facts', 'version', 'build_datetime', 'build_date', 'is_downstream',
+                'guid', 'configuration_details']:
+            delattr(self, fact)
+        appliance_facts.invalidate(self.address)
+
     @lazycache
     def build_datetime(self):
-        datetime = self.ssh_client.get_build_datetime()
-        return datetime
+        return self._ssh_facts['build_datetime']
 
     @lazycache
     def build_date(self):
-        date = self.ssh_client.get_build_date()
-        return date
+        return self.build_datetime.date()
 
     @lazycache
     def is_downstream(self):
-        return self.ssh_client.is_appliance_downstream()
+        return self._ssh_facts['is_downstream']
 
     def has_netapp(self):
-        return self.ssh_client.appliance_has_netapp()
+        return self._ssh_facts['has_netapp']
 
     @lazycache
     def guid(self):
-        result = self.ssh_client.run_command('cat /var/www/miq/vmdb/GUID')
-        return result.output
+        return self._ssh_facts['guid']
 
-    @lazycache
+    @appliance_facts.cached_fact(ttl=600)
     def configuration_details(self):
         """Return details that are necessary to navigate through Configuration accordions.
 
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Appliance facts cached on the local disk
+
+Facts which are slow to probe and rarely change (version, build date, GUID, ...) are stored per
+appliance address under ``log/appliance_facts/``, so that neither every parallelizer slave nor
+every new :py:class:`utils.appliance.IPAppliance` instance has to probe them again over ssh or
+the database.
+
+Every fact expires after its ttl. All facts of an appliance are dropped when its GUID changes
+(the address is now used by another appliance) or when :py:func:`invalidate` is called, for
+example after the appliance was updated or rebooted. If the instance has a ``probe_guid`` method,
+the first cached fact it reads is only used after the GUID it returns matched the recorded one.
+
+Usage:
+
+    class IPAppliance(object):
+        @cached_fact(ttl=600)
+        def configuration_details(self):
+            return db_queries.get_configuration_details(self.db)
+
+    # Forgets the fact both on the instance and on the disk
+    del(appliance.configuration_details)
+"""
+import cPickle
+import fcntl
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from utils.log import logger
+from utils.path import log_path
+
+#: Directory holding a facts file per appliance address
+facts_path = log_path.join('appliance_facts')
+
+#: Seconds a fact is valid for, unless it sets its own ttl
+DEFAULT_TTL = 3600
+
+
+def _facts_file(address):
+    return facts_path.join('{}.pickle'.format(re.sub(r'[^\w.-]', '_', address)))
+
+
+@contextmanager
+def _locked(address):
+    # Serializes the read-modify-write of the facts file between the slaves
+    facts_path.ensure(dir=True)
+    with open('{}.lock'.format(_facts_file(address)), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load(address):
+    try:
+        with _facts_file(address).open('rb') as facts_file:
+            return cPickle.load(facts_file)
+    except IOError:
+        pass
+    except Exception as ex:
+        logger.warning('Discarding unreadable appliance facts of {}: {}'.format(address, ex))
+    return {'guid': None, 'facts': {}}
+
+
+def _save(address, data):
+    # Written aside and renamed, so readers never see a partial file
+    facts_file = str(_facts_file(address))
+    temp_file = '{}.{}'.format(facts_file, os.getpid())
+    with open(temp_file, 'wb') as f:
+        cPickle.dump(data, f, cPickle.HIGHEST_PROTOCOL)
+    os.rename(temp_file, facts_file)
+
+
+def get_fact(address, name):
+    """Returns the cached value of a fact
+
+    Raises:
+        KeyError: The fact is not cached or it has expired
+    """
+    expires, value = _load(address)['facts'][name]
+    if expires < time.time():
+        raise KeyError(name)
+    return value
+
+
+def set_fact(address, name, value, ttl=DEFAULT_TTL):
+    """Caches the value of a fact for ``ttl`` seconds"""
+    with _locked(address):
+        data = _load(address)
+        data['facts'][name] = (time.time() + ttl, value)
+        _save(address, data)
+
+
+def check_guid(address, guid):
+    """Records the GUID of the appliance at an address, dropping all facts if it changed
+
+    Returns: Whether the cached facts were kept
+    """
+    with _locked(address):
+        data = _load(address)
+        if data['guid'] != guid:
+            if data['guid'] is not None:
+                logger.info('Appliance {} GUID changed, dropping its cached facts'.format(address))
+            _save(address, {'guid': guid, 'facts': {}})
+            return False
+    return True
+
+
+def check_instance_guid(obj, guid=None):
+    """Checks that the facts cached for the instance's address are of its appliance
+
+    The GUID is taken from the instance's ``probe_guid`` method unless passed, which is done once
+    per instance. Instances without the method are not checked.
+
+    Returns: Whether the cached facts were kept
+    """
+    if guid is None:
+        if obj.__dict__.get('_facts_guid_checked') or not hasattr(obj, 'probe_guid'):
+            return True
+        guid = obj.probe_guid()
+    obj._facts_guid_checked = True
+    return check_guid(obj.address, guid)
+
+
+def invalidate(address, *names):
+    """Drops the named cached facts of an appliance, or all of them if no names are passed"""
+    with _locked(address):
+        if names:
+            data = _load(address)
+            for name in names:
+                data['facts'].pop(name, None)
+            _save(address, data)
+        else:
+            _facts_file(address).remove(ignore_errors=True)
+
+
+def cached_fact(ttl=DEFAULT_TTL):
+    """Method decorator to create a lazily-evaluated property cached on the disk
+
+    Works like :py:func:`utils.lazycache`, but a value not yet cached on the instance is looked up
+    in the facts cache of the instance's ``address`` before it is evaluated, see
+    :py:func:`check_instance_guid`. ``del`` clears both.
+    """
+    def decorator(wrapped_method):
+        name = wrapped_method.__name__
+        attr = '_' + name
+
+        def get_cached(self):
+            if not hasattr(self, attr):
+                try:
+                    value = get_fact(self.address, name)
+                    if not check_instance_guid(self):
+                        # Cached for another appliance which had the address before
+                        raise KeyError(name)
+                except KeyError:
+                    value = wrapped_method(self)
+                    set_fact(self.address, name, value, ttl)
+                setattr(self, attr, value)
+            return getattr(self, attr)
+
+        def set_cached(self, value):
+            setattr(self, attr, value)
+
+        def del_cached(self):
+            if hasattr(self, attr):
+                delattr(self, attr)
+            invalidate(self.address, name)
+
+        return property(get_cached, set_cached, del_cached, wrapped_method.__doc__)
+    return decorator
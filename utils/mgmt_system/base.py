@@ -13,6 +13,9 @@ from utils.wait import wait_for, TimedOutError
 
 VMInfo = namedtuple("VMInfo", ["uuid", "name", "power_state", "ip"])
 
+#: Properties :py:meth:`MgmtSystemAPIBase.bulk_vm_properties` can look up
+VM_PROPERTIES = ("uuid", "power_state", "ip", "creation_time")
+
 
 class MgmtSystemAPIBase(object):
     """Base interface class for Management Systems
@@ -31,6 +34,8 @@ class MgmtSystemAPIBase(object):
     # Flags to indicate whether or not this MgmtSystem can suspend/pause,
     can_suspend = True
     can_pause = False
+    # Whether bulk_vm_properties gets all VMs at once rather than calling per VM
+    native_bulk_vm_properties = False
 
     @abstractmethod
     def start_vm(self, vm_name):
@@ -150,6 +155,59 @@ class MgmtSystemAPIBase(object):
         """Disconnects the API from mgmt system"""
         raise NotImplementedError('disconnect not implemented.')
 
+    def ping(self):
+        """Checks the connection with the cheapest call which goes to the mgmt system
+
+        Unlike :py:meth:`info`, which may answer from what the client has already fetched.
+
+        Raises: Whatever the client raises when the mgmt system is not reachable or the session
+            is not valid anymore.
+        """
+        raise NotImplementedError('ping not implemented.')
+
+    def bulk_vm_properties(self, props=VM_PROPERTIES):
+        """Returns properties of all the VMs at once
+
+        Backends able to retrieve them in one query override this, this implementation calls
+        :py:meth:`vm_status`, :py:meth:`current_ip_address` and ``vm_creation_time`` per VM
+        and does not know the uuids.
+
+        Args:
+            props: Names of the properties to look up, see :py:data:`VM_PROPERTIES`
+        Returns: dict of vm names and dicts of their properties, a property that could not be
+            determined is ``None``
+        """
+        getters = {
+            "power_state": self.vm_status,
+            "ip": self.current_ip_address,
+            "creation_time": getattr(self, "vm_creation_time", None),
+        }
+        return {vm_name: self._vm_properties(vm_name, vm_name, getters, props)
+            for vm_name in self.list_vm()}
+
+    @staticmethod
+    def _vm_properties(vm_name, vm, getters, props):
+        """Returns the properties of a VM for :py:meth:`bulk_vm_properties`
+
+        Args:
+            vm_name: Name of the VM, for the log
+            vm: What the getters take
+            getters: dict of property names and functions returning them from ``vm``
+            props: Names of the properties to look up
+        Returns: dict of the properties, ``None`` for those without a getter or whose getter failed
+        """
+        vm_props = {}
+        for prop in props:
+            vm_props[prop] = None
+            if getters.get(prop) is None:
+                continue
+            try:
+                vm_props[prop] = getters[prop](vm)
+            except Exception as e:
+                # VM deleted in the meantime, no creation time yet, ...
+                logger.warning("Could not get %s of VM %s: %s", prop, vm_name, e)
+        return vm_props
+
     @abstractmethod
     def vm_status(self, vm_name):
         """Status of VM.
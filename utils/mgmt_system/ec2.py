@@ -4,7 +4,7 @@ from datetime import datetime
 import boto
 from boto.ec2 import EC2Connection, get_region
 
-from utils.mgmt_system.base import MgmtSystemAPIBase
+from utils.mgmt_system.base import MgmtSystemAPIBase, VM_PROPERTIES
 from utils.mgmt_system.exceptions import (
     ActionTimedOutError, ActionNotSupported,
     MultipleInstancesError, VMInstanceNotFound,
@@ -48,6 +48,7 @@ class EC2System(MgmtSystemAPIBase):
     }
 
     can_suspend = False
+    native_bulk_vm_properties = True
 
     def __init__(self, **kwargs):
         username = kwargs.get('username')
@@ -68,6 +69,9 @@ class EC2System(MgmtSystemAPIBase):
         """Returns the current versions of boto and the EC2 API being used"""
         return '%s %s' % (boto.UserAgent, self.api.APIVersion)
 
+    def ping(self):
+        self.api.get_all_zones()
+
     def list_vm(self):
         """Returns a list from instance IDs currently active on EC2 (not terminated)"""
         instances = [inst for inst in self._get_all_instances() if inst.state != 'terminated']
@@ -99,8 +103,26 @@ class EC2System(MgmtSystemAPIBase):
         instance = self._get_instance(instance_id)
         return instance.state
 
+    def bulk_vm_properties(self, props=VM_PROPERTIES):
+        # One get_all_instances for all of them, keyed like list_vm
+        getters = {
+            'uuid': lambda instance: instance.id,
+            'power_state': lambda instance: instance.state,
+            'ip': lambda instance: instance.ip_address or None,
+            'creation_time': self._instance_launch_time,
+        }
+        instances = [inst for inst in self._get_all_instances() if inst.state != 'terminated']
+        result = {}
+        for inst in instances:
+            name = inst.tags.get('Name', inst.id)
+            result[name] = self._vm_properties(name, inst, getters, props)
+        return result
+
     def vm_creation_time(self, instance_id):
-        instance = self._get_instance(instance_id)
+        return self._instance_launch_time(self._get_instance(instance_id))
+
+    @staticmethod
+    def _instance_launch_time(instance):
         # Example instance.launch_time: 2014-08-13T22:09:40.000Z
         launch_time = datetime.strptime(instance.launch_time[:19], '%Y-%m-%dT%H:%M:%S')
         # launch time is UTC, localize it, make it tz-naive to work with timedelta
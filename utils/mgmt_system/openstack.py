@@ -17,7 +17,7 @@ from requests.exceptions import Timeout
 
 from cfme import exceptions as cfme_exc
 from utils.log import logger
-from utils.mgmt_system.base import MgmtSystemAPIBase, VMInfo
+from utils.mgmt_system.base import MgmtSystemAPIBase, VMInfo, VM_PROPERTIES
 from utils.mgmt_system.exceptions import (
     NetworkNameNotFound, VMInstanceNotFound
 )
@@ -76,6 +76,7 @@ class OpenstackSystem(MgmtSystemAPIBase):
 
     can_suspend = True
     can_pause = True
+    native_bulk_vm_properties = True
 
     def __init__(self, **kwargs):
         self.tenant = kwargs['tenant']
@@ -231,6 +232,9 @@ class OpenstackSystem(MgmtSystemAPIBase):
     def info(self):
         return '%s %s' % (self.api.client.service_type, self.api.client.version)
 
+    def ping(self):
+        self.api.limits.get()
+
     def disconnect(self):
         pass
 
@@ -341,7 +345,10 @@ class OpenstackSystem(MgmtSystemAPIBase):
         return result
 
     def vm_creation_time(self, vm_name):
-        instance = self._find_instance_by_name(vm_name)
+        return self._instance_creation_time(self._find_instance_by_name(vm_name))
+
+    @staticmethod
+    def _instance_creation_time(instance):
         # Example vm.created: 2014-08-14T23:29:30Z
         create_time = datetime.strptime(instance.created, '%Y-%m-%dT%H:%M:%SZ')
         # create time is UTC, localize it, strip tzinfo
@@ -448,8 +455,11 @@ class OpenstackSystem(MgmtSystemAPIBase):
         return instance._info['addresses']
 
     def current_ip_address(self, name):
-        networks = self._get_instance_networks(name)
-        for network_nics in networks.itervalues():
+        return self._floating_ip(self._find_instance_by_name(name))
+
+    @staticmethod
+    def _floating_ip(instance):
+        for network_nics in instance._info['addresses'].itervalues():
             for nic in network_nics:
                 if nic['OS-EXT-IPS:type'] == 'floating':
                     return str(nic['addr'])
@@ -457,19 +467,25 @@ class OpenstackSystem(MgmtSystemAPIBase):
     def all_vms(self):
         result = []
         for vm in self._get_all_instances():
-            ip = None
-            for network_nics in vm._info["addresses"].itervalues():
-                for nic in network_nics:
-                    if nic['OS-EXT-IPS:type'] == 'floating':
-                        ip = str(nic['addr'])
             result.append(VMInfo(
                 vm.id,
                 vm.name,
                 vm.status,
-                ip,
+                self._floating_ip(vm),
             ))
         return result
 
+    def bulk_vm_properties(self, props=VM_PROPERTIES):
+        # The paged instance list has them all
+        getters = {
+            'uuid': lambda instance: instance.id,
+            'power_state': lambda instance: instance.status,
+            'ip': self._floating_ip,
+            'creation_time': self._instance_creation_time,
+        }
+        return {instance.name: self._vm_properties(instance.name, instance, getters, props)
+            for instance in self._get_all_instances()}
+
     def get_vm_name_from_ip(self, ip):
         # unfortunately it appears you cannot query for ip address from the sdk,
         #   unlike curling rest api which does work
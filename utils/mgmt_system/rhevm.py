@@ -10,7 +10,7 @@ from ovirtsdk.xml import params
 
 from cfme import exceptions as cfme_exc
 from utils.log import logger
-from utils.mgmt_system.base import MgmtSystemAPIBase, VMInfo
+from utils.mgmt_system.base import MgmtSystemAPIBase, VMInfo, VM_PROPERTIES
 from utils.mgmt_system.exceptions import (
     VMInstanceNotFound, VMInstanceNotSuspended
 )
@@ -90,6 +90,7 @@ class RHEVMSystem(MgmtSystemAPIBase):
     }
 
     STEADY_WAIT_MINS = 6
+    native_bulk_vm_properties = True
 
     def __init__(self, hostname, username, password, **kwargs):
         # generate URL from hostname
@@ -136,7 +137,11 @@ class RHEVMSystem(MgmtSystemAPIBase):
             return vm
 
     def current_ip_address(self, vm_name):
-        info = self._get_vm(vm_name).get_guest_info()
+        return self._vm_ip_address(self._get_vm(vm_name))
+
+    @staticmethod
+    def _vm_ip_address(vm):
+        info = vm.get_guest_info()
         if info is None:
             return None
         try:
@@ -285,20 +290,27 @@ class RHEVMSystem(MgmtSystemAPIBase):
     def all_vms(self):
         result = []
         for vm in self.api.vms.list():
-            try:
-                ip = vm.get_guest_info().get_ips().get_ip()[0].get_address()
-            except (AttributeError, IndexError):
-                ip = None
             result.append(
                 VMInfo(
                     vm.get_id(),
                     vm.get_name(),
                     vm.get_status().get_state(),
-                    ip,
+                    self._vm_ip_address(vm),
                 )
             )
         return result
 
+    def bulk_vm_properties(self, props=VM_PROPERTIES):
+        # The vms collection query returns them all
+        getters = {
+            'uuid': lambda vm: vm.get_id(),
+            'power_state': lambda vm: vm.get_status().get_state(),
+            'ip': self._vm_ip_address,
+            'creation_time': lambda vm: vm.get_creation_time().replace(tzinfo=None),
+        }
+        return {vm.get_name(): self._vm_properties(vm.get_name(), vm, getters, props)
+            for vm in self.api.vms.list()}
+
     def list_host(self, **kwargs):
         host_list = self.api.hosts.list(**kwargs)
         return [host.name for host in host_list]
@@ -325,6 +337,9 @@ class RHEVMSystem(MgmtSystemAPIBase):
         # and we got nothing!
         pass
 
+    def ping(self):
+        self.api.test(throw_exception=True)
+
     def disconnect(self):
         self.api.disconnect()
 
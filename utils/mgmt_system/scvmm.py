@@ -143,6 +143,10 @@ class SCVMMSystem(MgmtSystemAPIBase):
     def info(self, vm_name):
         pass
 
+    def ping(self):
+        # The pre_script logs in to the SCVMM server
+        self.run_script("")
+
     def disconnect(self):
         pass
 
@@ -16,7 +16,7 @@ from suds import WebFault
 
 from cfme import exceptions as cfme_exc
 from utils.log import logger
-from utils.mgmt_system.base import MgmtSystemAPIBase, VMInfo
+from utils.mgmt_system.base import MgmtSystemAPIBase, VMInfo, VM_PROPERTIES
 from utils.mgmt_system.exceptions import VMInstanceNotCloned, VMInstanceNotSuspended
 from utils.version import LooseVersion
 from utils.wait import wait_for, TimedOutError
@@ -117,6 +117,7 @@ class VMWareSystem(MgmtSystemAPIBase):
     POWERED_ON = 'poweredOn'
     POWERED_OFF = 'poweredOff'
     SUSPENDED = 'suspended'
+    native_bulk_vm_properties = True
 
     def __init__(self, hostname, username, password, **kwargs):
         self.hostname = hostname
@@ -189,19 +190,25 @@ class VMWareSystem(MgmtSystemAPIBase):
         except Exception:
             return False
 
-    def current_ip_address(self, vm_name):
+    @staticmethod
+    def _valid_ip_address(ip_address):
         ipv4_re = r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}'
         try:
-            vm = self._get_vm(vm_name)
-            ip_address = vm.summary.guest.ipAddress
             if not re.match(ipv4_re, ip_address) or ip_address == '127.0.0.1':
                 ip_address = None
             return ip_address
-        except (AttributeError, TypeError):
-            # AttributeError: vm doesn't have an ip address yet
+        except TypeError:
             # TypeError: ip address wasn't a string
             return None
 
+    def current_ip_address(self, vm_name):
+        try:
+            vm = self._get_vm(vm_name)
+            return self._valid_ip_address(vm.summary.guest.ipAddress)
+        except AttributeError:
+            # AttributeError: vm doesn't have an ip address yet
+            return None
+
     def get_ip_address(self, vm_name, timeout=600):
         """ Returns the first IP address for the selected VM.
 
@@ -253,33 +260,41 @@ class VMWareSystem(MgmtSystemAPIBase):
         return obj_list
 
     def all_vms(self):
+        return [VMInfo(vm_props['uuid'], vm_name, vm_props['power_state'], vm_props['ip'])
+            for vm_name, vm_props in self.bulk_vm_properties(
+                ('uuid', 'power_state', 'ip')).iteritems()]
+
+    #: VirtualMachine property paths of the :py:meth:`bulk_vm_properties` properties
+    _bulk_vm_property_paths = {
+        'uuid': 'config.uuid',
+        'power_state': 'runtime.powerState',
+        'ip': 'guest.ipAddress',
+        'creation_time': 'runtime.bootTime',
+    }
+
+    def bulk_vm_properties(self, props=VM_PROPERTIES):
+        # One PropertyCollector retrieval with all the paths, unset paths are left out of propSet
         property_spec = self.api.create('PropertySpec')
         property_spec.all = False
-        property_spec.pathSet = ['name', 'config.template']
+        property_spec.pathSet = ['name', 'config.template'] + [
+            self._bulk_vm_property_paths[prop] for prop in props]
         property_spec.type = 'VirtualMachine'
         pfs = self.api.get_search_filter_spec(self.api.si.content.rootFolder, property_spec)
         object_contents = self.api.si.content.propertyCollector.RetrieveProperties(specSet=[pfs])
-        result = []
-        for vm in object_contents:
-            vm_props = {p.name: p.val for p in vm.propSet}
+        result = {}
+        for object_content in object_contents:
+            vm_props = {p.name: p.val for p in object_content.propSet}
             if vm_props.get('config.template'):
                 continue
-            try:
-                ip = str(vm.obj.summary.guest.ipAddress)
-            except AttributeError:
-                ip = None
-            try:
-                uuid = str(vm.obj.summary.config.uuid)
-            except AttributeError:
-                uuid = None
-            result.append(
-                VMInfo(
-                    uuid,
-                    str(vm.obj.summary.config.name),
-                    str(vm.obj.summary.runtime.powerState),
-                    ip,
-                )
-            )
+            values = {}
+            for prop in props:
+                value = vm_props.get(self._bulk_vm_property_paths[prop])
+                if prop in ('uuid', 'power_state') and value is not None:
+                    value = str(value)
+                elif prop == 'ip':
+                    value = self._valid_ip_address(value)
+                values[prop] = value
+            result[str(vm_props['name'])] = values
         return result
 
     def get_vm_name_from_ip(self, ip):
@@ -386,6 +401,9 @@ class VMWareSystem(MgmtSystemAPIBase):
     def info(self):
         return '%s %s' % (self.api.get_server_type(), self.api.get_api_version())
 
+    def ping(self):
+        self.api.si.CurrentTime()
+
     def connect(self):
         pass
 
@@ -3,7 +3,9 @@ from utils.ssh import SSHClient, SSHTail
 from utils.db import get_yaml_config, set_yaml_config
 from utils.log import logger
 import numpy
+import os
 import time
+import yaml
 
 
 def collect_log(ssh_client, log_prefix, local_file_name, strip_whitespace=False):
@@ -16,32 +18,148 @@ def collect_log(ssh_client, log_prefix, local_file_name, strip_whitespace=False)
     dest_file = '{}{}.perf.log'.format(log_dir, log_prefix)
     dest_file_gz = '{}{}.perf.log.gz'.format(log_dir, log_prefix)
 
-    ssh_client.run_command('rm -f {}'.format(dest_file_gz))
-
-    status, out = ssh_client.run_command('ls -1 {}-*'.format(log_file))
+    # Each step runs in order in the same round trip
+    status, out = ssh_client.run_commands(['rm -f {}'.format(dest_file_gz),
+        'ls -1 {}-*'.format(log_file)])[1]
+    commands = []
     if status == 0:
         files = out.strip().split('\n')
         for lfile in sorted(files):
-            ssh_client.run_command('cp {} {}-2.gz'.format(lfile, lfile))
-            ssh_client.run_command('gunzip {}-2.gz'.format(lfile))
+            commands.append('cp {} {}-2.gz'.format(lfile, lfile))
+            commands.append('gunzip {}-2.gz'.format(lfile))
             if strip_whitespace:
-                ssh_client.run_command('sed -i  \'s/^ *//; s/ *$//; /^$/d; /^\s*$/d\' '
+                commands.append('sed -i  \'s/^ *//; s/ *$//; /^$/d; /^\s*$/d\' '
                     '{}-2'.format(lfile))
-            ssh_client.run_command('cat {}-2 >> {}'.format(lfile, dest_file))
-            ssh_client.run_command('rm {}-2'.format(lfile))
+            commands.append('cat {}-2 >> {}'.format(lfile, dest_file))
+            commands.append('rm {}-2'.format(lfile))
 
-    ssh_client.run_command('cp {} {}-2'.format(log_file, log_file))
+    commands.append('cp {} {}-2'.format(log_file, log_file))
     if strip_whitespace:
-        ssh_client.run_command('sed -i  \'s/^ *//; s/ *$//; /^$/d; /^\s*$/d\' '
+        commands.append('sed -i  \'s/^ *//; s/ *$//; /^$/d; /^\s*$/d\' '
             '{}-2'.format(log_file))
-    ssh_client.run_command('cat {}-2 >> {}'.format(log_file, dest_file))
-    ssh_client.run_command('rm {}-2'.format(log_file))
-    ssh_client.run_command('gzip {}{}.perf.log'.format(log_dir, log_prefix))
+    commands.append('cat {}-2 >> {}'.format(log_file, dest_file))
+    commands.append('rm {}-2'.format(log_file))
+    commands.append('gzip {}{}.perf.log'.format(log_dir, log_prefix))
+    ssh_client.run_commands(commands)
 
     ssh_client.get_file(dest_file_gz, local_file_name)
     ssh_client.run_command('rm -f {}'.format(dest_file_gz))
 
 
+def stream_log(ssh_client, log_prefix, local_file_name, strip_whitespace=False,
+        line_callback=None):
+    """Incrementally collects all of the logs associated with a single log prefix (ex. evm or
+    top_output) into a single uncompressed local log file.
+
+    The rotated logs are decompressed on the appliance and streamed back, together with the
+    current log, over a single ssh channel. The rotated logs (by inode) and how far the current
+    log was read (inode and offset) are remembered in ``<local_file_name>.state``, so repeated
+    collections into the same local file only transfer what was logged since the previous one.
+
+    Args:
+        ssh_client: :py:class:`utils.ssh.SSHClient` connected to the appliance
+        log_prefix: Name of the log without the ``.log`` suffix
+        local_file_name: Local log file the new log lines are appended to
+        strip_whitespace: Strips leading/trailing whitespace and empty lines on the appliance
+        line_callback: Called with every complete new log line as it arrives, e.g. the
+            ``parse_line`` method of a :py:mod:`utils.perf_message_stats` parser
+    Returns:
+        Number of bytes appended to the local log file
+    Raises:
+        Exception: The logs could not be streamed. Nothing is recorded as collected then.
+    """
+    log_dir = '/var/www/miq/vmdb/log/'
+    log_file = '{}{}.log'.format(log_dir, log_prefix)
+    state_file = '{}.state'.format(local_file_name)
+
+    if os.path.exists(state_file) and os.path.exists(local_file_name):
+        with open(state_file, 'r') as state_yaml:
+            state = yaml.safe_load(state_yaml)
+    else:
+        # Nothing ingested yet, start the local log from scratch
+        state = {'rotated': [], 'live': None, 'partial': ''}
+        open(local_file_name, 'w').close()
+
+    status, out = ssh_client.run_command(
+        'stat -c \'%i %s %n\' {}-* {} 2> /dev/null'.format(log_file, log_file))
+    rotated, live = [], None
+    for line in out.strip().split('\n') if out else []:
+        inode, size, name = line.split(' ', 2)
+        if name == log_file:
+            live = {'inode': int(inode), 'offset': int(size)}
+        else:
+            rotated.append((name, int(inode)))
+
+    followed = state['live']
+    # A delaycompress-ed rotation gets a new inode once it is compressed, so match it by name too
+    ingested = set(entry.split(':', 1)[1] for entry in state['rotated'])
+    new_rotated = [rotated_log for rotated_log in sorted(rotated)
+        if rotated_log[0] not in ingested and
+        not (rotated_log[0].endswith('.gz') and rotated_log[0][:-3] in ingested)]
+    followed_rotated = followed and (live is None or live['inode'] != followed['inode'] or
+        live['offset'] < followed['offset'])
+    if followed_rotated and new_rotated:
+        # Part of the rotated log we were following was already collected. With delaycompress it
+        # still has its inode, otherwise it is the newest rotation
+        skip_name = new_rotated[-1][0]
+        for name, inode in new_rotated:
+            if inode == followed['inode']:
+                skip_name = name
+    else:
+        skip_name = None
+
+    commands = []
+    for name, inode in new_rotated:
+        if name == skip_name:
+            commands.append('zcat -f {} | tail -c +{}'.format(name, followed['offset'] + 1))
+        else:
+            commands.append('zcat -f {}'.format(name))
+    live_offset = followed['offset'] if followed and not followed_rotated else 0
+    if live is not None and live['offset'] > live_offset:
+        # Only read up to the size we stat-ed, that is where the next collection picks up. The
+        # log may have grown since, then tail is killed by SIGPIPE (141) once head has enough
+        commands.append('{{ tail -c +{} {} || [ $? -eq 141 ]; }} | head -c {}'.format(
+            live_offset + 1, log_file, live['offset'] - live_offset))
+    if not commands:
+        logger.info('No new {} log data to collect'.format(log_prefix))
+        return 0
+
+    # Any failing command, not just the last one in a pipe, has to fail the whole stream
+    command = '{{ {}; }}'.format(' && '.join(commands))
+    if strip_whitespace:
+        command = '{} | sed \'s/^ *//; s/ *$//; /^$/d; /^\s*$/d\''.format(command)
+    command = 'set -o pipefail; {}'.format(command)
+
+    stream = {'bytes': 0, 'partial': state['partial']}
+
+    def write_chunk(data):
+        local_log.write(data)
+        stream['bytes'] += len(data)
+        if line_callback:
+            lines = (stream['partial'] + data).split('\n')
+            stream['partial'] = lines.pop()
+            for line in lines:
+                line_callback(line)
+
+    local_size = os.path.getsize(local_file_name)
+    with open(local_file_name, 'ab') as local_log:
+        status = ssh_client.stream_command(command, write_chunk)
+        if status != 0:
+            # Not recorded as collected, the next collection transfers it all again
+            local_log.truncate(local_size)
+    if status != 0:
+        raise Exception('Streaming {} logs exited with {}'.format(log_prefix, status))
+
+    state['rotated'].extend('{}:{}'.format(inode, name) for name, inode in new_rotated)
+    state['live'] = live
+    state['partial'] = stream['partial']
+    with open(state_file, 'w') as state_yaml:
+        yaml.safe_dump(state, state_yaml, default_flow_style=False)
+    logger.info('Collected {} bytes of {} logs into {}'.format(stream['bytes'], log_prefix,
+        local_file_name))
+    return stream['bytes']
+
+
 def convert_top_mem_to_mib(top_mem):
     """Takes a top memory unit from top_output.log and converts it to MiB"""
     if top_mem[-1:] == 'm':
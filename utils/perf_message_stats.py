@@ -6,11 +6,17 @@ from utils.log import logger
 from utils.path import log_path
 from utils.perf import convert_top_mem_to_mib
 from utils.perf import generate_statistics
+from utils.ssh import SSHTail
+from collections import OrderedDict, deque
 from datetime import datetime
 import dateutil.parser as du_parser
 from datetime import timedelta
-from time import time
+from itertools import izip
+from time import sleep, time
 import csv
+import hashlib
+import json
+import multiprocessing
 import numpy
 import os
 import pygal
@@ -42,6 +48,9 @@ miqwkr = re.compile(r'MIQ\(([A-Za-z]*)\)\sID\s\[([0-9]*)\],\sPID\s\[([0-9]*)\]')
 miqwkr_id = re.compile(r'with\sID:\s\[([0-9]*)\]')
 # For use with workers exiting, such as authentication failures:
 miqwkr_id_2 = re.compile(r'ID\s\[([0-9]*)\]')
+# Worker lifecycle lines, the same set of lines `grep` used to pre-select for worker parsing
+miqwkr_line = re.compile(r'Interrupt|MIQ\([A-Za-z]*\) ID|"evm_worker_uptime_exceeded|'
+    r'"evm_worker_memory_exceeded|"evm_worker_stop|Worker exiting.')
 
 # top regular expressions
 # Cpu(s): 13.7%us,  1.2%sy,  2.1%ni, 80.0%id,  1.7%wa,  0.0%hi,  0.1%si,  1.3%st
@@ -57,184 +66,37 @@ miq_swap = re.compile(r'Swap:\s+([0-9]*)k\stotal,\s+([0-9]*)k\sused,\s+([0-9]*)k
 # 17526 2320 root 30 10 324m 9.8m 2444 S 0.0 0.2 0:09.38 /var/www/miq/vmdb/lib/workers/bin/worker.rb
 miq_top = re.compile(r'([0-9]+)\s+[0-9]+\s+[A-Za-z0-9]+\s+[0-9]+\s+[0-9\-]+\s+([0-9\.mg]+)\s+'
     r'([0-9\.mg]+)\s+([0-9\.mg]+)\s+[SRDZ]\s+([0-9\.]+)\s+([0-9\.]+)')
+# Leading pid of a top process line, used to pick out the lines of known workers
+miq_top_pid = re.compile(r'([0-9]+)\s')
 
+# Filters on the message args, the name of the first matching filter is appended to the command
+msg_filters = {
+    '-hourly': re.compile(r'\"[0-9\-]*T[0-9\:]*Z\",\s\"hourly\"'),
+    '-daily': re.compile(r'\"[0-9\-]*T[0-9\:]*Z\",\s\"daily\"'),
+    '-EmsRedhat': re.compile(r'\[\[\"EmsRedhat\"\,\s[0-9]*\]\]'),
+    '-EmsVmware': re.compile(r'\[\[\"EmsVmware\"\,\s[0-9]*\]\]'),
+    '-EmsAmazon': re.compile(r'\[\[\"EmsAmazon\"\,\s[0-9]*\]\]'),
+    '-EmsOpenstack': re.compile(r'\[\[\"EmsOpenstack\"\,\s[0-9]*\]\]')
+}
 
-def evm_to_messages(evm_file, filters):
-    test_start = ''
-    test_end = ''
-    line_count = 0
-    messages = {}
-    msg_cmds = {}
-
-    runningtime = time()
-    evmlogfile = open(evm_file, 'r')
-    evm_log_line = evmlogfile.readline()
-    while evm_log_line:
-        line_count += 1
-        evm_log_line = evm_log_line.strip()
-
-        miqmsg_result = miqmsg.search(evm_log_line)
-        if miqmsg_result:
-
-            # Obtains the first timestamp in the log file
-            if test_start == '':
-                ts, pid = get_msg_timestamp_pid(evm_log_line)
-                test_start = ts
-
-            # A message was first put on the queue, this starts its queuing time
-            if (miqmsg_result.group(1) == 'MiqQueue.put'):
-
-                msg_cmd = get_msg_cmd(evm_log_line)
-                msg_id = get_msg_id(evm_log_line)
-                if msg_id:
-                    ts, pid = get_msg_timestamp_pid(evm_log_line)
-                    test_end = ts
-                    messages[msg_id] = MiqMsgStat()
-                    messages[msg_id].msg_id = msg_id
-                    messages[msg_id].msg_id = '\'' + msg_id + '\''
-                    messages[msg_id].msg_cmd = msg_cmd
-                    messages[msg_id].pid_put = pid
-                    messages[msg_id].puttime = ts
-                    msg_args = get_msg_args(evm_log_line)
-                    if msg_args is False:
-                        logger.debug('Could not obtain message args line #: {}'.format(line_count))
-                    else:
-                        messages[msg_id].msg_args = msg_args
-                else:
-                    logger.error('Could not obtain message id, line #: {}'.format(line_count))
-
-            elif (miqmsg_result.group(1) == 'MiqQueue.get_via_drb'):
-                msg_id = get_msg_id(evm_log_line)
-                if msg_id:
-                    if msg_id in messages:
-                        ts, pid = get_msg_timestamp_pid(evm_log_line)
-                        test_end = ts
-                        messages[msg_id].pid_get = pid
-                        messages[msg_id].gettime = ts
-                        messages[msg_id].deq_time = get_msg_deq(evm_log_line)
-                    else:
-                        logger.error('Message ID not in dictionary: {}'.format(msg_id))
-                else:
-                    logger.error('Could not obtain message id, line #: {}'.format(line_count))
-
-            elif (miqmsg_result.group(1) == 'MiqQueue.delivered'):
-                msg_id = get_msg_id(evm_log_line)
-                if msg_id:
-                    ts, pid = get_msg_timestamp_pid(evm_log_line)
-                    test_end = ts
-                    if msg_id in messages:
-                        messages[msg_id].del_time = get_msg_del(evm_log_line)
-                        messages[msg_id].total_time = messages[msg_id].deq_time + \
-                            messages[msg_id].del_time
-                    else:
-                        logger.error('Message ID not in dictionary: {}'.format(msg_id))
-                else:
-                    logger.error('Could not obtain message id, line #: {}'.format(line_count))
+top_keys = ['datetimes', 'cpuus', 'cpusy', 'cpuni', 'cpuid', 'cpuwa', 'cpuhi', 'cpusi', 'cpust',
+    'memtot', 'memuse', 'memfre', 'buffer', 'swatot', 'swause', 'swafre', 'cached']
 
-        if (line_count % 100000) == 0:
-            timediff = time() - runningtime
-            runningtime = time()
-            logger.info('Count {} : Parsed 100000 lines in {}'.format(line_count, timediff))
+# Bump when the parse results change so older cached results are not loaded
+PARSED_LOGS_CACHE_VERSION = '1'
 
-        evm_log_line = evmlogfile.readline()
 
-    # I tried to avoid two loops but this reduced the complexity of filtering on messages.
-    # By filtering over messages, we can better display what is occuring under the covers, as a
-    # daily rollup is picked up off the queue different than a hourly rollup, etc
-    for msg in sorted(messages.keys()):
-        msg_args = messages[msg].msg_args
-        # Determine if the pattern matches and append to the command if it does
-        for p_filter in filters:
-            results = filters[p_filter].search(msg_args.strip())
-            if results:
-                messages[msg].msg_cmd = '{}{}'.format(messages[msg].msg_cmd, p_filter)
-                break
-        msg_cmd = messages[msg].msg_cmd
-        if msg_cmd not in msg_cmds:
-            msg_cmds[msg_cmd] = {}
-            msg_cmds[msg_cmd]['total'] = []
-            msg_cmds[msg_cmd]['queue'] = []
-            msg_cmds[msg_cmd]['execute'] = []
-        if messages[msg].total_time != 0:
-            msg_cmds[msg_cmd]['total'].append(round(messages[msg].total_time, 2))
-            msg_cmds[msg_cmd]['queue'].append(round(messages[msg].deq_time, 2))
-            msg_cmds[msg_cmd]['execute'].append(round(messages[msg].del_time, 2))
-
-    return messages, msg_cmds, test_start, test_end, line_count
+def evm_to_messages(evm_file, filters):
+    evm_parser = EvmLogParser().parse_file(evm_file)
+    messages = MiqMsgStore.from_messages(evm_parser.messages)
+    msg_cmds = messages_to_commands(messages, filters)
+    return messages, msg_cmds, evm_parser.test_start, evm_parser.test_end, evm_parser.line_count
 
 
 def evm_to_workers(evm_file):
-    # Use grep to reduce # of lines to sort through
-    p = subprocess.Popen(['grep', 'Interrupt\\|MIQ([A-Za-z]*) ID\\|"evm_worker_uptime_exceeded\\|'
-            '"evm_worker_memory_exceeded\\|"evm_worker_stop\\|Worker exiting.', evm_file],
-            stdout=subprocess.PIPE)
-    greppedevmlog, err = p.communicate()
-    greppedevmlog = greppedevmlog.strip()
-
-    evmlines = greppedevmlog.split('\n')
-
-    workers = {}
-    wkr_upt_exc = 0
-    wkr_mem_exc = 0
-    wkr_stp = 0
-    wkr_int = 0
-    wkr_ext = 0
-    for evm_log_line in evmlines:
-        ts, pid = get_msg_timestamp_pid(evm_log_line)
-
-        miqwkr_result = miqwkr.search(evm_log_line)
-        if miqwkr_result:
-            workerid = int(miqwkr_result.group(2))
-            if workerid not in workers:
-                workers[workerid] = MiqWorker()
-                workers[workerid].worker_type = miqwkr_result.group(1)
-                workers[workerid].pid = miqwkr_result.group(3)
-                workers[workerid].worker_id = int(workerid)
-                workers[workerid].start_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-        elif 'evm_worker_uptime_exceeded' in evm_log_line:
-            miqwkr_id_result = miqwkr_id.search(evm_log_line)
-            if miqwkr_id_result:
-                workerid = int(miqwkr_id_result.group(1))
-                if workerid in workers:
-                    if not workers[workerid].terminated:
-                        wkr_upt_exc += 1
-                        workers[workerid].terminated = 'evm_worker_uptime_exceeded'
-                        workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-        elif 'evm_worker_memory_exceeded' in evm_log_line:
-            miqwkr_id_result = miqwkr_id.search(evm_log_line)
-            if miqwkr_id_result:
-                workerid = int(miqwkr_id_result.group(1))
-                if workerid in workers:
-                    if not workers[workerid].terminated:
-                        wkr_mem_exc += 1
-                        workers[workerid].terminated = 'evm_worker_memory_exceeded'
-                        workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-        elif 'evm_worker_stop' in evm_log_line:
-            miqwkr_id_result = miqwkr_id.search(evm_log_line)
-            if miqwkr_id_result:
-                workerid = int(miqwkr_id_result.group(1))
-                if workerid in workers:
-                    if not workers[workerid].terminated:
-                        wkr_stp += 1
-                        workers[workerid].terminated = 'evm_worker_stop'
-                        workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-        elif 'Interrupt' in evm_log_line:
-            for workerid in workers:
-                if not workers[workerid].end_ts:
-                    wkr_int += 1
-                    workers[workerid].terminated = 'Interrupted'
-                    workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-        elif 'Worker exiting.' in evm_log_line:
-            miqwkr_id_2_result = miqwkr_id_2.search(evm_log_line)
-            if miqwkr_id_2_result:
-                workerid = int(miqwkr_id_2_result.group(1))
-                if workerid in workers:
-                    if not workers[workerid].terminated:
-                        wkr_ext += 1
-                        workers[workerid].terminated = 'Worker Exited'
-                        workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-
-    return workers, wkr_mem_exc, wkr_upt_exc, wkr_stp, wkr_int, wkr_ext, len(evmlines)
+    evm_parser = EvmLogParser().parse_file(evm_file)
+    return (evm_parser.workers, evm_parser.wkr_mem_exc, evm_parser.wkr_upt_exc,
+        evm_parser.wkr_stp, evm_parser.wkr_int, evm_parser.wkr_ext, evm_parser.line_count)
 
 
 def split_appliance_charts(top_appliance, charts_dir):
@@ -478,76 +340,63 @@ def line_chart_render(title, xtitle, ytitle, x_labels, lines, fname, stacked=Fal
     line_chart.render_to_file(str(fname))
 
 
+def messages_to_commands(messages, filters):
+    """Applies the filters to a :py:class:`MiqMsgStore` and returns the per command timings"""
+    # By filtering over messages, we can better display what is occuring under the covers, as a
+    # daily rollup is picked up off the queue different than a hourly rollup, etc
+    messages.apply_filters(filters)
+    msg_cmds = {}
+    for msg_cmd, rows in messages.group_by_command():
+        completed = messages.data[rows[messages.data['total_time'][rows] != 0]]
+        msg_cmds[msg_cmd] = {}
+        msg_cmds[msg_cmd]['total'] = [round(t, 2) for t in completed['total_time'].tolist()]
+        msg_cmds[msg_cmd]['queue'] = [round(t, 2) for t in completed['deq_time'].tolist()]
+        msg_cmds[msg_cmd]['execute'] = [round(t, 2) for t in completed['del_time'].tolist()]
+    return msg_cmds
+
+
 def messages_to_hourly_buckets(messages, test_start, test_end):
     hr_bkt = {}
     # Hour buckets look like: hr_bkt[msg_cmd][msg_date][msg_hour] = MiqMsgBucket()
-    for msg in messages:
-        # put on queue, deals with queuing:
-        msg_cmd = messages[msg].msg_cmd
-        putdate = messages[msg].puttime[:10]
-        puthour = messages[msg].puttime[11:13]
-        if msg_cmd not in hr_bkt:
-            hr_bkt[msg_cmd] = provision_hour_buckets(test_start, test_end)
-
-        hr_bkt[msg_cmd][putdate][puthour].total_put += 1
-        hr_bkt[msg_cmd][putdate][puthour].sum_deq += messages[msg].deq_time
-        if (hr_bkt[msg_cmd][putdate][puthour].min_deq == 0 or
-                hr_bkt[msg_cmd][putdate][puthour].min_deq > messages[msg].deq_time):
-            hr_bkt[msg_cmd][putdate][puthour].min_deq = messages[msg].deq_time
-        if (hr_bkt[msg_cmd][putdate][puthour].max_deq == 0 or
-                hr_bkt[msg_cmd][putdate][puthour].max_deq < messages[msg].deq_time):
-            hr_bkt[msg_cmd][putdate][puthour].max_deq = messages[msg].deq_time
-        hr_bkt[msg_cmd][putdate][puthour].avg_deq = \
-            hr_bkt[msg_cmd][putdate][puthour].sum_deq / hr_bkt[msg_cmd][putdate][puthour].total_put
-
-        # Get time is when the message is delivered
-        getdate = messages[msg].gettime[:10]
-        gethour = messages[msg].gettime[11:13]
-
-        hr_bkt[msg_cmd][getdate][gethour].total_get += 1
-        hr_bkt[msg_cmd][getdate][gethour].sum_del += messages[msg].del_time
-        if (hr_bkt[msg_cmd][getdate][gethour].min_del == 0 or
-                hr_bkt[msg_cmd][getdate][gethour].min_del > messages[msg].del_time):
-            hr_bkt[msg_cmd][getdate][gethour].min_del = messages[msg].del_time
-        if (hr_bkt[msg_cmd][getdate][gethour].max_del == 0 or
-                hr_bkt[msg_cmd][getdate][gethour].max_del < messages[msg].del_time):
-            hr_bkt[msg_cmd][getdate][gethour].max_del = messages[msg].del_time
-
-        hr_bkt[msg_cmd][getdate][gethour].avg_del = \
-            hr_bkt[msg_cmd][getdate][gethour].sum_del / hr_bkt[msg_cmd][getdate][gethour].total_get
+    for msg_cmd in set(messages.commands[cmd] for cmd in numpy.unique(messages.data['cmd'])):
+        hr_bkt[msg_cmd] = provision_hour_buckets(test_start, test_end)
+
+    # put on queue, deals with queuing:
+    for msg_cmd, date, hour, count, total, minimum, maximum in messages.hourly_reduce('puttime',
+            'deq_time'):
+        bk = hr_bkt[msg_cmd].setdefault(date, {}).setdefault(hour, MiqMsgBucket())
+        bk.total_put = count
+        bk.sum_deq = total
+        bk.min_deq = minimum
+        bk.max_deq = maximum
+        bk.avg_deq = total / count
+
+    # Get time is when the message is delivered
+    for msg_cmd, date, hour, count, total, minimum, maximum in messages.hourly_reduce('gettime',
+            'del_time'):
+        bk = hr_bkt[msg_cmd].setdefault(date, {}).setdefault(hour, MiqMsgBucket())
+        bk.total_get = count
+        bk.sum_del = total
+        bk.min_del = minimum
+        bk.max_del = maximum
+        bk.avg_del = total / count
     return hr_bkt
 
 
-def messages_to_statistics_csv(messages, statistics_file_name):
-    all_statistics = []
-    for msg_id in messages:
-        msg = messages[msg_id]
-
-        added = False
-        if len(all_statistics) > 0:
-            for msg_statistics in all_statistics:
-                if msg_statistics.cmd == msg.msg_cmd:
-
-                    if msg.del_time > 0:
-                        msg_statistics.delivertimes.append(float(msg.del_time))
-                        msg_statistics.gets += 1
-                    msg_statistics.dequeuetimes.append(float(msg.deq_time))
-                    msg_statistics.totaltimes.append(float(msg.total_time))
-                    msg_statistics.puts += 1
-                    added = True
-                    break
+def messages_to_raw_data_csv(messages, csv_file_name):
+    csv_rawdata_path = log_path.join('csv_output', csv_file_name)
+    output_file = csv_rawdata_path.open('w', ensure=True)
+    try:
+        csvwriter = csv.writer(output_file, delimiter=',', quotechar='\'',
+            quoting=csv.QUOTE_MINIMAL)
+        csvwriter.writerow(MiqMsgStat.headers)
+        for row in messages.rows():
+            csvwriter.writerow(row)
+    finally:
+        output_file.close()
 
-        if not added:
-            msg_statistics = MiqMsgLists()
-            msg_statistics.cmd = msg.msg_cmd
-            if msg.del_time > 0:
-                msg_statistics.delivertimes.append(float(msg.del_time))
-                msg_statistics.gets = 1
-            msg_statistics.dequeuetimes.append(float(msg.deq_time))
-            msg_statistics.totaltimes.append(float(msg.total_time))
-            msg_statistics.puts = 1
-            all_statistics.append(msg_statistics)
 
+def messages_to_statistics_csv(messages, statistics_file_name):
     csvdata_path = log_path.join('csv_output', statistics_file_name)
     outputfile = csvdata_path.open('w', ensure=True)
 
@@ -563,18 +412,22 @@ def messages_to_statistics_csv(messages, statistics_file_name):
         csvfile.writerow(headers)
 
         # Contents of CSV
-        for msg_statistics in sorted(all_statistics, key=lambda x: x.cmd):
-            if msg_statistics.gets > 1:
+        for msg_cmd, rows in sorted(messages.group_by_command()):
+            dequeuetimes = messages.data['deq_time'][rows]
+            delivertimes = messages.data['del_time'][rows]
+            delivertimes = delivertimes[delivertimes > 0]
+            totaltimes = messages.data['total_time'][rows]
+            if len(delivertimes) > 1:
                 logger.debug('Samples/Avg/90th/Std: {} : {} : {} : {},Cmd: {}'.format(
-                    str(len(msg_statistics.totaltimes)).rjust(7),
-                    str(round(numpy.average(msg_statistics.totaltimes), 3)).rjust(7),
-                    str(round(numpy.percentile(msg_statistics.totaltimes, 90), 3)).rjust(7),
-                    str(round(numpy.std(msg_statistics.totaltimes), 3)).rjust(7),
-                    msg_statistics.cmd))
-            stats = [msg_statistics.cmd, msg_statistics.puts, msg_statistics.gets]
-            stats.extend(generate_statistics(msg_statistics.dequeuetimes, 3))
-            stats.extend(generate_statistics(msg_statistics.delivertimes, 3))
-            stats.extend(generate_statistics(msg_statistics.totaltimes, 3))
+                    str(len(totaltimes)).rjust(7),
+                    str(round(numpy.average(totaltimes), 3)).rjust(7),
+                    str(round(numpy.percentile(totaltimes, 90), 3)).rjust(7),
+                    str(round(numpy.std(totaltimes), 3)).rjust(7),
+                    msg_cmd))
+            stats = [msg_cmd, len(rows), len(delivertimes)]
+            stats.extend(generate_statistics(dequeuetimes, 3))
+            stats.extend(generate_statistics(delivertimes, 3))
+            stats.extend(generate_statistics(totaltimes, 3))
             csvfile.writerow(stats)
     finally:
         outputfile.close()
@@ -614,216 +467,216 @@ def provision_hour_buckets(test_start, test_end, init=True):
 
 
 def top_to_appliance(top_file):
-    # Find first miqtop log line
-    miqtop_time, timezone_offset = get_first_miqtop(top_file)
-
-    runningtime = time()
-    grep_pattern = '^top\s\-\s\\|^miqtop\:\\|^Cpu(s)\:\\|^Mem\:\\|^Swap\:'
-    # Use grep to reduce # of lines to sort through
-    p = subprocess.Popen(['grep', grep_pattern, top_file], stdout=subprocess.PIPE)
-    greppedtop, err = p.communicate()
-    timediff = time() - runningtime
-    logger.info('Grepped top_output for CPU/Mem/Swap & time data in {}'.format(timediff))
-
-    top_lines = greppedtop.strip().split('\n')
-    line_count = 0
-
-    top_keys = ['datetimes', 'cpuus', 'cpusy', 'cpuni', 'cpuid', 'cpuwa', 'cpuhi', 'cpusi', 'cpust',
-        'memtot', 'memuse', 'memfre', 'buffer', 'swatot', 'swause', 'swafre', 'cached']
-    top_app = dict((key, []) for key in top_keys)
-
-    cur_time = None
-    miqtop_ahead = True
-    runningtime = time()
-    for top_line in top_lines:
-        line_count += 1
-        if 'top - ' in top_line:
-            # top - 11:00:43
-            cur_hour = int(top_line[6:8])
-            cur_min = int(top_line[9:11])
-            cur_sec = int(top_line[12:14])
-            if miqtop_ahead:
-                # Have not found miqtop date/time yet so we must rely on miqtop date/time "ahead"
-                if cur_hour <= miqtop_time.hour:
-                    cur_time = miqtop_time.replace(hour=cur_hour, minute=cur_min, second=cur_sec) \
-                        - timedelta(hours=timezone_offset)
-                else:
-                    # miqtop_time is ahead by date
-                    logger.info('miqtop_time is ahead by one day')
-                    cur_time = miqtop_time - timedelta(days=1)
-                    cur_time = cur_time.replace(hour=cur_hour, minute=cur_min, second=cur_sec) \
-                        - timedelta(hours=timezone_offset)
-            else:
-                cur_time = miqtop_time.replace(hour=cur_hour, minute=cur_min, second=cur_sec) \
-                    - timedelta(hours=timezone_offset)
-        elif 'miqtop: ' in top_line:
-            miqtop_ahead = False
-            # miqtop: .* is-> Mon Jan 26 08:57:39 EST 2015 -0500
-            str_start = top_line.index('is->')
-            miqtop_time = du_parser.parse(top_line[str_start:], fuzzy=True, ignoretz=True)
-            # Time logged in top is the system's time which is ahead/behind by the timezone offset
-            timezone_offset = int(top_line[str_start + 34:str_start + 37])
-            miqtop_time = miqtop_time - timedelta(hours=timezone_offset)
-        elif 'Cpu(s): ' in top_line:
-            miq_cpu_result = miq_cpu.search(top_line)
-            if miq_cpu_result:
-                top_app['datetimes'].append(str(cur_time))
-                top_app['cpuus'].append(float(miq_cpu_result.group(1).strip()))
-                top_app['cpusy'].append(float(miq_cpu_result.group(2).strip()))
-                top_app['cpuni'].append(float(miq_cpu_result.group(3).strip()))
-                top_app['cpuid'].append(float(miq_cpu_result.group(4).strip()))
-                top_app['cpuwa'].append(float(miq_cpu_result.group(5).strip()))
-                top_app['cpuhi'].append(float(miq_cpu_result.group(6).strip()))
-                top_app['cpusi'].append(float(miq_cpu_result.group(7).strip()))
-                top_app['cpust'].append(float(miq_cpu_result.group(8).strip()))
-            else:
-                logger.error('Issue with miq_cpu regex: {}'.format(top_line))
-        elif 'Mem: ' in top_line:
-            miq_mem_result = miq_mem.search(top_line)
-            if miq_mem_result:
-                top_app['memtot'].append(round(float(miq_mem_result.group(1).strip()) / 1024, 2))
-                top_app['memuse'].append(round(float(miq_mem_result.group(2).strip()) / 1024, 2))
-                top_app['memfre'].append(round(float(miq_mem_result.group(3).strip()) / 1024, 2))
-                top_app['buffer'].append(round(float(miq_mem_result.group(4).strip()) / 1024, 2))
-            else:
-                logger.error('Issue with miq_mem regex: {}'.format(top_line))
-        elif 'Swap: ' in top_line:
-            miq_swap_result = miq_swap.search(top_line)
-            if miq_swap_result:
-                top_app['swatot'].append(round(float(miq_swap_result.group(1).strip()) / 1024, 2))
-                top_app['swause'].append(round(float(miq_swap_result.group(2).strip()) / 1024, 2))
-                top_app['swafre'].append(round(float(miq_swap_result.group(3).strip()) / 1024, 2))
-                top_app['cached'].append(round(float(miq_swap_result.group(4).strip()) / 1024, 2))
-            else:
-                logger.error('Issue with miq_swap regex: {}'.format(top_line))
-        else:
-            logger.error('Issue with grepping of top file:{}'.format(top_line))
-        if (line_count % 20000) == 0:
-            timediff = time() - runningtime
-            runningtime = time()
-            logger.info('Count {} : Parsed 20000 lines in {}'.format(line_count, timediff))
-    return top_app, len(top_lines)
+    top_parser = TopLogParser({}).parse_file(top_file)
+    return top_parser.top_appliance, top_parser.line_count
 
 
 def top_to_workers(workers, top_file):
-    # Find first miqtop log line
-    miqtop_time, timezone_offset = get_first_miqtop(top_file)
-
-    runningtime = time()
-    grep_pids = ''
-    for wkr in workers:
-        grep_pids = '{}^{}\s\\|'.format(grep_pids, workers[wkr].pid)
-    grep_pattern = '{}^top\s\-\s\\|^miqtop\:'.format(grep_pids)
-    # Use grep to reduce # of lines to sort through
-    p = subprocess.Popen(['grep', grep_pattern, top_file], stdout=subprocess.PIPE)
-    greppedtop, err = p.communicate()
-    timediff = time() - runningtime
-    logger.info('Grepped top_output for pids & time data in {}'.format(timediff))
-
-    # This is very ugly because miqtop does include the date but top does not
-    # Also pids can be duplicated, so careful attention to detail on when a pid starts and ends
-    top_lines = greppedtop.strip().split('\n')
-    line_count = 0
-    top_workers = {}
-    cur_time = None
-    miqtop_ahead = True
-    runningtime = time()
-    for top_line in top_lines:
-        line_count += 1
-        if 'top - ' in top_line:
-            # top - 11:00:43
-            cur_hour = int(top_line[6:8])
-            cur_min = int(top_line[9:11])
-            cur_sec = int(top_line[12:14])
-            if miqtop_ahead:
-                # Have not found miqtop time yet so we must rely on miqtop time "ahead"
-                if cur_hour <= miqtop_time.hour:
-                    cur_time = miqtop_time.replace(hour=cur_hour, minute=cur_min, second=cur_sec) \
-                        - timedelta(hours=timezone_offset)
-                else:
-                    # miqtop_time is ahead by date
-                    logger.info('miqtop_time is ahead by one day')
-                    cur_time = miqtop_time - timedelta(days=1)
-                    cur_time = cur_time.replace(hour=cur_hour, minute=cur_min, second=cur_sec) \
-                        - timedelta(hours=timezone_offset)
-            else:
-                cur_time = miqtop_time.replace(hour=cur_hour, minute=cur_min, second=cur_sec) \
-                    - timedelta(hours=timezone_offset)
-        elif 'miqtop: ' in top_line:
-            miqtop_ahead = False
-            # miqtop: .* is-> Mon Jan 26 08:57:39 EST 2015 -0500
-            str_start = top_line.index('is->')
-            miqtop_time = du_parser.parse(top_line[str_start:], fuzzy=True, ignoretz=True)
-            # Time logged in top is the system's time which is ahead/behind by the timezone offset
-            timezone_offset = int(top_line[str_start + 34:str_start + 37])
-            miqtop_time = miqtop_time - timedelta(hours=timezone_offset)
-        else:
-            top_results = miq_top.search(top_line)
-            if top_results:
-                top_pid = top_results.group(1)
-                top_virt = convert_top_mem_to_mib(top_results.group(2))
-                top_res = convert_top_mem_to_mib(top_results.group(3))
-                top_share = convert_top_mem_to_mib(top_results.group(4))
-                top_cpu_per = float(top_results.group(5))
-                top_mem_per = float(top_results.group(6))
-                for worker in workers:
-                    if workers[worker].pid == top_pid:
-                        if cur_time > workers[worker].start_ts and \
-                                (workers[worker].end_ts == '' or cur_time < workers[worker].end_ts):
-                            w_id = workers[worker].worker_id
-                            if w_id not in top_workers:
-                                top_workers[w_id] = {}
-                                top_workers[w_id]['datetimes'] = []
-                                top_workers[w_id]['virt'] = []
-                                top_workers[w_id]['res'] = []
-                                top_workers[w_id]['share'] = []
-                                top_workers[w_id]['cpu_per'] = []
-                                top_workers[w_id]['mem_per'] = []
-                            top_workers[w_id]['datetimes'].append(str(cur_time))
-                            top_workers[w_id]['virt'].append(top_virt)
-                            top_workers[w_id]['res'].append(top_res)
-                            top_workers[w_id]['share'].append(top_share)
-                            top_workers[w_id]['cpu_per'].append(top_cpu_per)
-                            top_workers[w_id]['mem_per'].append(top_mem_per)
-                            break
-            else:
-                logger.error('Issue with miq_top regex or grepping of top file:{}'.format(top_line))
-        if (line_count % 20000) == 0:
-            timediff = time() - runningtime
-            runningtime = time()
-            logger.info('Count {} : Parsed 20000 lines in {}'.format(line_count, timediff))
-    return top_workers, len(top_lines)
-
-
-def perf_process_evm(evm_file, top_file):
-    msg_filters = {
-        '-hourly': re.compile(r'\"[0-9\-]*T[0-9\:]*Z\",\s\"hourly\"'),
-        '-daily': re.compile(r'\"[0-9\-]*T[0-9\:]*Z\",\s\"daily\"'),
-        '-EmsRedhat': re.compile(r'\[\[\"EmsRedhat\"\,\s[0-9]*\]\]'),
-        '-EmsVmware': re.compile(r'\[\[\"EmsVmware\"\,\s[0-9]*\]\]'),
-        '-EmsAmazon': re.compile(r'\[\[\"EmsAmazon\"\,\s[0-9]*\]\]'),
-        '-EmsOpenstack': re.compile(r'\[\[\"EmsOpenstack\"\,\s[0-9]*\]\]')
-    }
+    top_parser = TopLogParser(workers).parse_file(top_file)
+    return top_parser.top_workers, top_parser.line_count
+
+
+def parse_evm_log(evm_file, processes=1):
+    """Parses evm.log for messages and workers, optionally in parallel
+
+    With more than one process the log is split into chunks on line boundaries, each chunk is
+    parsed in a process pool and the partial results are merged back together in log order, so
+    the result is identical to the serial parse.
+
+    Args:
+        evm_file: Path to the evm log file
+        processes: Number of processes to parse with, ``None`` or ``0`` uses all cpus
+    Returns:
+        :py:class:`EvmLogParser` with the parsed messages and workers
+    """
+    if not processes:
+        processes = multiprocessing.cpu_count()
+    if processes == 1:
+        return EvmLogParser().parse_file(evm_file)
+
+    chunks = [(evm_file, start, end) for start, end in split_log_file(evm_file, processes)]
+    logger.info('Parsing {} in {} chunks with {} processes'.format(evm_file, len(chunks),
+        processes))
+    evm_parser = EvmLogParser()
+    pool = multiprocessing.Pool(processes)
+    try:
+        # imap hands back the chunks in log order, which is what merge requires
+        for shard in pool.imap(_parse_evm_chunk, chunks):
+            evm_parser.merge(shard)
+    finally:
+        pool.close()
+        pool.join()
+    return evm_parser
+
+
+def _parse_evm_chunk(chunk):
+    evm_file, start, end = chunk
+    return EvmLogParser(sharded=True).parse_file(evm_file, start, end)
+
 
+def split_log_file(log_file, chunks):
+    """Splits a log file into roughly equally sized chunks which start and end on line boundaries
+
+    Returns:
+        List of ``(start, end)`` byte offset tuples covering the whole file
+    """
+    size = os.path.getsize(log_file)
+    boundaries = [0]
+    with open(log_file, 'r') as log:
+        for chunk in range(1, chunks):
+            log.seek(max(size * chunk // chunks, boundaries[-1]))
+            log.readline()
+            if log.tell() >= size:
+                break
+            boundaries.append(log.tell())
+    boundaries.append(size)
+    return zip(boundaries[:-1], boundaries[1:])
+
+
+def parsed_logs_cache_key(*log_files):
+    """Builds the key identifying the parse results of the given log files
+
+    The key covers each file's size, mtime and a sha1 of its first and last MiB, hashing whole
+    multi-GB logs would cost nearly as much as parsing them.
+    """
+    key = hashlib.sha1(PARSED_LOGS_CACHE_VERSION)
+    for log_file in log_files:
+        stat = os.stat(log_file)
+        key.update('{}:{}:{}'.format(log_file, stat.st_size, stat.st_mtime))
+        with open(log_file, 'rb') as log:
+            key.update(log.read(1048576))
+            log.seek(max(stat.st_size - 1048576, 0))
+            key.update(log.read(1048576))
+    return key.hexdigest()
+
+
+def save_parsed_logs(cache_file, cache_key, messages, evm_parser, top_parser):
+    """Writes the parse results of the evm and top_output logs to a compressed npz file"""
+    def worker_ts(ts):
+        return ts.strftime('%Y-%m-%d %H:%M:%S.%f') if ts else ''
+
+    unique_args, args_index = numpy.unique(messages.msg_args, return_inverse=True)
+    # latin-1 round trips any bytes found in the logs through json
+    metadata = {
+        'commands': messages.commands,
+        'msg_args': unique_args.tolist(),
+        'workers': [[worker.worker_id, worker.worker_type, worker.pid, worker_ts(worker.start_ts),
+            worker_ts(worker.end_ts), worker.terminated] for worker in evm_parser.workers.values()],
+        'top_appliance': top_parser.top_appliance,
+        'top_workers': top_parser.top_workers,
+        'top_line_count': top_parser.line_count,
+    }
+    for attr in ['test_start', 'test_end', 'line_count', 'wkr_mem_exc', 'wkr_upt_exc', 'wkr_stp',
+            'wkr_int', 'wkr_ext']:
+        metadata[attr] = getattr(evm_parser, attr)
+    with open(cache_file, 'wb') as cache:
+        numpy.savez_compressed(cache, key=numpy.array(cache_key),
+            metadata=numpy.array(json.dumps(metadata, encoding='latin-1')),
+            data=messages.data, msg_ids=messages.msg_ids.astype(numpy.int64),
+            args_index=args_index)
+    logger.info('Saved parsed logs to {}'.format(cache_file))
+
+
+def load_parsed_logs(cache_file, cache_key):
+    """Loads parse results written by :py:func:`save_parsed_logs`
+
+    Returns:
+        ``(messages, evm_parser, top_parser)`` or ``None`` when there is no cache file for the
+        ``cache_key``
+    """
+    def latin1(value):
+        return value.encode('latin-1') if isinstance(value, unicode) else value
+
+    def worker_ts(ts):
+        return datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f') if ts else ''
+
+    if not os.path.exists(cache_file):
+        return None
+    with numpy.load(cache_file) as cache:
+        if str(cache['key']) != cache_key:
+            logger.info('Parsed logs in {} are out of date'.format(cache_file))
+            return None
+        metadata = json.loads(str(cache['metadata']))
+        msg_args = numpy.array([latin1(args) for args in metadata['msg_args']], dtype=object)
+        messages = MiqMsgStore(numpy.array(map(str, cache['msg_ids']), dtype=object),
+            msg_args[cache['args_index']], cache['data'],
+            [latin1(cmd) for cmd in metadata['commands']])
+
+    evm_parser = EvmLogParser()
+    evm_parser.messages = None
+    for attr in ['test_start', 'test_end', 'line_count', 'wkr_mem_exc', 'wkr_upt_exc', 'wkr_stp',
+            'wkr_int', 'wkr_ext']:
+        setattr(evm_parser, attr, latin1(metadata[attr]))
+    for worker_id, worker_type, pid, start_ts, end_ts, terminated in metadata['workers']:
+        worker = evm_parser.workers[worker_id] = MiqWorker()
+        worker.worker_id = worker_id
+        worker.worker_type = latin1(worker_type)
+        worker.pid = latin1(pid)
+        worker.start_ts = worker_ts(start_ts)
+        worker.end_ts = worker_ts(end_ts)
+        worker.terminated = latin1(terminated)
+
+    def samples(top_samples):
+        return dict((latin1(key), [latin1(value) for value in values])
+            for key, values in top_samples.items())
+
+    top_parser = TopLogParser({})
+    top_parser.line_count = metadata['top_line_count']
+    top_parser.top_appliance = samples(metadata['top_appliance'])
+    top_parser.top_workers = dict((int(w_id), samples(top_samples))
+        for w_id, top_samples in metadata['top_workers'].items())
+    return messages, evm_parser, top_parser
+
+
+def perf_process_evm(evm_file, top_file, processes=1, use_cache=True):
     starttime = time()
     initialtime = starttime
 
-    logger.info('----------- Parsing evm log file for messages -----------')
-    messages, msg_cmds, test_start, test_end, msg_lc = evm_to_messages(evm_file, msg_filters)
-    timediff = time() - starttime
-    logger.info('----------- Completed Parsing evm log file -----------')
-    logger.info('Parsed {} lines of evm log file for messages in {}'.format(msg_lc, timediff))
+    cache_file = '{}.parsed.npz'.format(evm_file)
+    cache_key = parsed_logs_cache_key(evm_file, top_file)
+    parsed_logs = load_parsed_logs(cache_file, cache_key) if use_cache else None
+    if parsed_logs:
+        messages, evm_parser, top_parser = parsed_logs
+        logger.info('Loaded parsed evm/top_output logs from {} in {}'.format(cache_file,
+            time() - starttime))
+    else:
+        logger.info('----------- Parsing evm log file for messages and workers -----------')
+        evm_parser = parse_evm_log(evm_file, processes)
+        messages = MiqMsgStore.from_messages(evm_parser.messages)
+        # The per message objects are no longer needed once the columnar store is built
+        evm_parser.messages = None
+        timediff = time() - starttime
+        logger.info('----------- Completed Parsing evm log file -----------')
+        logger.info('Parsed {} lines of evm log file in {}'.format(evm_parser.line_count,
+            timediff))
+
+        logger.info('----------- Parsing top_output log file for Appliance/Worker Metrics '
+            '-----------')
+        starttime = time()
+        top_parser = TopLogParser(evm_parser.workers).parse_file(top_file)
+        timediff = time() - starttime
+        logger.info('----------- Completed Parsing top_output log -----------')
+        logger.info('Parsed {} lines of top_output file in {}'.format(top_parser.line_count,
+            timediff))
+        if use_cache:
+            save_parsed_logs(cache_file, cache_key, messages, evm_parser, top_parser)
+
+    workers = evm_parser.workers
+    test_start = evm_parser.test_start
+    test_end = evm_parser.test_end
+    msg_lc = wkr_lc = evm_parser.line_count
+    wkr_mem_exc = evm_parser.wkr_mem_exc
+    wkr_upt_exc = evm_parser.wkr_upt_exc
+    wkr_stp = evm_parser.wkr_stp
+    wkr_int = evm_parser.wkr_int
+    wkr_ext = evm_parser.wkr_ext
+    top_appliance = top_parser.top_appliance
+    top_workers = top_parser.top_workers
+    msg_cmds = messages_to_commands(messages, msg_filters)
     logger.info('Total # of Messages: {}'.format(len(messages)))
     logger.info('Total # of Commands: {}'.format(len(msg_cmds)))
     logger.info('Start Time: {}'.format(test_start))
     logger.info('End Time: {}'.format(test_end))
-
-    logger.info('----------- Parsing evm log file for workers -----------')
-    starttime = time()
-    workers, wkr_mem_exc, wkr_upt_exc, wkr_stp, wkr_int, wkr_ext, wkr_lc = evm_to_workers(evm_file)
-    timediff = time() - starttime
-    logger.info('----------- Completed Parsing evm log for workers -----------')
-    logger.info('Parsed {} lines of evm log file for workers in {}'.format(wkr_lc, timediff))
     logger.info('Total # of Workers: {}'.format(len(workers)))
     logger.info('# Workers Memory Exceeded: {}'.format(wkr_mem_exc))
     logger.info('# Workers Uptime Exceeded: {}'.format(wkr_upt_exc))
@@ -831,28 +684,13 @@ def perf_process_evm(evm_file, top_file):
     logger.info('# Workers Stopped: {}'.format(wkr_stp))
     logger.info('# Workers Interrupted: {}'.format(wkr_int))
 
-    logger.info('----------- Parsing top_output log file for Appliance Metrics -----------')
-    starttime = time()
-    top_appliance, tp_lc = top_to_appliance(top_file)
-    timediff = time() - starttime
-    logger.info('----------- Completed Parsing top_output log -----------')
-    logger.info('Parsed {} lines of top_output file for Appliance Metrics in {}'.format(tp_lc,
-        timediff))
-
-    logger.info('----------- Parsing top_output log file for worker CPU/Mem -----------')
-    starttime = time()
-    top_workers, tp_lc = top_to_workers(workers, top_file)
-    timediff = time() - starttime
-    logger.info('----------- Completed Parsing top_output log -----------')
-    logger.info('Parsed {} lines of top_output file for workers in {}'.format(tp_lc, timediff))
-
     charts_dir = log_path.join('charts')
     if not os.path.exists(str(charts_dir)):
         os.mkdir(str(charts_dir))
 
     logger.info('----------- Generating Raw Data csv files -----------')
     starttime = time()
-    generate_raw_data_csv(messages, 'queue-rawdata.csv')
+    messages_to_raw_data_csv(messages, 'queue-rawdata.csv')
     generate_raw_data_csv(workers, 'workers-rawdata.csv')
     timediff = time() - starttime
     logger.info('Generated Raw Data csv files in: {}'.format(timediff))
@@ -1029,10 +867,12 @@ def perf_process_evm(evm_file, top_file):
 
 
 class MiqMsgStat(object):
+    # Parsing keeps one of these per live message, slots keep that footprint small
+    __slots__ = ['msg_id', 'msg_cmd', 'msg_args', 'pid_put', 'pid_get', 'puttime', 'gettime',
+        'deq_time', 'del_time', 'total_time']
+    headers = __slots__
 
     def __init__(self):
-        self.headers = ['msg_id', 'msg_cmd', 'msg_args', 'pid_put', 'pid_get', 'puttime', 'gettime',
-            'deq_time', 'del_time', 'total_time']
         self.msg_id = ''
         self.msg_cmd = ''
         self.msg_args = ''
@@ -1044,6 +884,13 @@ class MiqMsgStat(object):
         self.del_time = 0.0
         self.total_time = 0.0
 
+    def __getstate__(self):
+        return [getattr(self, header) for header in self.headers]
+
+    def __setstate__(self, state):
+        for header, value in zip(self.headers, state):
+            setattr(self, header, value)
+
     def __iter__(self):
         for header in self.headers:
             yield header, getattr(self, header)
@@ -1054,15 +901,154 @@ class MiqMsgStat(object):
             str(self.del_time) + ' : ' + str(self.total_time)
 
 
-class MiqMsgLists(object):
+class MiqMsgStore(object):
+    """Columnar store of the parsed messages
+
+    One row per message, in message id order, kept in the structured numpy array ``data``.
+    Commands are interned into ``commands`` and referenced from the ``base_cmd`` (as logged) and
+    ``cmd`` (after filters are applied) columns, so the reports are computed with vectorized
+    group by operations rather than loops over per message objects.
+    """
+    dtype = numpy.dtype([
+        ('base_cmd', numpy.int32),
+        ('cmd', numpy.int32),
+        ('pid_put', numpy.int32),
+        ('pid_get', numpy.int32),
+        ('puttime', 'datetime64[us]'),
+        ('gettime', 'datetime64[us]'),
+        ('deq_time', numpy.float64),
+        ('del_time', numpy.float64),
+        ('total_time', numpy.float64)])
+
+    def __init__(self, msg_ids, msg_args, data, commands):
+        self.msg_ids = msg_ids
+        self.msg_args = msg_args
+        self.data = data
+        self.commands = commands
+        self._command_ids = dict((cmd, cmd_id) for cmd_id, cmd in enumerate(commands))
+
+    def __len__(self):
+        return len(self.data)
+
+    @classmethod
+    def from_messages(cls, messages):
+        """Builds the store from a dictionary of :py:class:`MiqMsgStat` keyed by message id"""
+        msg_ids = sorted(messages)
+        store = cls(numpy.array(msg_ids, dtype=object), numpy.empty(len(msg_ids), dtype=object),
+            numpy.zeros(len(msg_ids), dtype=cls.dtype), [])
+        columns = dict((name, []) for name in cls.dtype.names)
+        for row, msg_id in enumerate(msg_ids):
+            msg = messages[msg_id]
+            store.msg_args[row] = msg.msg_args
+            columns['base_cmd'].append(store.intern_command(str(msg.msg_cmd)))
+            columns['pid_put'].append(int(msg.pid_put or 0))
+            columns['pid_get'].append(int(msg.pid_get or 0))
+            columns['puttime'].append(msg.puttime or '')
+            columns['gettime'].append(msg.gettime or '')
+            columns['deq_time'].append(float(msg.deq_time))
+            columns['del_time'].append(float(msg.del_time))
+            columns['total_time'].append(float(msg.total_time))
+        columns['cmd'] = columns['base_cmd']
+        for name in cls.dtype.names:
+            store.data[name] = numpy.array(columns[name], dtype=cls.dtype[name])
+        return store
+
+    def intern_command(self, msg_cmd):
+        if msg_cmd not in self._command_ids:
+            self._command_ids[msg_cmd] = len(self.commands)
+            self.commands.append(msg_cmd)
+        return self._command_ids[msg_cmd]
+
+    def apply_filters(self, filters):
+        """Sets each message's command to its logged command with the name of the first filter
+        matching its args appended. Each distinct args string is only searched once.
+        """
+        filter_names = list(filters)
+        unique_args, args_index = numpy.unique(self.msg_args, return_inverse=True)
+        args_filter = numpy.zeros(len(unique_args), dtype=numpy.int64)
+        for index, msg_args in enumerate(unique_args):
+            for filter_index, p_filter in enumerate(filter_names, 1):
+                if filters[p_filter].search(msg_args.strip()):
+                    args_filter[index] = filter_index
+                    break
 
-    def __init__(self):
-        self.cmd = ''
-        self.puts = 0
-        self.gets = 0
-        self.dequeuetimes = []
-        self.delivertimes = []
-        self.totaltimes = []
+        # Intern every distinct (command, filter) combination once and map back to the rows
+        combined = self.data['base_cmd'].astype(numpy.int64) * (len(filter_names) + 1) + \
+            args_filter[args_index]
+        unique_combined, combined_index = numpy.unique(combined, return_inverse=True)
+        names = ['', ] + filter_names
+        cmd_ids = numpy.array([
+            self.intern_command('{}{}'.format(
+                self.commands[value // (len(filter_names) + 1)],
+                names[value % (len(filter_names) + 1)]))
+            for value in unique_combined], dtype=numpy.int32)
+        self.data['cmd'] = cmd_ids[combined_index]
+
+    def group_by_command(self):
+        """Yields ``(command, rows)`` for each command, rows are indexes in message id order"""
+        if not len(self.data):
+            return
+        order = numpy.argsort(self.data['cmd'], kind='mergesort')
+        cmds = self.data['cmd'][order]
+        for rows in numpy.split(order, numpy.flatnonzero(numpy.diff(cmds)) + 1):
+            yield self.commands[self.data['cmd'][rows[0]]], rows
+
+    def hourly_reduce(self, time_column, value_column):
+        """Groups the messages by command and the hour of ``time_column``
+
+        Yields:
+            ``(command, date, hour, count, sum, min, max)`` of ``value_column`` for each group.
+            Messages without a time are grouped under an empty date and hour.
+        """
+        if not len(self.data):
+            return
+        hours = self.data[time_column].astype('datetime64[h]')
+        hour_ids = hours.astype(numpy.int64)
+        missing = hour_ids == numpy.datetime64('NaT', 'h').astype(numpy.int64)
+        first_hour = hour_ids[~missing].min() if (~missing).any() else 0
+        hour_ids = numpy.where(missing, 0, hour_ids - first_hour + 1)
+        keys = (self.data['cmd'].astype(numpy.int64) << 32) + hour_ids
+
+        unique_keys, inverse = numpy.unique(keys, return_inverse=True)
+        values = self.data[value_column]
+        counts = numpy.bincount(inverse)
+        sums = numpy.bincount(inverse, weights=values)
+        order = numpy.argsort(inverse, kind='mergesort')
+        starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+        minimums = numpy.minimum.reduceat(values[order], starts)
+        maximums = numpy.maximum.reduceat(values[order], starts)
+
+        for key, count, total, minimum, maximum in zip(unique_keys, counts, sums, minimums,
+                maximums):
+            hour_id = key & 0xffffffff
+            if hour_id:
+                # 2015-03-04T08
+                stamp = str(numpy.datetime64(int(first_hour + hour_id - 1), 'h'))
+                date, hour = stamp[:10], stamp[11:13]
+            else:
+                date, hour = '', ''
+            yield (self.commands[key >> 32], date, hour, int(count), float(total),
+                float(minimum), float(maximum))
+
+    def rows(self):
+        """Yields the messages as lists in the order of :py:attr:`MiqMsgStat.headers`"""
+        def stamps(times):
+            stamps = numpy.datetime_as_string(times)
+            return numpy.where(stamps == 'NaT', '', numpy.char.replace(stamps, 'T', ' ')).tolist()
+
+        def pids(pid_column):
+            return [pid or '' for pid in pid_column.tolist()]
+
+        columns = izip(
+            ('\'{}\''.format(msg_id) for msg_id in self.msg_ids),
+            (self.commands[cmd] for cmd in self.data['cmd'].tolist()),
+            self.msg_args.tolist(),
+            pids(self.data['pid_put']), pids(self.data['pid_get']),
+            stamps(self.data['puttime']), stamps(self.data['gettime']),
+            self.data['deq_time'].tolist(), self.data['del_time'].tolist(),
+            self.data['total_time'].tolist())
+        for row in columns:
+            yield list(row)
 
 
 class MiqMsgBucket(object):
@@ -1111,3 +1097,502 @@ class MiqWorker(object):
     def __str__(self):
         return self.worker_id + ' : ' + self.worker_type + ' : ' + self.pid + ' : ' + \
             str(self.start_ts) + ' : ' + str(self.end_ts) + ' : ' + self.terminated
+
+
+class EvmLogParser(object):
+    """Single pass, streaming parser for evm.log
+
+    Every line is read once and all of the message and worker extractors are applied to it, so
+    memory is bounded by the number of messages and workers seen rather than by the size of the
+    log file. Lines can be fed one at a time with :py:meth:`parse_line` or a whole file can be
+    consumed with :py:meth:`parse_file`.
+
+    A ``sharded`` parser is fed one chunk of a log.  Gets/deliveries of messages put before the
+    chunk and worker lines are kept aside and resolved when the chunk is passed to
+    :py:meth:`merge` of the parser holding everything before it.
+    """
+
+    def __init__(self, sharded=False):
+        self.sharded = sharded
+        self.orphans = []
+        self.worker_lines = []
+        self.test_end_line = 0
+        self.messages = {}
+        self.workers = {}
+        self.test_start = ''
+        self.test_end = ''
+        self.line_count = 0
+        self.wkr_mem_exc = 0
+        self.wkr_upt_exc = 0
+        self.wkr_stp = 0
+        self.wkr_int = 0
+        self.wkr_ext = 0
+
+    def parse_file(self, evm_file, start=0, end=None):
+        runningtime = time()
+        with open(evm_file, 'r') as evmlogfile:
+            evmlogfile.seek(start)
+            position = start
+            for evm_log_line in evmlogfile:
+                if end is not None and position >= end:
+                    break
+                position += len(evm_log_line)
+                self.parse_line(evm_log_line)
+                if (self.line_count % 100000) == 0:
+                    timediff = time() - runningtime
+                    runningtime = time()
+                    logger.info('Count {} : Parsed 100000 lines in {}'.format(self.line_count,
+                        timediff))
+        return self
+
+    def parse_line(self, evm_log_line):
+        self.line_count += 1
+        evm_log_line = evm_log_line.strip()
+        miqmsg_result = miqmsg.search(evm_log_line)
+        if miqmsg_result:
+            self.parse_message(evm_log_line, miqmsg_result.group(1))
+        if miqwkr_line.search(evm_log_line):
+            if self.sharded:
+                # Worker state depends on every earlier worker line, so leave it for the merge
+                self.worker_lines.append(evm_log_line)
+            else:
+                self.parse_worker(evm_log_line)
+
+    def parse_message(self, evm_log_line, miq_method):
+        messages = self.messages
+        # Obtains the first timestamp in the log file
+        if self.test_start == '':
+            ts, pid = get_msg_timestamp_pid(evm_log_line)
+            self.test_start = ts
+
+        # A message was first put on the queue, this starts its queuing time
+        if miq_method == 'MiqQueue.put':
+            msg_cmd = get_msg_cmd(evm_log_line)
+            msg_id = get_msg_id(evm_log_line)
+            if msg_id:
+                ts, pid = get_msg_timestamp_pid(evm_log_line)
+                self.test_end = ts
+                self.test_end_line = self.line_count
+                messages[msg_id] = MiqMsgStat()
+                messages[msg_id].msg_id = '\'' + msg_id + '\''
+                messages[msg_id].msg_cmd = msg_cmd
+                messages[msg_id].pid_put = pid
+                messages[msg_id].puttime = ts
+                msg_args = get_msg_args(evm_log_line)
+                if msg_args is False:
+                    logger.debug('Could not obtain message args line #: {}'.format(
+                        self.line_count))
+                else:
+                    messages[msg_id].msg_args = msg_args
+            else:
+                logger.error('Could not obtain message id, line #: {}'.format(self.line_count))
+
+        elif miq_method == 'MiqQueue.get_via_drb':
+            msg_id = get_msg_id(evm_log_line)
+            if msg_id:
+                if msg_id in messages:
+                    ts, pid = get_msg_timestamp_pid(evm_log_line)
+                    self.test_end = ts
+                    self.test_end_line = self.line_count
+                    messages[msg_id].pid_get = pid
+                    messages[msg_id].gettime = ts
+                    messages[msg_id].deq_time = get_msg_deq(evm_log_line)
+                else:
+                    ts, pid = get_msg_timestamp_pid(evm_log_line)
+                    self.missing_message(miq_method, msg_id, ts, pid, get_msg_deq(evm_log_line))
+            else:
+                logger.error('Could not obtain message id, line #: {}'.format(self.line_count))
+
+        elif miq_method == 'MiqQueue.delivered':
+            msg_id = get_msg_id(evm_log_line)
+            if msg_id:
+                ts, pid = get_msg_timestamp_pid(evm_log_line)
+                self.test_end = ts
+                self.test_end_line = self.line_count
+                if msg_id in messages:
+                    messages[msg_id].del_time = get_msg_del(evm_log_line)
+                    messages[msg_id].total_time = messages[msg_id].deq_time + \
+                        messages[msg_id].del_time
+                else:
+                    self.missing_message(miq_method, msg_id, ts, pid, get_msg_del(evm_log_line))
+            else:
+                logger.error('Could not obtain message id, line #: {}'.format(self.line_count))
+
+    def missing_message(self, miq_method, msg_id, ts, pid, timing):
+        """Called for a get/delivery of a message which was not put in the lines parsed so far"""
+        if self.sharded:
+            self.orphans.append((miq_method, msg_id, ts, pid, timing, self.line_count))
+        else:
+            logger.error('Message ID not in dictionary: {}'.format(msg_id))
+
+    def merge(self, shard):
+        """Merges a sharded parser fed with the chunk of the log that follows this parser's"""
+        messages = self.messages
+        if self.test_start == '':
+            self.test_start = shard.test_start
+        test_end, test_end_line = shard.test_end, shard.test_end_line
+
+        # Orphans precede any put of the same message id within the shard, so they apply to the
+        # messages merged so far before the shard's own messages replace them
+        for miq_method, msg_id, ts, pid, timing, line in shard.orphans:
+            if msg_id not in messages:
+                logger.error('Message ID not in dictionary: {}'.format(msg_id))
+            elif miq_method == 'MiqQueue.get_via_drb':
+                messages[msg_id].pid_get = pid
+                messages[msg_id].gettime = ts
+                messages[msg_id].deq_time = timing
+                if line > test_end_line:
+                    test_end, test_end_line = ts, line
+            else:
+                messages[msg_id].del_time = timing
+                messages[msg_id].total_time = messages[msg_id].deq_time + timing
+        if test_end_line:
+            self.test_end = test_end
+        messages.update(shard.messages)
+
+        for evm_log_line in shard.worker_lines:
+            self.parse_worker(evm_log_line)
+        self.line_count += shard.line_count
+        return self
+
+    def parse_worker(self, evm_log_line):
+        workers = self.workers
+        ts, pid = get_msg_timestamp_pid(evm_log_line)
+
+        miqwkr_result = miqwkr.search(evm_log_line)
+        if miqwkr_result:
+            workerid = int(miqwkr_result.group(2))
+            if workerid not in workers:
+                workers[workerid] = MiqWorker()
+                workers[workerid].worker_type = miqwkr_result.group(1)
+                workers[workerid].pid = miqwkr_result.group(3)
+                workers[workerid].worker_id = int(workerid)
+                workers[workerid].start_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
+        elif 'evm_worker_uptime_exceeded' in evm_log_line:
+            if self._terminate_worker(miqwkr_id, evm_log_line, ts, 'evm_worker_uptime_exceeded'):
+                self.wkr_upt_exc += 1
+        elif 'evm_worker_memory_exceeded' in evm_log_line:
+            if self._terminate_worker(miqwkr_id, evm_log_line, ts, 'evm_worker_memory_exceeded'):
+                self.wkr_mem_exc += 1
+        elif 'evm_worker_stop' in evm_log_line:
+            if self._terminate_worker(miqwkr_id, evm_log_line, ts, 'evm_worker_stop'):
+                self.wkr_stp += 1
+        elif 'Interrupt' in evm_log_line:
+            for workerid in workers:
+                if not workers[workerid].end_ts:
+                    self.wkr_int += 1
+                    workers[workerid].terminated = 'Interrupted'
+                    workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
+        elif 'Worker exiting.' in evm_log_line:
+            if self._terminate_worker(miqwkr_id_2, evm_log_line, ts, 'Worker Exited'):
+                self.wkr_ext += 1
+
+    def _terminate_worker(self, id_regex, evm_log_line, ts, reason):
+        """Marks the worker referenced by the line as terminated, returns True if it was running"""
+        miqwkr_id_result = id_regex.search(evm_log_line)
+        if miqwkr_id_result:
+            workerid = int(miqwkr_id_result.group(1))
+            if workerid in self.workers and not self.workers[workerid].terminated:
+                self.workers[workerid].terminated = reason
+                self.workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
+                return True
+        return False
+
+
+class TopLogParser(object):
+    """Single pass, streaming parser for top_output.log
+
+    Collects the appliance wide CPU/Memory/Swap samples and the per worker CPU/Memory samples (for
+    the workers found in evm.log) in the same pass over the file.
+    """
+
+    def __init__(self, workers, miqtop_time=None, timezone_offset=0):
+        self.top_appliance = dict((key, []) for key in top_keys)
+        self.top_workers = {}
+        self.line_count = 0
+        self.miqtop_time = miqtop_time
+        self.timezone_offset = timezone_offset
+        self.cur_time = None
+        self.miqtop_ahead = True
+        # pids can be duplicated, so keep every worker that ever ran with a given pid
+        self._pid_workers = {}
+        for worker in workers:
+            self._pid_workers.setdefault(workers[worker].pid, []).append(workers[worker])
+
+    def parse_file(self, top_file):
+        # Find first miqtop log line
+        self.miqtop_time, self.timezone_offset = get_first_miqtop(top_file)
+
+        runningtime = time()
+        with open(top_file, 'r') as toplogfile:
+            for top_line in toplogfile:
+                self.parse_line(top_line)
+                if (self.line_count % 20000) == 0:
+                    timediff = time() - runningtime
+                    runningtime = time()
+                    logger.info('Count {} : Parsed 20000 lines in {}'.format(self.line_count,
+                        timediff))
+        return self
+
+    def parse_line(self, top_line):
+        self.line_count += 1
+        top_line = top_line.rstrip()
+        if top_line.startswith('top - '):
+            self.parse_top_time(top_line)
+        elif top_line.startswith('miqtop: '):
+            self.parse_miqtop_time(top_line)
+        elif top_line.startswith(('Cpu(s): ', 'Mem: ', 'Swap: ')):
+            self.parse_appliance(top_line)
+        else:
+            top_pid_result = miq_top_pid.match(top_line)
+            if top_pid_result and top_pid_result.group(1) in self._pid_workers:
+                self.parse_worker(top_line)
+
+    def parse_top_time(self, top_line):
+        # This is very ugly because miqtop does include the date but top does not
+        # top - 11:00:43
+        cur_hour = int(top_line[6:8])
+        cur_min = int(top_line[9:11])
+        cur_sec = int(top_line[12:14])
+        if self.miqtop_ahead and cur_hour > self.miqtop_time.hour:
+            # Have not found miqtop date/time yet so we must rely on miqtop date/time "ahead",
+            # miqtop_time is ahead by date
+            logger.info('miqtop_time is ahead by one day')
+            cur_time = self.miqtop_time - timedelta(days=1)
+        else:
+            cur_time = self.miqtop_time
+        self.cur_time = cur_time.replace(hour=cur_hour, minute=cur_min, second=cur_sec) \
+            - timedelta(hours=self.timezone_offset)
+
+    def parse_miqtop_time(self, top_line):
+        self.miqtop_ahead = False
+        # miqtop: .* is-> Mon Jan 26 08:57:39 EST 2015 -0500
+        str_start = top_line.index('is->')
+        miqtop_time = du_parser.parse(top_line[str_start:], fuzzy=True, ignoretz=True)
+        # Time logged in top is the system's time which is ahead/behind by the timezone offset
+        self.timezone_offset = int(top_line[str_start + 34:str_start + 37])
+        self.miqtop_time = miqtop_time - timedelta(hours=self.timezone_offset)
+
+    def parse_appliance(self, top_line):
+        top_app = self.top_appliance
+        if top_line.startswith('Cpu(s): '):
+            miq_cpu_result = miq_cpu.search(top_line)
+            if miq_cpu_result:
+                top_app['datetimes'].append(str(self.cur_time))
+                top_app['cpuus'].append(float(miq_cpu_result.group(1).strip()))
+                top_app['cpusy'].append(float(miq_cpu_result.group(2).strip()))
+                top_app['cpuni'].append(float(miq_cpu_result.group(3).strip()))
+                top_app['cpuid'].append(float(miq_cpu_result.group(4).strip()))
+                top_app['cpuwa'].append(float(miq_cpu_result.group(5).strip()))
+                top_app['cpuhi'].append(float(miq_cpu_result.group(6).strip()))
+                top_app['cpusi'].append(float(miq_cpu_result.group(7).strip()))
+                top_app['cpust'].append(float(miq_cpu_result.group(8).strip()))
+            else:
+                logger.error('Issue with miq_cpu regex: {}'.format(top_line))
+        elif top_line.startswith('Mem: '):
+            miq_mem_result = miq_mem.search(top_line)
+            if miq_mem_result:
+                top_app['memtot'].append(round(float(miq_mem_result.group(1).strip()) / 1024, 2))
+                top_app['memuse'].append(round(float(miq_mem_result.group(2).strip()) / 1024, 2))
+                top_app['memfre'].append(round(float(miq_mem_result.group(3).strip()) / 1024, 2))
+                top_app['buffer'].append(round(float(miq_mem_result.group(4).strip()) / 1024, 2))
+            else:
+                logger.error('Issue with miq_mem regex: {}'.format(top_line))
+        else:
+            miq_swap_result = miq_swap.search(top_line)
+            if miq_swap_result:
+                top_app['swatot'].append(round(float(miq_swap_result.group(1).strip()) / 1024, 2))
+                top_app['swause'].append(round(float(miq_swap_result.group(2).strip()) / 1024, 2))
+                top_app['swafre'].append(round(float(miq_swap_result.group(3).strip()) / 1024, 2))
+                top_app['cached'].append(round(float(miq_swap_result.group(4).strip()) / 1024, 2))
+            else:
+                logger.error('Issue with miq_swap regex: {}'.format(top_line))
+
+    def parse_worker(self, top_line):
+        top_results = miq_top.search(top_line)
+        if not top_results:
+            logger.error('Issue with miq_top regex of top file:{}'.format(top_line))
+            return
+        cur_time = self.cur_time
+        for worker in self._pid_workers.get(top_results.group(1), []):
+            if cur_time > worker.start_ts and (worker.end_ts == '' or cur_time < worker.end_ts):
+                w_id = worker.worker_id
+                if w_id not in self.top_workers:
+                    self.top_workers[w_id] = {}
+                    self.top_workers[w_id]['datetimes'] = []
+                    self.top_workers[w_id]['virt'] = []
+                    self.top_workers[w_id]['res'] = []
+                    self.top_workers[w_id]['share'] = []
+                    self.top_workers[w_id]['cpu_per'] = []
+                    self.top_workers[w_id]['mem_per'] = []
+                self.top_workers[w_id]['datetimes'].append(str(cur_time))
+                self.top_workers[w_id]['virt'].append(convert_top_mem_to_mib(top_results.group(2)))
+                self.top_workers[w_id]['res'].append(convert_top_mem_to_mib(top_results.group(3)))
+                self.top_workers[w_id]['share'].append(
+                    convert_top_mem_to_mib(top_results.group(4)))
+                self.top_workers[w_id]['cpu_per'].append(float(top_results.group(5)))
+                self.top_workers[w_id]['mem_per'].append(float(top_results.group(6)))
+                break
+
+
+class QueueMonitor(EvmLogParser):
+    """Live queue latency and worker memory monitor
+
+    Follows evm.log and top_output.log on the appliance with :py:class:`utils.ssh.SSHTail` and
+    keeps rolling windows of the last ``window`` dequeue and deliver timings per command and of
+    the last ``window`` resident memory samples per worker. Only messages which are still
+    outstanding are kept (at most ``max_outstanding``), so memory use stays bounded however long
+    the appliance is monitored.
+
+    Usage:
+
+        monitor = QueueMonitor()
+        monitor.start()
+        violations = monitor.watch(3600, {'backlog': 5000, 'deq_time_p90': 60})
+        assert not violations
+    """
+    log_dir = '/var/www/miq/vmdb/log/'
+
+    def __init__(self, window=1000, filters=None, max_outstanding=100000, **connect_kwargs):
+        super(QueueMonitor, self).__init__()
+        self.messages = OrderedDict()
+        self.window = window
+        self.filters = msg_filters if filters is None else filters
+        self.max_outstanding = max_outstanding
+        self.dropped = 0
+        self.deq_times = {}
+        self.del_times = {}
+        self.worker_memory = {}
+        self._pid_workers = {}
+        self.evm_tail = SSHTail('{}evm.log'.format(self.log_dir), **connect_kwargs)
+        self.top_tail = SSHTail('{}top_output.log'.format(self.log_dir), **connect_kwargs)
+
+    def start(self):
+        """Starts following the logs from their current end and seeds the running workers"""
+        self.evm_tail.set_initial_file_end()
+        self.top_tail.set_initial_file_end()
+        for worker in self.evm_tail.status['workers']:
+            if worker.get('ID', '').isdigit() and worker.get('PID'):
+                workerid = int(worker['ID'])
+                self.workers[workerid] = MiqWorker()
+                self.workers[workerid].worker_id = workerid
+                self.workers[workerid].worker_type = worker.get('Worker Type', '')
+                self.workers[workerid].pid = worker['PID']
+        self._update_worker_pids()
+
+    def poll(self):
+        """Parses everything logged since the previous poll"""
+        for evm_log_line in self.evm_tail:
+            self.parse_line(evm_log_line)
+        self._update_worker_pids()
+        for top_line in self.top_tail:
+            self.parse_top_line(top_line)
+
+    def watch(self, duration, thresholds, interval=60):
+        """Polls the logs for ``duration`` seconds, returning early once a threshold is crossed
+
+        Returns:
+            List of threshold violations, see :py:meth:`threshold_violations`
+        """
+        end_time = time() + duration
+        while True:
+            self.poll()
+            violations = self.threshold_violations(thresholds)
+            if violations:
+                return violations
+            remaining = end_time - time()
+            if remaining <= 0:
+                return []
+            sleep(min(interval, remaining))
+
+    def parse_message(self, evm_log_line, miq_method):
+        super(QueueMonitor, self).parse_message(evm_log_line, miq_method)
+        if miq_method == 'MiqQueue.put' and len(self.messages) > self.max_outstanding:
+            # Lost messages must not grow the outstanding messages forever
+            self.messages.popitem(last=False)
+            self.dropped += 1
+        elif miq_method == 'MiqQueue.delivered':
+            msg = self.messages.pop(get_msg_id(evm_log_line), None)
+            if msg is not None:
+                msg_cmd = msg.msg_cmd
+                for p_filter in self.filters:
+                    if self.filters[p_filter].search(msg.msg_args.strip()):
+                        msg_cmd = '{}{}'.format(msg_cmd, p_filter)
+                        break
+                self._window(self.deq_times, msg_cmd).append(msg.deq_time)
+                self._window(self.del_times, msg_cmd).append(msg.del_time)
+
+    def missing_message(self, miq_method, msg_id, ts, pid, timing):
+        # Messages put before the monitor started are not followed
+        pass
+
+    def parse_top_line(self, top_line):
+        top_pid_result = miq_top_pid.match(top_line)
+        if top_pid_result and top_pid_result.group(1) in self._pid_workers:
+            top_results = miq_top.search(top_line)
+            if top_results:
+                worker = self._pid_workers[top_pid_result.group(1)]
+                self._window(self.worker_memory, worker.worker_id).append(
+                    convert_top_mem_to_mib(top_results.group(3)))
+
+    def statistics(self):
+        """Returns the dequeue/deliver time percentiles per command
+
+        Returns:
+            Dictionary of command to a dictionary with the ``samples`` count and
+            ``deq_time_p50``, ``deq_time_p90``, ``deq_time_p99``, ``del_time_p50``, ...
+        """
+        statistics = {}
+        for msg_cmd in self.deq_times:
+            cmd_statistics = statistics[msg_cmd] = {'samples': len(self.deq_times[msg_cmd])}
+            for measurement, timings in [('deq_time', self.deq_times[msg_cmd]),
+                    ('del_time', self.del_times[msg_cmd])]:
+                for percentile, value in zip([50, 90, 99], numpy.percentile(timings, [50, 90, 99])):
+                    cmd_statistics['{}_p{}'.format(measurement, percentile)] = round(value, 3)
+        return statistics
+
+    def threshold_violations(self, thresholds):
+        """Checks the current windows against thresholds, as in perf_tests.yaml
+
+        Args:
+            thresholds: Dictionary with any of ``backlog`` (outstanding messages),
+                ``worker_memory`` (resident MiB of any sample in a worker's window) and
+                ``<deq|del>_time_p<50|90|99>`` (seconds, checked for every command)
+        Returns:
+            List of strings describing each crossed threshold
+        """
+        violations = []
+        if 'backlog' in thresholds and len(self.messages) > thresholds['backlog']:
+            violations.append('Queue backlog {} > {}'.format(len(self.messages),
+                thresholds['backlog']))
+        for msg_cmd, cmd_statistics in sorted(self.statistics().items()):
+            for key in sorted(cmd_statistics):
+                if key in thresholds and cmd_statistics[key] > thresholds[key]:
+                    violations.append('{} {} {} > {}'.format(msg_cmd, key, cmd_statistics[key],
+                        thresholds[key]))
+        if 'worker_memory' in thresholds:
+            for workerid, memory in sorted(self.worker_memory.items()):
+                if memory and max(memory) > thresholds['worker_memory']:
+                    violations.append('Worker {}-{} memory {} MiB > {} MiB'.format(workerid,
+                        self.workers[workerid].worker_type, max(memory),
+                        thresholds['worker_memory']))
+        return violations
+
+    def close(self):
+        self.evm_tail.close()
+        self.top_tail.close()
+
+    def _update_worker_pids(self):
+        self._pid_workers = {}
+        for workerid, worker in self.workers.items():
+            if worker.terminated:
+                # Terminated workers are gone for good, so are their windows
+                del self.workers[workerid]
+                self.worker_memory.pop(workerid, None)
+            else:
+                self._pid_workers[worker.pid] = worker
+
+    def _window(self, windows, key):
+        if key not in windows:
+            windows[key] = deque(maxlen=self.window)
+        return windows[key]
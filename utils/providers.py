@@ -4,11 +4,18 @@ To quickly add all providers::
 
     setup_providers(validate=False)
 
+To take a snapshot of the VMs on all providers::
+
+    vms, errors = vm_inventory(vm_filter=lambda name: name.startswith('test_'))
+
 """
 import random
-from collections import Mapping
+import time
+from collections import Mapping, namedtuple
 from functools import partial
+from multiprocessing.pool import ThreadPool
 from operator import methodcaller
+from threading import BoundedSemaphore
 
 import cfme.fixtures.pytest_selenium as sel
 from cfme.web_ui import Quadicon, paginator, toolbar
@@ -475,6 +482,114 @@ def destroy_vm(provider_mgmt, vm_name):
         logger.error('%s destroying VM %s (%s)', type(e).__name__, vm_name, e.message)
 
 
+#: A row of the table returned by :py:func:`vm_inventory`
+VMSnapshot = namedtuple('VMSnapshot',
+    ['provider_key', 'name', 'uuid', 'power_state', 'ip', 'creation_time'])
+
+#: Backend methods looking up the :py:class:`VMSnapshot` fields of a VM
+_vm_property_getters = {
+    'power_state': 'vm_status',
+    'ip': 'current_ip_address',
+    'creation_time': 'vm_creation_time',
+}
+
+
+def _list_provider_vms(provider_key, vm_filter, properties):
+    """Returns the backend of a provider, the :py:class:`VMSnapshot` of its matching VMs and
+    whether their properties were looked up already"""
+    provider_mgmt = provider_factory(provider_key)
+    if getattr(provider_mgmt, 'native_bulk_vm_properties', False):
+        # One query for all the VMs, nothing left to look up per VM
+        vms = [VMSnapshot(provider_key, vm_name, **{field: vm_props.get(field)
+                for field in VMSnapshot._fields[2:]})
+            for vm_name, vm_props in provider_mgmt.bulk_vm_properties(properties).iteritems()]
+        looked_up = True
+    else:
+        vms = [VMSnapshot(provider_key, vm_name, None, None, None, None)
+            for vm_name in provider_mgmt.list_vm()]
+        looked_up = False
+    if vm_filter is not None:
+        vms = [vm for vm in vms if vm_filter(vm.name)]
+    return provider_mgmt, vms, looked_up
+
+
+def vm_inventory(provider_keys=None, vm_filter=None,
+        properties=('uuid', 'power_state', 'ip', 'creation_time'),
+        max_workers=16, max_per_provider=4, timeout=600):
+    """Takes a snapshot of the VMs on many providers concurrently
+
+    The providers are listed in parallel. Backends with ``native_bulk_vm_properties`` return the
+    requested properties of all their VMs in the same query (see ``bulk_vm_properties`` of
+    :py:mod:`utils.mgmt_system`), on the others they are looked up for every matching VM in
+    parallel, at most ``max_per_provider`` calls at once on one provider and at most
+    ``max_workers`` calls at once overall. Whatever is not done in ``timeout`` seconds is given
+    up on (left to finish in the background) and reported like a failure.
+
+    Args:
+        provider_keys: Keys of the providers to inspect, all providers by default
+        vm_filter: Callable taking a VM name, only the VMs it returns true for are inspected
+        properties: :py:class:`VMSnapshot` fields to look up, the others are ``None``. The uuid
+            is only known on the backends with ``native_bulk_vm_properties``.
+        max_workers: Max calls to the providers at once
+        max_per_provider: Max calls to one provider at once
+        timeout: Seconds to wait for the whole inventory
+
+    Returns:
+        A tuple of a list of :py:class:`VMSnapshot` rows, and a dict of provider keys and
+        exceptions of the providers which could not be listed. A property which could not be
+        looked up (the exception is logged) is ``None`` in the row.
+    """
+    provider_keys = list(provider_keys or list_all_providers())
+    deadline = time.time() + timeout
+    calls = BoundedSemaphore(max_workers)
+
+    def call(f, *args):
+        with calls:
+            return f(*args)
+
+    def remaining():
+        return max(deadline - time.time(), 0)
+
+    # A pool per provider, so that a slow provider only holds up its own calls
+    pools = {provider_key: ThreadPool(max_per_provider) for provider_key in provider_keys}
+    try:
+        listings = {provider_key: pools[provider_key].apply_async(call,
+                (_list_provider_vms, provider_key, vm_filter, properties))
+            for provider_key in provider_keys}
+        errors = {}
+        lookups = []
+        for provider_key in provider_keys:
+            try:
+                provider_mgmt, vms, looked_up = listings[provider_key].get(remaining())
+            except Exception as e:
+                logger.error('Failed to list the VMs of provider %s (%s: %s)',
+                    provider_key, type(e).__name__, e)
+                errors[provider_key] = e
+                continue
+            for vm in vms:
+                lookups.append((vm, {
+                    field: pools[provider_key].apply_async(call,
+                        (getattr(provider_mgmt, getter_name), vm.name))
+                    for field, getter_name in _vm_property_getters.items()
+                    if field in properties and not looked_up}))
+
+        snapshot = []
+        for vm, vm_lookups in lookups:
+            values = {}
+            for field, lookup in vm_lookups.items():
+                try:
+                    values[field] = lookup.get(remaining())
+                except Exception as e:
+                    logger.error('Failed to get %s of VM %s on %s (%s: %s)',
+                        field, vm.name, vm.provider_key, type(e).__name__, e)
+            snapshot.append(vm._replace(**values))
+        return snapshot, errors
+    finally:
+        # Does not wait for the calls still running
+        for pool in pools.values():
+            pool.terminate()
+
+
 class UnknownProvider(Exception):
     def __init__(self, provider_key, *args, **kwargs):
         super(UnknownProvider, self).__init__(provider_key, *args, **kwargs)
@@ -1,7 +1,11 @@
 # coding: utf-8 -*-
 import re
+import select
+import socket
 import sys
-from collections import namedtuple
+import threading
+import uuid
+from collections import defaultdict, namedtuple
 from urlparse import urlparse
 
 import paramiko
@@ -19,7 +23,25 @@ from utils.timeutil import parsetime
 # Default blocking time before giving up on an ssh command execution,
 # in seconds (float)
 RUNCMD_TIMEOUT = 1200.0
-SSHResult = namedtuple("SSHResult", ["rc", "output"])
+# Size of the chunks read from the channel when streaming command output, in bytes
+STREAM_BUFSIZE = 65536
+# Seconds between keepalive packets on pooled transports, so idle and dead ones are noticed
+POOL_KEEPALIVE = 30
+
+
+class SSHResult(namedtuple("SSHResult", ["rc", "output"])):
+    """Exit status and output of a command, unpacks as ``(rc, output)``
+
+    ``stderr`` is only kept apart for the results of :py:meth:`SSHClient.run_commands`, ``output``
+    being just stdout there. Elsewhere ``output`` holds both and ``stderr`` is None.
+    """
+    stderr = None
+
+    def __new__(cls, rc, output, stderr=None):
+        result = super(SSHResult, cls).__new__(cls, rc, output)
+        result.stderr = stderr
+        return result
+
 
 _ssh_key_file = project_path.join('.generated_ssh_key')
 _ssh_pubkey_file = project_path.join('.generated_ssh_key.pub')
@@ -34,17 +56,91 @@ _ssh_keystate = AttrDict({
 _ssh_keystate.update({v: k for k, v in _ssh_keystate.items()})
 
 
+class SSHConnectionPool(object):
+    """Authenticated ssh transports shared between clients
+
+    Keeps one transport per (hostname, port, username). Every command, scp and sftp session
+    opens its own channel on the shared transport, so concurrent commands need no new
+    connection and only the first client for a host pays for the ssh handshake.
+    """
+    def __init__(self):
+        self._transports = {}
+        self._locks = defaultdict(threading.RLock)
+        self._lock = threading.Lock()
+        self.handshakes = defaultdict(int)
+        self.reused = defaultdict(int)
+
+    def lock(self, key):
+        """Lock held while connecting a key, so concurrent clients do one handshake"""
+        with self._lock:
+            return self._locks[key]
+
+    def get(self, key):
+        """Returns the live transport for a key, or None"""
+        transport = self._transports.get(key)
+        if transport is None:
+            return None
+        elif not transport.is_active():
+            logger.debug('discarding dead pooled ssh transport to {}'.format(key[0]))
+            self.discard(key, transport)
+            return None
+        self.reused[key[0]] += 1
+        return transport
+
+    def add(self, key, transport):
+        """Adds the transport of a freshly connected client"""
+        if self._transports.get(key) is transport:
+            # Already pooled while installing the ssh keys
+            return
+        self.handshakes[key[0]] += 1
+        transport.set_keepalive(POOL_KEEPALIVE)
+        self._transports[key] = transport
+
+    def discard(self, key, transport=None):
+        """Drops the pooled transport for a key and closes it
+
+        If ``transport`` is passed, the pool is left alone when a new transport was pooled since.
+        """
+        with self._lock:
+            if transport is None or self._transports.get(key) is transport:
+                transport = self._transports.pop(key, None)
+        if transport is not None:
+            transport.close()
+
+    def close(self, hostname=None):
+        """Closes all pooled transports, or only the ones to ``hostname``"""
+        for key in self._transports.keys():
+            if hostname is None or key[0] == hostname:
+                self.discard(key)
+
+    @property
+    def handshake_count(self):
+        return sum(self.handshakes.values())
+
+    @property
+    def reuse_count(self):
+        return sum(self.reused.values())
+
+
+connection_pool = SSHConnectionPool()
+
+
 class SSHClient(paramiko.SSHClient):
     """paramiko.SSHClient wrapper
 
     Allows copying/overriding and use as a context manager
     Constructor kwargs are handed directly to paramiko.SSHClient.connect()
+
+    Unless ``pooled`` is False, the transport is shared with all other pooled clients connecting
+    to the same host as the same user, see :py:class:`SSHConnectionPool`. Closing a pooled client
+    only lets go of the transport; ``connection_pool.close()`` shuts the transports down.
     """
-    def __init__(self, stream_output=False, keystate=_ssh_keystate.not_installed,
+    def __init__(self, stream_output=False, keystate=_ssh_keystate.not_installed, pooled=True,
             **connect_kwargs):
         super(SSHClient, self).__init__()
         self._streaming = stream_output
         self._keystate = keystate
+        self._pooled = pooled
         logger.debug('client initialized with keystate {}'.format(_ssh_keystate[keystate]))
 
         # Load credentials and destination from confs, set up sane defaults
@@ -80,6 +176,7 @@ class SSHClient(paramiko.SSHClient):
         # host will still have keys installed if they have already been
         if self._connect_kwargs['hostname'] == new_connect_kwargs.get('hostname'):
             new_connect_kwargs['keystate'] = self._keystate
+        new_connect_kwargs['pooled'] = self._pooled
         new_client = SSHClient(**new_connect_kwargs)
         return new_client
 
@@ -110,6 +207,18 @@ class SSHClient(paramiko.SSHClient):
     def connected(self):
         return self._transport and self._transport.active
 
+    @property
+    def _pool_key(self):
+        return (self._connect_kwargs['hostname'], self._connect_kwargs.get('port', 22),
+            self._connect_kwargs.get('username'))
+
+    def close(self):
+        if self._pooled:
+            # The transport belongs to the pool, other clients may still be using it
+            self._transport = None
+        else:
+            super(SSHClient, self).close()
+
     def connect(self, hostname=None, **kwargs):
         """See paramiko.SSHClient.connect"""
         if hostname and hostname != self._connect_kwargs['hostname']:
@@ -118,11 +227,22 @@ class SSHClient(paramiko.SSHClient):
 
         if not self.connected:
             self._connect_kwargs.update(kwargs)
-            self._check_port()
-            # Only install ssh keys if they aren't installed (or currently being installed)
-            if self._keystate < _ssh_keystate.installing:
-                self.install_ssh_keys()
-            return super(SSHClient, self).connect(**self._connect_kwargs)
+            if not self._pooled:
+                return self._connect()
+            with connection_pool.lock(self._pool_key):
+                self._transport = connection_pool.get(self._pool_key)
+                if not self.connected:
+                    self._connect()
+                    connection_pool.add(self._pool_key, self._transport)
+
+    def _connect(self):
+        self._check_port()
+        # Only install ssh keys if they aren't installed (or currently being installed)
+        if self._keystate < _ssh_keystate.installing:
+            self.install_ssh_keys()
+            if self.connected:
+                return
+        return super(SSHClient, self).connect(**self._connect_kwargs)
 
     def get_transport(self, *args, **kwargs):
         if self.connected:
@@ -132,42 +252,157 @@ class SSHClient(paramiko.SSHClient):
             self.connect()
         return super(SSHClient, self).get_transport(*args, **kwargs)
 
-    def run_command(self, command, timeout=RUNCMD_TIMEOUT):
+    def _exec_command(self, command, timeout):
+        try:
+            session = self.get_transport().open_session()
+        except (paramiko.SSHException, EOFError, socket.error):
+            if not self._pooled:
+                raise
+            # The pooled transport went away underneath us (e.g. appliance reboot), reconnect
+            logger.info('pooled ssh transport to {} failed, reconnecting'.format(
+                self._connect_kwargs['hostname']))
+            connection_pool.discard(self._pool_key, self._transport)
+            self._transport = None
+            session = self.get_transport().open_session()
+        if timeout:
+            session.settimeout(float(timeout))
+        session.exec_command(command)
+        return session
+
+    def _iter_session(self, session, timeout):
+        """Yields ``(stream, data)`` chunks from a running session until the command exits
+
+        Waits on the channel with select, so no cpu is spent while the command is quiet.
+        ``stream`` is either ``'stdout'`` or ``'stderr'``.
+
+        Raises:
+            socket.timeout: No output and no exit status within ``timeout`` seconds
+        """
+        timeout = float(timeout) if timeout else None
+        while True:
+            # The exit status is sent after all of the output, so once it is in
+            # only the buffered output is left to read
+            exited = session.exit_status_ready() or session.closed
+            if session.recv_ready():
+                yield 'stdout', session.recv(STREAM_BUFSIZE)
+            elif session.recv_stderr_ready():
+                yield 'stderr', session.recv_stderr(STREAM_BUFSIZE)
+            elif exited:
+                return
+            else:
+                readable, _, _ = select.select([session], [], [], timeout)
+                if not readable:
+                    raise socket.timeout('No output from command in {} seconds'.format(timeout))
+
+    def iter_command(self, command, timeout=RUNCMD_TIMEOUT):
+        """Runs a command and yields ``(stream, data)`` output chunks as they arrive
+
+        ``stream`` is either ``'stdout'`` or ``'stderr'``, the chunks are not split on lines.
+        Use :py:meth:`run_command` or :py:meth:`stream_command` when the exit status is needed.
+        """
+        logger.info("Iterating command `{}`".format(command))
+        return self._iter_session(self._exec_command(command, timeout), timeout)
+
+    def run_command(self, command, timeout=RUNCMD_TIMEOUT, callback=None):
+        """Runs a command and returns its exit status and the output of stdout and stderr
+
+        Args:
+            command: Command to run
+            timeout: Seconds to wait for any output or the exit status of the command
+            callback: Optional callable receiving ``(stream, data)`` output chunks as they arrive,
+                ``stream`` being either ``'stdout'`` or ``'stderr'``
+        Returns:
+            :py:class:`SSHResult`, ``SSHResult(1, None)`` if the ssh session failed
+        """
         logger.info("Running command `{}`".format(command))
         template = '%s\n'
         command = template % command
 
         try:
-            session = self.get_transport().open_session()
-            if timeout:
-                session.settimeout(float(timeout))
-            session.exec_command(command)
-            stdout = session.makefile()
-            stderr = session.makefile_stderr()
-            output = ''
-            while True:
-                if session.recv_ready:
-                    for line in stdout:
-                        output += line
-                        if self._streaming:
-                            sys.stdout.write(line)
-
-                if session.recv_stderr_ready:
-                    for line in stderr:
-                        output += line
-                        if self._streaming:
-                            sys.stderr.write(line)
-
-                if session.exit_status_ready():
-                    break
+            session = self._exec_command(command, timeout)
+            output = []
+            for stream, data in self._iter_session(session, timeout):
+                output.append(data)
+                if callback:
+                    callback(stream, data)
+                if self._streaming:
+                    (sys.stdout if stream == 'stdout' else sys.stderr).write(data)
             exit_status = session.recv_exit_status()
-            return SSHResult(exit_status, output)
+            return SSHResult(exit_status, ''.join(output))
         except paramiko.SSHException as exc:
             logger.exception(exc)
 
         # Returning two things so tuple unpacking the return works even if the ssh client fails
         return SSHResult(1, None)
 
+    def run_commands(self, commands, timeout=RUNCMD_TIMEOUT):
+        """Runs several commands in one round trip, returning a result for each of them
+
+        The commands are sent as one script, each one running in its own subshell in the given
+        order. The output of every command is framed, so stdout and stderr are split per command.
+
+        Args:
+            commands: List of commands to run
+            timeout: Seconds to wait for any output or the exit status of the script
+        Returns:
+            List of :py:class:`SSHResult` with the ``rc``, stdout as ``output`` and ``stderr`` of
+            each command, ``SSHResult(1, None)`` for commands that did not run to completion
+        """
+        logger.info("Running commands `{}`".format('`, `'.join(commands)))
+        boundary = uuid.uuid4().hex
+        script = []
+        for i, command in enumerate(commands):
+            script.append(
+                "printf '{b}:{i}:start\\n'; printf '{b}:{i}:start\\n' >&2\n"
+                "({command}\n) < /dev/null\n"
+                "printf '\\n{b}:{i}:end:%d\\n' $?; printf '\\n{b}:{i}:end\\n' >&2\n".format(
+                    b=boundary, i=i, command=command))
+
+        try:
+            session = self._exec_command(''.join(script), timeout)
+            output = {'stdout': [], 'stderr': []}
+            for stream, data in self._iter_session(session, timeout):
+                output[stream].append(data)
+            session.recv_exit_status()
+        except paramiko.SSHException as exc:
+            logger.exception(exc)
+            return [SSHResult(1, None) for command in commands]
+
+        stdout = {int(i): (int(rc), out) for i, out, rc in re.findall(
+            r'{b}:(\d+):start\n(.*?)\n{b}:\1:end:(\d+)\n'.format(b=boundary),
+            ''.join(output['stdout']), re.DOTALL)}
+        stderr = {int(i): err for i, err in re.findall(
+            r'{b}:(\d+):start\n(.*?)\n{b}:\1:end\n'.format(b=boundary),
+            ''.join(output['stderr']), re.DOTALL)}
+        results = []
+        for i in range(len(commands)):
+            if i in stdout:
+                results.append(SSHResult(stdout[i][0], stdout[i][1], stderr.get(i, '')))
+            else:
+                results.append(SSHResult(1, None))
+        return results
+
+    def stream_command(self, command, callback, timeout=RUNCMD_TIMEOUT):
+        """Runs a command and hands its stdout to ``callback`` in chunks as they arrive
+
+        Meant for commands whose output is too large to be held in memory, stderr is logged.
+
+        Returns:
+            The exit status of the command
+        """
+        logger.info("Streaming command `{}`".format(command))
+        session = self._exec_command(command, timeout)
+        stderr = []
+        for stream, data in self._iter_session(session, timeout):
+            if stream == 'stdout':
+                callback(data)
+            else:
+                stderr.append(data)
+        stderr = ''.join(stderr)
+        if stderr:
+            logger.warning("`{}` stderr: {}".format(command, stderr.strip()))
+        return session.recv_exit_status()
+
     def run_rails_command(self, command, timeout=RUNCMD_TIMEOUT):
         logger.info("Running rails command `{}`".format(command))
         return self.run_command('cd /var/www/miq/vmdb; bin/rails runner {}'.format(command),
@@ -199,6 +434,35 @@ class SSHClient(paramiko.SSHClient):
     def get_build_date(self):
         return self.get_build_datetime().date()
 
+    def get_appliance_facts(self):
+        """Probes the appliance for its basic facts in one round trip
+
+        Returns:
+            A dictionary with the ``version``, ``build_datetime``, ``is_downstream``,
+            ``has_netapp`` and ``guid`` of the appliance, matching what :py:meth:`get_version`,
+            :py:meth:`get_build_datetime`, :py:meth:`is_appliance_downstream`,
+            :py:meth:`appliance_has_netapp` and ``cat GUID`` return
+        """
+        version, build, downstream, netapp, guid = self.run_commands([
+            'cat /var/www/miq/vmdb/VERSION',
+            'stat --printf=%Y /var/www/miq/vmdb/VERSION',
+            'stat /var/www/miq/vmdb/BUILD',
+            'stat /var/www/miq/vmdb/HAS_NETAPP',
+            'cat /var/www/miq/vmdb/GUID'])
+        if version.rc != 0 or build.rc != 0:
+            raise Exception('Unable to get appliance version: {}'.format(
+                version.stderr or build.stderr))
+        return {
+            'version': version.output.strip(),
+            'build_datetime': parsetime.fromtimestamp(int(build.output.strip())),
+            'is_downstream': downstream.rc == 0,
+            'has_netapp': netapp.rc == 0,
+            'guid': guid.output,
+        }
+
+    def get_appliance_guid(self):
+        return self.run_command('cat /var/www/miq/vmdb/GUID').output
+
     def is_appliance_downstream(self):
         return self.run_command("stat /var/www/miq/vmdb/BUILD").rc == 0
 
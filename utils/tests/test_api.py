@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from utils.api import API, Action, Collection, Entity
+from utils.version import LooseVersion
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+class FakeAPI(API):
+    POOL_SIZE = 4
+    new_id_behaviour = True
+    version = LooseVersion("2.0.0")
+
+    def __init__(self, count, paging=True):
+        self.count = count
+        self.paging = paging
+        self.collections = type("Collections", (object,), {
+            "tasks": Collection(self, "http://appliance/api/tasks", "tasks")})
+        self.finished_after = {}
+        self.calls = []
+        self.active = self.most_active = 0
+        self.lock = threading.Lock()
+
+    def resource(self, i):
+        return {"href": "http://appliance/api/vms/{}".format(i), "id": i, "name": "vm{}".format(i)}
+
+    def get(self, url, **params):
+        self.calls.append(params)
+        with self.lock:
+            self.active += 1
+            self.most_active = max(self.most_active, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        if url.endswith("/tasks"):
+            ids = [value.split("=")[-1].strip("'") for value in params["filter[]"]]
+            resources = []
+            for task_id in ids:
+                self.finished_after[task_id] -= 1
+                state = "Finished" if self.finished_after[task_id] <= 0 else "Active"
+                resources.append({"href": "http://appliance/api/tasks/{}".format(task_id),
+                                  "id": task_id, "state": state})
+            return {"name": "tasks", "count": 100, "subcount": len(ids), "resources": resources}
+        elif "offset" in params and self.paging:
+            ids = range(params["offset"], min(params["offset"] + params["limit"], self.count))
+        elif url.endswith("/vms"):
+            ids = range(self.count)
+        else:
+            return self.resource(int(url.rsplit("/", 1)[-1]))
+        return {"name": "vms", "count": self.count, "subcount": len(ids),
+                "resources": map(self.resource, ids)}
+
+    def post(self, url, **payload):
+        self.calls.append(payload)
+        time.sleep(0.05)
+        return {"results": [
+            dict(resource, success=True, task_id=str(1000 + int(resource["href"].rsplit("/")[-1])))
+            for resource in payload["resources"]]}
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_collection_pages(prefetch):
+    api = FakeAPI(25)
+    collection = Collection(api, "http://appliance/api/vms", "vms")
+    pages = list(collection.pages(page_size=10, prefetch=prefetch))
+    assert map(len, pages) == [10, 10, 5]
+    assert [params["offset"] for params in api.calls] == [0, 10, 20]
+
+
+def test_collection_iter_without_paging():
+    api = FakeAPI(25, paging=False)
+    collection = Collection(api, "http://appliance/api/vms", "vms")
+    collection.PAGE_SIZE = 10
+    assert [vm.name for vm in collection] == ["vm{}".format(i) for i in range(25)]
+    assert len(api.calls) == 1
+
+
+def test_entity_reload_all():
+    api = FakeAPI(10)
+    collection = Collection(api, "http://appliance/api/vms", "vms")
+    entities = [Entity(collection, {"href": "http://appliance/api/vms/{}".format(i)})
+                for i in range(10)]
+    assert Entity.reload_all(entities) == entities
+    assert [entity.name for entity in entities] == ["vm{}".format(i) for i in range(10)]
+    assert api.most_active == FakeAPI.POOL_SIZE
+
+
+def test_action_bulk():
+    api = FakeAPI(25)
+    collection = Collection(api, "http://appliance/api/vms", "vms")
+    action = Action(collection.action, "start", "post", "http://appliance/api/vms")
+    vms = [{"href": "http://appliance/api/vms/{}".format(i)} for i in range(25)]
+    results = action.bulk(vms, chunk_size=10)
+    assert sorted(len(payload["resources"]) for payload in api.calls) == [5, 10, 10]
+    assert [result._href for result in results] == [vm["href"] for vm in vms]
+
+    api.finished_after = {"1000": 1, "1007": 2}
+    assert sorted(api.wait_for_tasks([results[0], results[7]], delay=0)) == ["1000", "1007"]
+
+
+def test_wait_for_tasks():
+    api = FakeAPI(0)
+    api.finished_after = {"1": 1, "2": 3, "3": 2}
+    tasks = ["1", "http://appliance/api/tasks/2",
+             Entity(api.collections.tasks, {"href": "http://appliance/api/tasks/3"})]
+    finished = api.wait_for_tasks(tasks, delay=0)
+    assert sorted(finished) == ["1", "2", "3"]
+    # One query per check, only for the unfinished tasks
+    assert [len(params["filter[]"]) for params in api.calls] == [3, 2, 1]
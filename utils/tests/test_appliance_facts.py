@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from utils import appliance_facts
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+class FakeAppliance(object):
+    def __init__(self, address):
+        self.address = address
+        self.probes = 0
+
+    @appliance_facts.cached_fact()
+    def version(self):
+        self.probes += 1
+        return '5.4.0.1'
+
+    @appliance_facts.cached_fact(ttl=-1)
+    def expired(self):
+        self.probes += 1
+        return self.probes
+
+
+@pytest.fixture
+def facts_path(tmpdir, monkeypatch):
+    monkeypatch.setattr(appliance_facts, 'facts_path', tmpdir.join('appliance_facts'))
+
+
+def test_cached_fact_shared_between_instances(facts_path):
+    first, second = FakeAppliance('10.0.0.1:443'), FakeAppliance('10.0.0.1:443')
+    assert first.version == second.version == '5.4.0.1'
+    assert (first.probes, second.probes) == (1, 0)
+
+    # Another address has its own facts
+    other = FakeAppliance('10.0.0.2')
+    assert other.version == '5.4.0.1'
+    assert other.probes == 1
+
+
+def test_cached_fact_ttl(facts_path):
+    # Expired facts are probed again
+    first, second = FakeAppliance('10.0.0.1'), FakeAppliance('10.0.0.1')
+    first.expired, second.expired
+    assert (first.probes, second.probes) == (1, 1)
+
+
+def test_cached_fact_invalidation(facts_path):
+    appliance = FakeAppliance('10.0.0.1')
+    appliance.version
+    del(appliance.version)
+    assert appliance.version == '5.4.0.1'
+    assert appliance.probes == 2
+
+    appliance_facts.invalidate('10.0.0.1')
+    with pytest.raises(KeyError):
+        appliance_facts.get_fact('10.0.0.1', 'version')
+
+
+def test_guid_change_drops_facts(facts_path):
+    appliance_facts.check_guid('10.0.0.1', 'guid-1')
+    appliance_facts.set_fact('10.0.0.1', 'version', '5.4.0.1')
+    appliance_facts.check_guid('10.0.0.1', 'guid-1')
+    assert appliance_facts.get_fact('10.0.0.1', 'version') == '5.4.0.1'
+
+    appliance_facts.check_guid('10.0.0.1', 'guid-2')
+    with pytest.raises(KeyError):
+        appliance_facts.get_fact('10.0.0.1', 'version')
+
+
+class RedeployedAppliance(FakeAppliance):
+    def __init__(self, address, guid):
+        super(RedeployedAppliance, self).__init__(address)
+        self.guid = guid
+        self.guid_probes = 0
+
+    def probe_guid(self):
+        self.guid_probes += 1
+        return self.guid
+
+
+def test_cached_facts_checked_against_guid(facts_path):
+    first = RedeployedAppliance('10.0.0.1', 'guid-1')
+    appliance_facts.check_instance_guid(first, 'guid-1')
+    assert first.version == '5.4.0.1'
+
+    # Same appliance, the GUID is probed once per instance
+    second = RedeployedAppliance('10.0.0.1', 'guid-1')
+    second.version, second.expired
+    assert (second.probes, second.guid_probes) == (1, 1)
+
+    # Another appliance got the address, the facts of the previous one are not used
+    appliance_facts.set_fact('10.0.0.1', 'configuration_details', 'of guid-1')
+    redeployed = RedeployedAppliance('10.0.0.1', 'guid-2')
+    assert redeployed.version == '5.4.0.1'
+    assert (redeployed.probes, redeployed.guid_probes) == (1, 1)
+    with pytest.raises(KeyError):
+        appliance_facts.get_fact('10.0.0.1', 'configuration_details')
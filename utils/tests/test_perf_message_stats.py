@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from utils.perf_message_stats import (EvmLogParser, MiqMsgStore, QueueMonitor, TopLogParser,
+    load_parsed_logs, messages_to_commands, messages_to_hourly_buckets, parsed_logs_cache_key,
+    save_parsed_logs, split_log_file)
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+evm_lines = [
+    '[----] I, [2015-03-04T08:11:14.320377 #3450:b15814]  INFO -- : MIQ(PriorityWorker) ID [15], '
+    'PID [6461], GUID [abc] started.',
+    '[----] I, [2015-03-04T08:11:15.000001 #3450:b15814]  INFO -- : MIQ(MiqQueue.put) Message id: '
+    '[100], Command: [Vm.perf_capture], Args: ["2015-03-04T08:00:00Z", "hourly"]',
+    '[----] I, [2015-03-04T08:11:16.000001 #6461:b15814]  INFO -- : MIQ(MiqQueue.get_via_drb) '
+    'Message id: [100], Dequeued in: [1.5] seconds',
+    '[----] I, [2015-03-04T08:11:17.000001 #6461:b15814]  INFO -- : MIQ(MiqQueue.delivered) '
+    'Message id: [100], State: [ok], Delivered in [2.25] seconds',
+    '[----] I, [2015-03-04T23:01:00.000001 #3450:b15814]  INFO -- : MIQ(MiqServer.x) Queueing '
+    '"evm_worker_memory_exceeded" for worker with ID: [15]',
+]
+
+
+def test_evm_log_parser_single_pass():
+    evm_parser = EvmLogParser()
+    for line in evm_lines:
+        evm_parser.parse_line(line)
+
+    assert evm_parser.line_count == len(evm_lines)
+    assert evm_parser.test_start == '2015-03-04 08:11:14.320377'
+    assert evm_parser.test_end == '2015-03-04 08:11:17.000001'
+
+    msg = evm_parser.messages['100']
+    assert msg.msg_cmd == 'Vm.perf_capture'
+    assert msg.pid_put == '3450'
+    assert msg.pid_get == '6461'
+    assert msg.total_time == 3.75
+
+    worker = evm_parser.workers[15]
+    assert worker.pid == '6461'
+    assert worker.terminated == 'evm_worker_memory_exceeded'
+    assert evm_parser.wkr_mem_exc == 1
+
+
+def test_messages_to_commands_applies_filters():
+    import re
+    evm_parser = EvmLogParser()
+    for line in evm_lines:
+        evm_parser.parse_line(line)
+    messages = MiqMsgStore.from_messages(evm_parser.messages)
+    msg_cmds = messages_to_commands(messages,
+        {'-hourly': re.compile(r'\"[0-9\-]*T[0-9\:]*Z\",\s\"hourly\"')})
+    assert msg_cmds.keys() == ['Vm.perf_capture-hourly']
+    assert msg_cmds['Vm.perf_capture-hourly']['total'] == [3.75]
+    assert next(messages.rows())[:2] == ["'100'", 'Vm.perf_capture-hourly']
+
+
+def test_messages_to_hourly_buckets():
+    evm_parser = EvmLogParser()
+    for line in evm_lines:
+        evm_parser.parse_line(line)
+    messages = MiqMsgStore.from_messages(evm_parser.messages)
+    messages_to_commands(messages, {})
+    hr_bkt = messages_to_hourly_buckets(messages, evm_parser.test_start, evm_parser.test_end)
+
+    assert sorted(hr_bkt['Vm.perf_capture']['2015-03-04'].keys())[0] == '08'
+    bucket = hr_bkt['Vm.perf_capture']['2015-03-04']['08']
+    assert (bucket.total_put, bucket.total_get) == (1, 1)
+    assert (bucket.avg_deq, bucket.max_del) == (1.5, 2.25)
+
+
+def test_top_log_parser_single_pass():
+    evm_parser = EvmLogParser()
+    for line in evm_lines:
+        evm_parser.parse_line(line)
+
+    top_parser = TopLogParser(evm_parser.workers)
+    for line in ['miqtop: timesync date_time is-> Wed Mar  4 08:00:00 EST 2015 -0500',
+            'top - 08:30:00 up 1 day',
+            'Cpu(s): 13.7%us,  1.2%sy,  2.1%ni, 80.0%id,  1.7%wa,  0.0%hi,  0.1%si,  1.3%st',
+            'Mem:   5990952k total,  4864016k used,  1126936k free,   441444k buffers',
+            'Swap:  9957368k total,        0k used,  9957368k free,  1153156k cached',
+            '6461 2320 root 30 10 324m 9.8m 2444 S 0.5 0.2 0:09.38 worker.rb',
+            '6462 2320 root 30 10 324m 9.8m 2444 S 0.5 0.2 0:09.38 worker.rb']:
+        top_parser.parse_line(line)
+
+    assert top_parser.top_appliance['cpuus'] == [13.7]
+    assert top_parser.top_appliance['cached'] == [round(1153156. / 1024, 2)]
+    assert top_parser.top_workers.keys() == [15]
+    assert top_parser.top_workers[15]['virt'] == [324.0]
+
+
+@pytest.mark.parametrize('chunks', [2, 3, 5])
+def test_sharded_evm_parse_matches_serial(tmpdir, chunks):
+    evm_file = tmpdir.join('evm.log')
+    evm_file.write('\n'.join(evm_lines) + '\n')
+    serial = EvmLogParser().parse_file(str(evm_file))
+
+    merged = EvmLogParser()
+    for start, end in split_log_file(str(evm_file), chunks):
+        merged.merge(EvmLogParser(sharded=True).parse_file(str(evm_file), start, end))
+
+    assert merged.line_count == serial.line_count
+    assert (merged.test_start, merged.test_end) == (serial.test_start, serial.test_end)
+    assert dict(merged.messages['100']) == dict(serial.messages['100'])
+    assert dict(merged.workers[15]) == dict(serial.workers[15])
+
+
+def test_parsed_logs_cache_roundtrip(tmpdir):
+    evm_file = tmpdir.join('evm.log')
+    evm_file.write('\n'.join(evm_lines) + '\n')
+    evm_parser = EvmLogParser().parse_file(str(evm_file))
+    messages = MiqMsgStore.from_messages(evm_parser.messages)
+    top_parser = TopLogParser(evm_parser.workers)
+    cache_file = str(tmpdir.join('evm.log.parsed.npz'))
+    cache_key = parsed_logs_cache_key(str(evm_file))
+    save_parsed_logs(cache_file, cache_key, messages, evm_parser, top_parser)
+
+    assert load_parsed_logs(cache_file, 'stale') is None
+    cached_messages, cached_evm_parser, cached_top_parser = load_parsed_logs(cache_file,
+        cache_key)
+    assert list(cached_messages.rows()) == list(messages.rows())
+    assert cached_evm_parser.test_end == evm_parser.test_end
+    assert dict(cached_evm_parser.workers[15]) == dict(evm_parser.workers[15])
+
+    evm_file.write('appended line\n', mode='a')
+    assert parsed_logs_cache_key(str(evm_file)) != cache_key
+
+
+def test_queue_monitor_windows_and_thresholds(monkeypatch):
+    monkeypatch.setattr('utils.perf_message_stats.SSHTail', lambda *args, **kwargs: None)
+    monitor = QueueMonitor(window=2)
+    for line in evm_lines[:4]:
+        monitor.parse_line(line)
+    monitor._update_worker_pids()
+    monitor.parse_top_line('6461 2320 root 30 10 324m 9.8m 2444 S 0.5 0.2 0:09.38 worker.rb')
+
+    assert not monitor.messages
+    assert monitor.statistics() == {'Vm.perf_capture-hourly': {'samples': 1,
+        'deq_time_p50': 1.5, 'deq_time_p90': 1.5, 'deq_time_p99': 1.5,
+        'del_time_p50': 2.25, 'del_time_p90': 2.25, 'del_time_p99': 2.25}}
+    assert list(monitor.worker_memory[15]) == [9.8]
+    assert monitor.threshold_violations({'del_time_p99': 3, 'worker_memory': 10}) == []
+    assert len(monitor.threshold_violations({'deq_time_p50': 1, 'worker_memory': 5})) == 2
+
+    monitor.parse_line(evm_lines[4])
+    monitor._update_worker_pids()
+    assert 15 not in monitor.worker_memory
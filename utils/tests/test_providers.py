@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import datetime
+import time
+
+import pytest
+
+from utils import providers
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+class FakeMgmt(object):
+    def __init__(self, vm_names, slow=()):
+        self.vm_names = vm_names
+        self.slow = slow
+
+    def list_vm(self):
+        return self.vm_names
+
+    def vm_status(self, vm_name):
+        return 'running'
+
+    def current_ip_address(self, vm_name):
+        return '10.0.0.{}'.format(self.vm_names.index(vm_name))
+
+    def vm_creation_time(self, vm_name):
+        if vm_name in self.slow:
+            time.sleep(2)
+        return datetime.datetime(2015, 1, 1)
+
+
+class FakeBulkMgmt(FakeMgmt):
+    native_bulk_vm_properties = True
+
+    def bulk_vm_properties(self, props):
+        return {vm_name: {prop: 'bulk' for prop in props} for vm_name in self.vm_names}
+
+    def vm_creation_time(self, vm_name):
+        raise AssertionError('Looked up per VM')
+
+
+def test_vm_inventory(monkeypatch):
+    backends = {
+        'prov1': FakeMgmt(['test_a', 'test_b', 'other']),
+        'prov2': FakeMgmt(['test_c', 'test_slow'], slow=['test_slow']),
+        'prov3': FakeBulkMgmt(['test_d', 'other']),
+    }
+
+    def provider_factory(provider_key):
+        if provider_key == 'broken':
+            raise Exception('Unreachable')
+        return backends[provider_key]
+    monkeypatch.setattr(providers, 'provider_factory', provider_factory)
+
+    vms, errors = providers.vm_inventory(['prov1', 'prov2', 'prov3', 'broken'],
+        vm_filter=lambda vm_name: vm_name.startswith('test_'),
+        properties=('ip', 'creation_time'), timeout=1)
+
+    assert errors.keys() == ['broken']
+    assert sorted(vms) == [
+        ('prov1', 'test_a', None, None, '10.0.0.0', datetime.datetime(2015, 1, 1)),
+        ('prov1', 'test_b', None, None, '10.0.0.1', datetime.datetime(2015, 1, 1)),
+        ('prov2', 'test_c', None, None, '10.0.0.0', datetime.datetime(2015, 1, 1)),
+        # Timed out
+        ('prov2', 'test_slow', None, None, '10.0.0.1', None),
+        ('prov3', 'test_d', None, None, 'bulk', 'bulk'),
+    ]
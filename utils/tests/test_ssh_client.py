@@ -50,3 +50,29 @@ def test_scp_client_can_put_a_file(ssh_client, tmpdir):
     assert "content" in tmpfile.read()
     # Clean up the server
     ssh_client.run_command("rm -f /tmp/%s" % tmpfile.basename)
+
+
+def test_ssh_client_run_command_callback(ssh_client):
+    # Make sure output chunks reach the callback and are all collected
+    chunks = []
+    exit_status, output = ssh_client.run_command('seq 1 100000; echo Failing! >&2; exit 3',
+        callback=lambda stream, data: chunks.append((stream, data)))
+    assert exit_status == 3
+    assert ''.join(data for stream, data in chunks) == output
+    assert ''.join(data for stream, data in chunks if stream == 'stderr') == 'Failing!\n'
+    assert output.startswith('1\n2\n') and '100000\n' in output
+
+
+def test_ssh_client_iter_command(ssh_client):
+    stdout = ''.join(data for stream, data in ssh_client.iter_command('seq 1 1000')
+        if stream == 'stdout')
+    assert stdout.splitlines() == [str(i) for i in range(1, 1001)]
+
+
+def test_ssh_client_run_commands(ssh_client):
+    # Make sure every command of a batch gets its own rc, stdout and stderr
+    results = ssh_client.run_commands(['echo Testing!',
+        'printf no newline; echo Failing! >&2; exit 3', 'cd /tmp; pwd', 'true'])
+    assert [result.rc for result in results] == [0, 3, 0, 0]
+    assert [result.output for result in results] == ['Testing!\n', 'no newline', '/tmp\n', '']
+    assert [result.stderr for result in results] == ['', 'Failing!\n', '', '']
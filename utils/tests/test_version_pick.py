@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from utils import version
+from utils.version import LATEST, LOWEST, LooseVersion, pick
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+@pytest.mark.parametrize(('current', 'picked'), [
+    ('5.2.5.2', 'lowest'),
+    ('5.3.0.1', '5.3'),
+    ('5.4.0.1', '5.4'),
+    ('master', 'latest'),
+])
+def test_pick(monkeypatch, current, picked):
+    monkeypatch.setattr(version, 'current_version', lambda: version.get_version(current))
+    for i in range(2):
+        # The second pick comes from the memo
+        assert pick({LOWEST: 'lowest', '5.3': '5.3', LooseVersion('5.4'): '5.4',
+            LATEST: 'latest'}) == picked
+
+
+def test_pick_follows_the_current_version(monkeypatch):
+    current = ['5.3.0.1']
+    monkeypatch.setattr(version, 'current_version', lambda: version.get_version(current[0]))
+    assert pick({'5.3': 'old', '5.4': 'new'}) == 'old'
+    current[0] = '5.4.0.1'
+    assert pick({'5.3': 'old', '5.4': 'new'}) == 'new'
+    current[0] = '5.2.5.2'
+    assert pick({'5.3': 'old', '5.4': 'new'}) is None
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from collections import namedtuple
 from datetime import date, datetime
+from operator import itemgetter
 import string
 import re
 from fixtures.pytest_store import store
@@ -143,17 +144,45 @@ def dependent(default_function):
     return m
 
 
+# Dispatch tables of the pick() dicts, per set of keys
+_pick_tables = {}
+# Key picked from a pick() dict, per set of keys and appliance version
+_picked_keys = {}
+# Picked when no key matches the appliance version
+_no_key = object()
+
+
+def _pick_table(keys):
+    """Returns the keys of a pick() dict as ``(version, key)`` pairs, newest version first
+
+    Compiled once per set of keys, the pick() dicts are mostly literals built anew on every call.
+    """
+    try:
+        return _pick_tables[keys]
+    except KeyError:
+        table = tuple(sorted(((get_version(key), key) for key in keys), key=itemgetter(0),
+            reverse=True))
+        _pick_tables[keys] = table
+        return table
+
+
 def pick(v_dict):
     """
     Collapses an ambiguous series of objects bound to specific versions
     by interrogating the CFME Version and returning the correct item.
+
+    The picked key is memoized per set of keys and appliance version, so after the first call
+    it costs a dictionary lookup. Switching ``store.current_appliance`` needs no invalidation,
+    as the memo is keyed on the version of the current appliance.
     """
-    # convert keys to LooseVersions
-    v_dict = {get_version(k): v for (k, v) in v_dict.items()}
-    versions = v_dict.keys()
-    sorted_matching_versions = sorted(filter(lambda v: v <= current_version(), versions),
-                                      reverse=True)
-    return v_dict.get(sorted_matching_versions[0]) if sorted_matching_versions else None
+    keys = frozenset(v_dict)
+    version = current_version()
+    try:
+        key = _picked_keys[keys, version]
+    except KeyError:
+        key = _picked_keys[keys, version] = next(
+            (key for key_version, key in _pick_table(keys) if key_version <= version), _no_key)
+    return None if key is _no_key else v_dict[key]
 
 
 class Version(object):
@@ -475,6 +504,10 @@ class LooseVersion (Version):
     def __repr__(self):
         return "LooseVersion ('%s')" % str(self)
 
+    def __hash__(self):
+        # Equal versions hash equally, so they can be used as dict keys (see pick)
+        return hash((self._special, tuple(self.version or ())))
+
     def __cmp__(self, other):
         if isinstance(other, basestring):
             other = LooseVersion(other)